@@ -0,0 +1,336 @@
+"""
+Audio Pipeline
+Per-call audio buffering between the Twilio and Deepgram sockets.
+
+Twilio streams caller audio at a fixed real-time rate no matter how fast we
+forward it, so nothing in this module ever applies backpressure to the
+producer. Instead, buffers are bounded and shed or merge audio when the
+consumer falls behind, which keeps latency bounded under load.
+"""
+
+import asyncio
+import binascii
+import json
+import time
+from collections import deque
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "coalesce")
+
+MULAW_SILENCE = b"\xff"
+
+
+class BoundedAudioQueue:
+    """
+    Bounded FIFO of audio frames with a configurable overflow policy.
+
+    Overflow policies:
+        - 'drop_oldest': discard the oldest queued frame to make room (lowest latency)
+        - 'drop_newest': discard the incoming frame (keeps the start of an utterance)
+        - 'coalesce': append the incoming frame to the last queued one so the
+          sender catches up with fewer, larger sends; once the tail reaches
+          `coalesce_factor` frames it falls back to dropping the oldest frame
+    """
+
+    def __init__(self, maxsize: int = 5, overflow: str = "drop_oldest", coalesce_factor: int = 4):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"Unknown overflow policy '{overflow}'. Options: {', '.join(OVERFLOW_POLICIES)}"
+            )
+
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.coalesce_factor = coalesce_factor
+        self._frames = deque()
+        self._getter = None
+
+        # Per-call counters
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_depth = 0
+
+    def qsize(self) -> int:
+        return len(self._frames)
+
+    def empty(self) -> bool:
+        return not self._frames
+
+    def put_nowait(self, frame) -> bool:
+        """
+        Queue a frame without ever blocking.
+
+        Returns:
+            bool: False if the incoming frame itself was dropped
+        """
+        frames = self._frames
+
+        if len(frames) >= self.maxsize:
+            if self.overflow == "drop_newest":
+                self.dropped += 1
+                return False
+
+            tail = frames[-1]
+            if self.overflow == "coalesce" and len(tail) + len(frame) <= self.coalesce_factor * len(frame):
+                frames[-1] = b"".join((tail, frame))
+                self.coalesced += 1
+                self.enqueued += 1
+                return True
+
+            frames.popleft()
+            self.dropped += 1
+
+        frames.append(frame)
+        self.enqueued += 1
+        if len(frames) > self.max_depth:
+            self.max_depth = len(frames)
+
+        getter = self._getter
+        if getter is not None and not getter.done():
+            getter.set_result(None)
+        return True
+
+    async def get(self):
+        while not self._frames:
+            self._getter = asyncio.get_running_loop().create_future()
+            try:
+                await self._getter
+            finally:
+                self._getter = None
+        return self._frames.popleft()
+
+    def stats(self) -> dict:
+        return {
+            "depth": len(self._frames),
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+
+class OutboundPacer:
+    """
+    Re-frames agent audio into fixed-size frames and paces them to Twilio.
+
+    Deepgram delivers TTS audio in bursts of arbitrary size. The pacer splits it
+    into `frame_size` byte frames, waits until `jitter_depth` frames are buffered
+    at the start of each talk spurt, then sends one frame every `frame_duration`
+    seconds against absolute deadlines on the loop's monotonic clock, so timing
+    errors do not accumulate.
+
+    An underrun is counted when the buffer empties mid-turn; the pacer then
+    re-buffers. `end_of_turn()` flushes the final partial frame (padded with
+    silence) so the natural end of an utterance is not counted as an underrun.
+
+    Every frame is tagged with the speech-turn generation it was pushed in.
+    `barge_in()` starts a new generation: unsent frames of the old one are
+    dropped immediately, and audio still arriving from Deepgram for the
+    interrupted turn is discarded until `start_turn()` marks the next agent turn.
+
+    A barge-in from the local VAD is provisional. Deepgram's own event confirms
+    it without clearing Twilio a second time; if no confirmation arrives within
+    `confirm_timeout` seconds, agent audio is accepted again.
+    """
+
+    def __init__(
+        self,
+        send,
+        frame_size: int = 160,
+        frame_duration: float = 0.02,
+        jitter_depth: int = 3,
+        confirm_timeout: float = 1.5,
+    ):
+        self._send = send
+        self.frame_size = frame_size
+        self.frame_duration = frame_duration
+        self.jitter_depth = max(1, jitter_depth)
+
+        self._frames = deque()
+        self._partial = b""
+        self._ready = None
+        self._draining = False
+        self._prefix = None
+        self._clear_message = None
+
+        self.confirm_timeout = confirm_timeout
+
+        self.generation = 0
+        self.muted = False
+        self.playing = False
+        self._local_barge_in_at = None
+
+        # Per-call counters
+        self.frames_sent = 0
+        self.frames_discarded = 0
+        self.underruns = 0
+        self.resyncs = 0
+        self.max_drift = 0.0
+        self._total_drift = 0.0
+        self.barge_ins = 0
+        self.local_barge_ins = 0
+        self.local_barge_ins_unconfirmed = 0
+        self.max_barge_in_latency = 0.0
+        self._total_barge_in_latency = 0.0
+
+    def bind(self, streamsid: str) -> None:
+        # The media event envelope only varies in its payload, so build it once
+        self._prefix = '{"event": "media", "streamSid": ' + json.dumps(streamsid) + ', "media": {"payload": "'
+        self._clear_message = json.dumps({"event": "clear", "streamSid": streamsid})
+
+    def buffered(self) -> int:
+        return len(self._frames)
+
+    def push(self, audio) -> None:
+        if self.muted and self._local_barge_in_at is not None:
+            if time.monotonic() - self._local_barge_in_at > self.confirm_timeout:
+                # Deepgram never heard speech: the local detection was a false positive
+                self.local_barge_ins_unconfirmed += 1
+                self._local_barge_in_at = None
+                self.muted = False
+
+        if self.muted:
+            self.frames_discarded += (len(audio) + self.frame_size - 1) // self.frame_size
+            return
+
+        frame_size = self.frame_size
+        generation = self.generation
+        data = self._partial + audio if self._partial else audio
+        whole = len(data) - len(data) % frame_size
+
+        self._frames.extend((generation, data[i : i + frame_size]) for i in range(0, whole, frame_size))
+        self._partial = data[whole:]
+        self._draining = False
+
+        if len(self._frames) >= self.jitter_depth:
+            self._wake()
+
+    def end_of_turn(self) -> None:
+        if self._partial:
+            frame = self._partial + MULAW_SILENCE * (self.frame_size - len(self._partial))
+            self._frames.append((self.generation, frame))
+            self._partial = b""
+        self._draining = True
+        self._wake()
+
+    def start_turn(self) -> None:
+        """Accept agent audio again after a barge-in."""
+        self.muted = False
+        self._local_barge_in_at = None
+
+    async def barge_in(self, received_at: float, source: str = "deepgram"):
+        """
+        Silence the line now: drop every unsent frame of the current generation and clear Twilio playback.
+
+        Args:
+            received_at: time.monotonic() when the barge-in event reached this process
+            source: 'deepgram' for UserStartedSpeaking, 'local' for the local VAD
+
+        Returns:
+            float | None: Seconds from `received_at` to the clear being sent, or
+            None if there was nothing to silence
+        """
+        if source == "local":
+            # Callers talking while the agent is silent is ordinary turn-taking
+            if self.muted or not (self.playing or self._frames):
+                return None
+            self._local_barge_in_at = received_at
+            self.local_barge_ins += 1
+        elif self._local_barge_in_at is not None:
+            # Deepgram confirms a barge-in the local VAD already handled
+            self._local_barge_in_at = None
+            return None
+        elif self.muted:
+            # Nothing has played since the last barge-in
+            return None
+
+        self.generation += 1
+        self.muted = True
+        self.frames_discarded += len(self._frames) + (1 if self._partial else 0)
+        self._frames.clear()
+        self._partial = b""
+        # An interrupted turn emptying the buffer is not an underrun
+        self._draining = True
+
+        await self._send(self._clear_message)
+
+        latency = time.monotonic() - received_at
+        self.barge_ins += 1
+        self._total_barge_in_latency += latency
+        if latency > self.max_barge_in_latency:
+            self.max_barge_in_latency = latency
+        return latency
+
+    def _wake(self) -> None:
+        ready = self._ready
+        if ready is not None and not ready.done():
+            ready.set_result(None)
+
+    async def _wait_for_audio(self) -> None:
+        while not self._frames or (len(self._frames) < self.jitter_depth and not self._draining):
+            self._ready = asyncio.get_running_loop().create_future()
+            try:
+                await self._ready
+            finally:
+                self._ready = None
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        frames = self._frames
+        deadline = None
+
+        while True:
+            if deadline is None or not frames:
+                if deadline is not None and not self._draining:
+                    self.underruns += 1
+                self.playing = False
+                await self._wait_for_audio()
+                deadline = loop.time()
+                self.playing = True
+
+            generation, frame = frames.popleft()
+            if generation != self.generation:
+                self.frames_discarded += 1
+                continue
+
+            drift = loop.time() - deadline
+            if drift > self.jitter_depth * self.frame_duration:
+                # Too late to catch up without bursting; restart the schedule from now
+                self.resyncs += 1
+                deadline = loop.time()
+                drift = 0.0
+
+            await self._send(self._prefix + binascii.b2a_base64(frame, newline=False).decode("ascii") + '"}}')
+
+            self.frames_sent += 1
+            self._total_drift += abs(drift)
+            if drift > self.max_drift:
+                self.max_drift = drift
+
+            deadline += self.frame_duration
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if not frames and self._draining:
+                deadline = None
+
+    def stats(self) -> dict:
+        return {
+            "buffered": len(self._frames),
+            "generation": self.generation,
+            "frames_sent": self.frames_sent,
+            "frames_discarded": self.frames_discarded,
+            "underruns": self.underruns,
+            "resyncs": self.resyncs,
+            "mean_drift_ms": round(self._total_drift / self.frames_sent * 1000, 3) if self.frames_sent else 0.0,
+            "max_drift_ms": round(self.max_drift * 1000, 3),
+            "barge_ins": self.barge_ins,
+            "local_barge_ins": self.local_barge_ins,
+            "local_barge_ins_unconfirmed": self.local_barge_ins_unconfirmed,
+            "mean_barge_in_to_silence_ms": round(self._total_barge_in_latency / self.barge_ins * 1000, 3)
+            if self.barge_ins
+            else 0.0,
+            "max_barge_in_to_silence_ms": round(self.max_barge_in_latency * 1000, 3),
+        }
@@ -0,0 +1,146 @@
+"""
+Benchmark: bulk cancellation and refund exposure against the one-at-a-time path.
+
+Fills a temporary store with synthetic reservations (100,000 by default)
+spread over two years around today, so matches fall on both sides of every
+cancellation cutoff. First checks, on a copy of the store, that
+cancel_reservations gives each reservation in a window the same result,
+cancellation reference and stored fee as cancel_reservation does one call
+at a time. Then times refund exposure and cancellation of every reservation,
+bulk against per reservation.
+
+Run from the repository root:
+    python -m benchmarks.bench_bulk_operations --reservations 100000
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from benchmarks.bench_reservation_store import synthetic_reservations
+
+
+def shifted(reservations, days: int):
+    """Synthetic reservations start on 2026-01-01; move them to start `days` later."""
+    for conf_num, reservation in reservations:
+        for field in ("check_in", "check_out"):
+            reservation[field] = (date.fromisoformat(reservation[field]) + timedelta(days=days)).isoformat()
+        yield conf_num, reservation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reservations", type=int, default=100_000)
+    parser.add_argument("--verify-days", type=int, default=6, help="Width of the window checked against the single path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-bulk-")
+    os.environ["RESERVATIONS_DB_PATH"] = os.path.join(workdir, "seed.db")
+
+    import bulk_operations
+    import hotel_functions
+    from reservation_store import ReservationStore
+    from room_inventory import RoomInventory
+
+    capacity = hotel_functions.INVENTORY.capacity
+    today = date.today()
+    offset = (today - timedelta(days=365) - date(2026, 1, 1)).days
+
+    path = os.path.join(workdir, "bulk.db")
+    store = ReservationStore(path)
+    store.insert_many(shifted(synthetic_reservations(args.reservations, random.Random(19)), offset))
+    store._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    shutil.copy(path, os.path.join(workdir, "single.db"))
+    single = ReservationStore(os.path.join(workdir, "single.db"))
+    inventory = RoomInventory.from_reservations(capacity, store.iter_stays())
+    hotel = hotel_functions.Hotel(hotel_functions.HOTEL_INFO, store, inventory, hotel_functions.CALLBACKS)
+    print(f"{args.reservations:,} reservations checking in {offset:+d} to {offset + 730:+d} days from 2026-01-01")
+
+    # --- Same results as the single path --------------------------------------------------
+    start = (today - timedelta(days=2)).isoformat()
+    end = (today + timedelta(days=args.verify_days - 2)).isoformat()
+    matched = single.find_overlapping(start, end)
+
+    hotel_functions.STORE = single
+    hotel_functions.INVENTORY = RoomInventory.from_reservations(capacity, single.iter_stays())
+    begin = time.perf_counter()
+    expected = {
+        reservation.confirmation_number: hotel_functions.cancel_reservation(
+            reservation.confirmation_number, reservation.last_name, "hotel_initiated"
+        )
+        for reservation in matched
+    }
+    single_elapsed = time.perf_counter() - begin
+
+    bulk = bulk_operations.cancel_reservations(start, end, hotel=hotel)
+    actual = {result["original_confirmation"]: result for result in bulk["results"]}
+    if actual != expected:
+        different = [conf for conf in expected if actual.get(conf) != expected[conf]]
+        raise SystemExit(f"bulk results differ from cancel_reservation for {len(different)} reservations, e.g. {different[:3]}")
+    for conf_num in expected:
+        bulk_row, single_row = store.get(conf_num).to_dict(), single.get(conf_num).to_dict()
+        # Cancelled a few seconds apart, possibly in different minutes
+        bulk_row.pop("cancelled_on"), single_row.pop("cancelled_on")
+        if bulk_row != single_row:
+            raise SystemExit(f"stored cancellation of {conf_num} differs: {bulk_row} != {single_row}")
+    terms = bulk["exposure"]
+    print(
+        f"verified {len(expected):,} cancellations between {start} and {end}: identical results and references "
+        f"({terms['full_refund']['count']} full, {terms['partial_refund']['count']} partial, "
+        f"{terms['no_refund']['count']} no refund)"
+    )
+
+    # --- Refund exposure over everything ------------------------------------------------------
+    first, last = (today - timedelta(days=400)).isoformat(), (today + timedelta(days=400)).isoformat()
+    now = datetime.now()
+    reservations = store.find_overlapping(first, last)
+
+    begin = time.perf_counter()
+    refund = 0.0
+    for reservation in reservations:
+        fee_info = hotel_functions._calculate_cancellation_fee(reservation.check_in_ordinal, now)
+        if fee_info["refund_type"] == "full_refund":
+            refund += reservation.total_cost
+        elif fee_info["refund_type"] == "partial_refund":
+            refund += reservation.total_cost - reservation.rate_per_night
+    loop_elapsed = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    schedule = bulk_operations.FeeSchedule(reservations, now)
+    exposure = schedule.exposure()
+    schedule_elapsed = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    windows = 1000
+    for day in range(windows):
+        window_start = today + timedelta(days=day % 300)
+        schedule.exposure(window_start.isoformat(), (window_start + timedelta(days=7)).isoformat())
+    window_elapsed = (time.perf_counter() - begin) / windows
+
+    if abs(exposure["total_refund"] - refund) > 0.01:
+        raise SystemExit(f"exposure {exposure['total_refund']} != per-reservation sum {refund:.2f}")
+    print(
+        f"\nrefund exposure of {len(reservations):,} reservations (${exposure['total_refund']:,.2f}):\n"
+        f"  per reservation   {loop_elapsed * 1e3:8.1f} ms\n"
+        f"  sort + bisect     {schedule_elapsed * 1e3:8.1f} ms\n"
+        f"  then any week     {window_elapsed * 1e6:8.1f} us"
+    )
+
+    # --- Cancel everything ------------------------------------------------------------------
+    begin = time.perf_counter()
+    result = bulk_operations.cancel_reservations(first, last, hotel=hotel)
+    bulk_elapsed = time.perf_counter() - begin
+    per_call = single_elapsed / max(len(expected), 1)
+    print(
+        f"\ncancel {result['cancelled']:,} reservations:\n"
+        f"  bulk              {bulk_elapsed:8.2f} s\n"
+        f"  cancel_reservation {per_call * 1e3:7.2f} ms each, ~{per_call * result['cancelled']:,.0f} s for all"
+    )
+
+
+if __name__ == "__main__":
+    main()
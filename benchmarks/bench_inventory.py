@@ -0,0 +1,87 @@
+"""
+Benchmark: room availability checks for a 1,000-room property.
+
+Books random stays over a two-year horizon until the hotel is about 85%
+full, then times availability checks, "could this reservation move here"
+checks and moves for random stays of one to fourteen nights.
+
+Run from the repository root:
+    python -m benchmarks.bench_inventory --queries 100000
+"""
+
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from room_inventory import RoomInventory
+
+CAPACITY = {"standard": 480, "deluxe": 320, "suite": 150, "penthouse": 50}
+HORIZON_DAYS = 730
+
+
+def random_stay(rng: random.Random, first_day: date) -> tuple:
+    check_in = first_day + timedelta(days=rng.randrange(HORIZON_DAYS - 14))
+    nights = rng.randint(1, 14)
+    room_type = rng.choices(list(CAPACITY), weights=list(CAPACITY.values()))[0]
+    return room_type, check_in.isoformat(), (check_in + timedelta(days=nights)).isoformat()
+
+
+def timed(label: str, samples: list, fn) -> None:
+    latencies = []
+    for sample in samples:
+        start = time.perf_counter()
+        fn(sample)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(
+        f"{label:<22} mean={sum(latencies) / len(latencies) * 1e6:6.2f} us  "
+        f"p99={latencies[int(len(latencies) * 0.99)] * 1e6:6.2f} us  "
+        f"max={latencies[-1] * 1e6:7.2f} us"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--occupancy", type=float, default=0.85, help="Target share of room-nights booked")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    first_day = date(2026, 1, 1)
+    inventory = RoomInventory(CAPACITY)
+
+    target = sum(CAPACITY.values()) * HORIZON_DAYS * args.occupancy
+    booked_nights = stays = 0
+    bookings = []
+    start = time.perf_counter()
+    while booked_nights < target:
+        stay = random_stay(rng, first_day)
+        if inventory.is_available(*stay):
+            inventory.add(*stay)
+            bookings.append(stay)
+            booked_nights += (date.fromisoformat(stay[2]) - date.fromisoformat(stay[1])).days
+        stays += 1
+        if stays > target:
+            break
+    print(
+        f"booked {len(bookings):,} stays ({booked_nights / (sum(CAPACITY.values()) * HORIZON_DAYS):.0%} of "
+        f"room-nights) from {stays:,} requests in {time.perf_counter() - start:.1f}s"
+    )
+
+    queries = [random_stay(rng, first_day) for _ in range(args.queries)]
+    timed("is_available", queries, lambda stay: inventory.is_available(*stay))
+
+    moves = [(rng.choice(bookings), stay) for stay in queries[: args.queries // 10]]
+    timed("can_move", moves, lambda move: inventory.can_move(*move))
+
+    def move_and_back(move):
+        old, new = move
+        inventory.move(old, new)
+        inventory.move(new, old)
+
+    timed("move (there and back)", moves, move_and_back)
+
+
+if __name__ == "__main__":
+    main()
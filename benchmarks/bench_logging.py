@@ -0,0 +1,141 @@
+"""
+Benchmark: event-loop stalls from logging to a slow stdout.
+
+Simulates the log output of many concurrent calls: a Deepgram message every
+100 ms per call, and a function call with its arguments and full result
+every second. The output goes to a pipe drained at a fixed rate, like a
+terminal or log collector that cannot keep up. A probe task on the same
+event loop measures how late its 5 ms timer fires.
+
+Runs twice: with print() as before, where a full pipe blocks the event loop,
+and with call_logging's queue-backed writer, which drops records instead.
+
+Run from the repository root:
+    python -m benchmarks.bench_logging --calls 100 --sink-kbps 200
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import threading
+import time
+
+from call_logging import configure_logging, event, start_call
+
+PROBE_INTERVAL = 0.005
+
+DEEPGRAM_MESSAGE = json.dumps(
+    {"type": "ConversationText", "role": "user", "content": "Hi, I'd like to check my reservation for next week please."}
+)
+FUNCTION_ARGUMENTS = {"confirmation_number": "GH-78432", "last_name": "Smith"}
+FUNCTION_RESULT = {
+    "status": "found",
+    "confirmation_number": "GH-78432",
+    "guest_name": "John Smith",
+    "check_in_date": "2026-01-15",
+    "check_out_date": "2026-01-18",
+    "special_requests": ["Late check-in around 9 PM", "High floor preferred"],
+    "message": "I found your reservation, John Smith. You have a Deluxe Room booked for 3 nights, checking in on "
+    "2026-01-15 and checking out on 2026-01-18. Your room number is 412 and the total cost is $597.00." * 3,
+}
+
+
+def slow_sink(kbps: float) -> io.TextIOWrapper:
+    """A line-buffered text stream into a pipe that a thread drains at `kbps` kilobytes per second."""
+    read_fd, write_fd = os.pipe()
+
+    def drain():
+        chunk = 4096
+        while os.read(read_fd, chunk):
+            time.sleep(chunk / (kbps * 1000))
+
+    threading.Thread(target=drain, daemon=True).start()
+    return open(write_fd, "w", buffering=1)
+
+
+async def probe(duration: float) -> list:
+    lags = []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        await asyncio.sleep(PROBE_INTERVAL)
+        lags.append(time.monotonic() - started - PROBE_INTERVAL)
+    return lags
+
+
+async def simulated_call(emit, duration: float, counts: dict) -> None:
+    start_call()
+    deadline = time.monotonic() + duration
+    tick = 0
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.1)
+        emit("deepgram", DEEPGRAM_MESSAGE)
+        counts["records"] += 1
+        tick += 1
+        if tick % 10 == 0:
+            emit("function_call", FUNCTION_ARGUMENTS)
+            emit("function_result", FUNCTION_RESULT)
+            counts["records"] += 2
+
+
+async def run(emit, calls: int, duration: float) -> tuple:
+    counts = {"records": 0}
+    lags, *_ = await asyncio.gather(
+        probe(duration), *(simulated_call(emit, duration, counts) for _ in range(calls))
+    )
+    return lags, counts["records"]
+
+
+def report(label: str, lags: list, records: int, duration: float, dropped: int) -> None:
+    lags.sort()
+    stalled = sum(lag for lag in lags if lag > 0.001)
+    print(
+        f"{label:<20} {records / duration:>7,.0f} rec/s  lag p50={lags[len(lags) // 2] * 1e3:6.1f} ms  "
+        f"p99={lags[int(len(lags) * 0.99)] * 1e3:7.1f} ms  max={lags[-1] * 1e3:7.1f} ms  "
+        f"stalled {stalled:5.2f}s of {duration:.0f}s  dropped {dropped:,}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--sink-kbps", type=float, default=200, help="How fast the pipe behind stdout drains")
+    parser.add_argument("--queue-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    # Before: print() on the event loop, as main.py used to
+    sink = slow_sink(args.sink_kbps)
+
+    def print_emit(kind, payload):
+        if kind == "deepgram":
+            print(payload, file=sink)
+        elif kind == "function_call":
+            print(f"Function call: lookup_reservation (ID: f1), arguments: {payload}", file=sink)
+        else:
+            print(f"Function call result: {payload}", file=sink)
+
+    lags, records = asyncio.run(run(print_emit, args.calls, args.duration))
+    report("print", lags, records, args.duration, 0)
+
+    # After: call_logging's bounded queue and writer thread
+    handler = configure_logging("INFO", "json", args.queue_size, stream=slow_sink(args.sink_kbps))
+    log = logging.getLogger("voice_agent")
+
+    def log_emit(kind, payload):
+        if kind == "deepgram":
+            log.info("Deepgram %s", payload, extra=event("deepgram_message"))
+        elif kind == "function_call":
+            log.info("Function call %s", "lookup_reservation", extra=event("function_call", arguments=payload))
+        else:
+            log.info("Function call result %s", payload, extra=event("function_result"))
+
+    lags, records = asyncio.run(run(log_emit, args.calls, args.duration))
+    report("queued logging", lags, records, args.duration, handler.dropped)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark: ReservationRecord against the plain dict it replaced.
+
+Fills a temporary SQLite store with synthetic reservations (a million by
+default) and reads every row back twice: once decoded the old way, as a dict,
+and once as ReservationRecords. Reports memory per reservation held in
+memory, decode cost, and the date arithmetic modify_reservation and the
+cancellation fee do per reservation: parsing YYYY-MM-DD strings with
+strptime against subtracting ordinals.
+
+Run from the repository root:
+    python -m benchmarks.bench_reservation_record --reservations 1000000
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+from benchmarks.bench_reservation_store import synthetic_reservations
+from reservation_record import ReservationRecord
+from reservation_store import ReservationStore
+
+
+def decode_dict(row) -> dict:
+    """How rows were decoded before ReservationRecord."""
+    reservation = dict(row)
+    reservation["special_requests"] = json.loads(reservation["special_requests"])
+    return reservation
+
+
+def decode_record(row) -> ReservationRecord:
+    return ReservationRecord.from_row(row, json.loads(row["special_requests"]))
+
+
+def timed(label: str, count: int, fn):
+    gc.collect()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<40} {elapsed:6.2f}s  {elapsed / count * 1e9:8.0f} ns/reservation")
+    return result
+
+
+def resident(label: str, count: int, fn) -> None:
+    gc.collect()
+    tracemalloc.start()
+    held = fn()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<40} {size / 1e6:7.0f} MB  {size / count:8.0f} bytes/reservation")
+    del held
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reservations", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-record-")
+    store = ReservationStore(os.path.join(workdir, "records.db"))
+    start = time.perf_counter()
+    store.insert_many(synthetic_reservations(args.reservations, random.Random(18)))
+    print(f"inserted {args.reservations:,} reservations in {time.perf_counter() - start:.1f}s")
+
+    conn = store._connection()
+
+    def fetch_all(decode):
+        return [decode(row) for row in conn.execute("SELECT * FROM reservations")]
+
+    count = args.reservations
+    print("\nmemory held")
+    resident("dict", count, lambda: fetch_all(decode_dict))
+    resident("ReservationRecord", count, lambda: fetch_all(decode_record))
+
+    print("\nread and decode every row")
+    dicts = timed("dict", count, lambda: fetch_all(decode_dict))
+    records = timed("ReservationRecord", count, lambda: fetch_all(decode_record))
+
+    if [dict(record) for record in records[:1000]] != dicts[:1000]:
+        raise SystemExit("ReservationRecord fields differ from the dict")
+
+    # modify_reservation check_out_date: nights between check-in and a new check-out
+    new_check_out = "2028-01-31"
+    print("\nnights after a check-out change")
+    timed(
+        "strptime both dates",
+        count,
+        lambda: [
+            (datetime.strptime(new_check_out, "%Y-%m-%d") - datetime.strptime(r["check_in"], "%Y-%m-%d")).days
+            for r in dicts
+        ],
+    )
+    timed(
+        "ordinal subtraction",
+        count,
+        lambda: [
+            datetime.strptime(new_check_out, "%Y-%m-%d").date().toordinal() - r.check_in_ordinal for r in records
+        ],
+    )
+
+    # _calculate_cancellation_fee: hours until check-in
+    now = datetime(2026, 6, 1, 12)
+    print("\nhours until check-in")
+    timed(
+        "strptime",
+        count,
+        lambda: [(datetime.strptime(r["check_in"], "%Y-%m-%d") - now).total_seconds() / 3600 for r in dicts],
+    )
+    timed(
+        "fromordinal",
+        count,
+        lambda: [(datetime.fromordinal(r.check_in_ordinal) - now).total_seconds() / 3600 for r in records],
+    )
+
+    print("\nreservations checking in during June 2026")
+    june = (date(2026, 6, 1).isoformat(), date(2026, 7, 1).isoformat())
+    first, last = date(2026, 6, 1).toordinal(), date(2026, 7, 1).toordinal()
+    timed("compare date strings", count, lambda: [r for r in dicts if june[0] <= r["check_in"] < june[1]])
+    timed("compare ordinals", count, lambda: [r for r in records if first <= r.check_in_ordinal < last])
+
+
+if __name__ == "__main__":
+    main()
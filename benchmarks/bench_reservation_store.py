@@ -0,0 +1,120 @@
+"""
+Benchmark: reservation store lookup and mutation throughput.
+
+Fills a temporary SQLite store with synthetic reservations (a million by
+default), then times point lookups, indexed queries on last name and check-in
+date, the lookup_reservation function end to end, and single-row updates,
+cancellations and callback requests, each committed on its own as a live call
+would.
+
+Run from the repository root:
+    python -m benchmarks.bench_reservation_store --reservations 1000000
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+LAST_NAMES = [
+    "smith", "johnson", "williams", "brown", "jones", "garcia", "miller", "davis",
+    "rodriguez", "martinez", "hernandez", "lopez", "gonzalez", "wilson", "anderson",
+    "thomas", "taylor", "moore", "jackson", "martin", "lee", "perez", "thompson",
+    "white", "harris", "sanchez", "clark", "ramirez", "lewis", "robinson", "chen",
+]
+ROOMS = {"standard": 149.0, "deluxe": 199.0, "suite": 349.0, "penthouse": 699.0}
+
+
+def synthetic_reservations(count: int, rng: random.Random):
+    first_day = date(2026, 1, 1)
+    room_types = list(ROOMS)
+    for n in range(count):
+        # Surname plus a numeric suffix gives ~count/31 distinct names per stem
+        last_name = f"{rng.choice(LAST_NAMES)}{n % 997}"
+        check_in = first_day + timedelta(days=rng.randrange(730))
+        nights = rng.randint(1, 7)
+        room_type = rng.choice(room_types)
+        yield f"GH-{n:07d}", {
+            "guest_name": f"Guest {last_name.title()}",
+            "last_name": last_name,
+            "phone": "+1-555-000-0000",
+            "email": "guest@example.com",
+            "check_in": check_in.isoformat(),
+            "check_out": (check_in + timedelta(days=nights)).isoformat(),
+            "room_type": room_type,
+            "room_number": str(100 + n % 1000),
+            "guests": 2,
+            "nights": nights,
+            "rate_per_night": ROOMS[room_type],
+            "total_cost": nights * ROOMS[room_type],
+            "status": "confirmed",
+            "special_requests": [],
+            "created_at": "2025-12-01",
+            "payment_status": "paid",
+        }
+
+
+def timed(label: str, operations: int, fn) -> None:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {operations / elapsed:>10,.0f} ops/s  {elapsed / operations * 1e6:>8.1f} us/op")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--reservations", type=int, default=1_000_000)
+    parser.add_argument("--operations", type=int, default=20_000, help="Operations per read benchmark")
+    parser.add_argument("--writes", type=int, default=2_000, help="Operations per write benchmark")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-store-")
+    # hotel_functions opens its own store at import; keep it out of the working tree
+    os.environ["RESERVATIONS_DB_PATH"] = os.path.join(workdir, "seed.db")
+    import hotel_functions
+    from reservation_store import ReservationStore
+
+    store = ReservationStore(os.path.join(workdir, "bench.db"))
+    hotel_functions.STORE = store
+    rng = random.Random(11)
+
+    start = time.perf_counter()
+    store.insert_many(synthetic_reservations(args.reservations, rng))
+    elapsed = time.perf_counter() - start
+    size_mb = os.path.getsize(store.path) / 1e6
+    print(f"loaded {args.reservations:,} reservations in {elapsed:.1f}s ({size_mb:.0f} MB on disk)")
+
+    conf_nums = [f"GH-{rng.randrange(args.reservations):07d}" for _ in range(args.operations)]
+    names = [store.get(conf)["last_name"] for conf in conf_nums[:1000]]
+
+    timed("get by confirmation number", len(conf_nums), lambda: [store.get(c) for c in conf_nums])
+    timed("find by last name", len(names), lambda: [store.find_by_last_name(n) for n in names])
+
+    days = [(date(2026, 1, 1) + timedelta(days=rng.randrange(730))).isoformat() for _ in range(200)]
+    next_days = [(date.fromisoformat(d) + timedelta(days=1)).isoformat() for d in days]
+    timed("find by check-in day", len(days), lambda: [store.find_by_check_in(d, e) for d, e in zip(days, next_days)])
+
+    lookups = [(c, store.get(c)["last_name"]) for c in conf_nums[: args.writes]]
+    timed("lookup_reservation()", len(lookups), lambda: [hotel_functions.lookup_reservation(c, n) for c, n in lookups])
+
+    timed(
+        "update (add special request)",
+        len(lookups),
+        lambda: [store.update(c, {"special_requests": ["High floor"], "guests": 3}) for c, _ in lookups],
+    )
+    timed(
+        "cancel",
+        len(lookups),
+        lambda: [store.cancel(c, {"cancellation_ref": f"CXL-{c}", "refund_type": "full_refund"}) for c, _ in lookups],
+    )
+    callback = {"guest_name": "Guest", "phone_number": "+1-555-000-0000", "issue_description": "bench",
+                "requested_at": "2026-01-01 09:00", "status": "pending"}
+    timed("add callback", args.writes, lambda: [store.add_callback(callback) for _ in range(args.writes)])
+
+    print(f"status counts: {store.count_by_status()}")
+
+
+if __name__ == "__main__":
+    main()
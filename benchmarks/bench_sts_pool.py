@@ -0,0 +1,83 @@
+"""
+Benchmark: time to first greeting audio, cold connect vs pre-warmed pool.
+
+Starts a local Deepgram stand-in whose opening handshake is delayed to mimic
+the network round trips to agent.deepgram.com, then measures the time from a
+call arriving to the first greeting audio byte with and without StsPool.
+
+Run from the repository root:
+    python -m benchmarks.bench_sts_pool --calls 50 --handshake-ms 150
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("DEEPGRAM_API_KEY", "benchmark")
+
+import main  # noqa: E402
+from benchmarks.fake_deepgram import FakeDeepgram  # noqa: E402
+from sts_pool import StsPool  # noqa: E402
+
+
+async def time_to_first_audio(acquire, settings: str) -> float:
+    start = time.perf_counter()
+    ws = await acquire()
+    await ws.send(settings)
+    async for message in ws:
+        if not isinstance(message, str):
+            break
+    elapsed = time.perf_counter() - start
+    await ws.close()
+    return elapsed
+
+
+def report(name: str, samples: list) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{name:<6} mean={statistics.mean(samples) * 1000:7.1f} ms  "
+        f"p50={statistics.median(samples) * 1000:7.1f} ms  p95={p95 * 1000:7.1f} ms"
+    )
+
+
+async def run(calls: int, handshake_ms: float, gap_ms: float) -> None:
+    fake = await FakeDeepgram(handshake_delay=handshake_ms / 1000).start()
+    main.DEEPGRAM_AGENT_URL = fake.url
+    settings = main.settings_cache.get().payload.decode("utf-8")
+
+    cold = []
+    for _ in range(calls):
+        cold.append(await time_to_first_audio(main.sts_connect, settings))
+
+    pool = StsPool(main.sts_connect, size=4, refill_rate=50)
+    pool.start()
+    await asyncio.sleep(0.5)
+
+    warm = []
+    for _ in range(calls):
+        # Calls arrive with a gap, giving the pool time to refill
+        await asyncio.sleep(gap_ms / 1000)
+        warm.append(await time_to_first_audio(pool.acquire, settings))
+
+    report("cold", cold)
+    report("pooled", warm)
+    print(f"pool: {pool.stats()}")
+
+    await pool.close()
+    await fake.stop()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--handshake-ms", type=float, default=150, help="Simulated handshake latency")
+    parser.add_argument("--gap-ms", type=float, default=100, help="Time between pooled calls")
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.handshake_ms, args.gap_ms))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,116 @@
+"""
+Benchmark: routing calls to hundreds of tenants.
+
+Writes --tenants tenant files to a temporary directory, each with its own
+prompt, greeting, keyterms, phone number and hotel information, then routes
+calls to them by called number through a TenantRegistry. Reports the cost
+of a call's first routing (compiling the tenant: parsing, merging,
+validating and serializing its Settings, building its get_hotel_info
+answers and opening its reservation store) against a cached one, and the
+cache hit rate and memory for --calls calls spread over the tenants the way
+call volume usually is, a few busy properties and a long tail.
+
+Run from the repository root:
+    python -m benchmarks.bench_tenants --tenants 500 --cache-mb 16
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from hotel_functions import FUNCTION_MAP, HOTEL_INFO
+from settings_cache import SettingsCache
+from tenants import TenantRegistry
+
+
+def write_tenants(directory: str, count: int) -> list:
+    """Tenant files for `count` properties; returns their phone numbers."""
+    numbers = []
+    for index in range(count):
+        name = f"Property {index}"
+        info = copy.deepcopy(HOTEL_INFO)
+        info["name"] = name
+        number = f"+1415{index:07d}"
+        tenant = {
+            "numbers": [number],
+            "settings": {
+                "agent": {
+                    "greeting": f"Thank you for calling {name}, how may I help you?",
+                    "think": {"prompt": f"You are a customer service representative for {name}."},
+                    "listen": {"provider": {"keyterms": ["reservation", "cancel", name]}},
+                }
+            },
+            "hotel_info": info,
+        }
+        with open(os.path.join(directory, f"property-{index}.json"), "w") as f:
+            json.dump(tenant, f)
+        numbers.append(number)
+    return numbers
+
+
+def start_event(number: str) -> dict:
+    return {"streamSid": "MZ0", "customParameters": {"to": number}}
+
+
+async def run(args, directory: str) -> None:
+    numbers = write_tenants(directory, args.tenants)
+    registry = TenantRegistry(
+        directory,
+        SettingsCache("config.json", known_functions=FUNCTION_MAP),
+        known_functions=FUNCTION_MAP,
+        max_bytes=int(args.cache_mb * 2**20),
+    )
+
+    # First call to each tenant compiles it; the next is a cache hit
+    sample = numbers[: min(len(numbers), 50)]
+    compiles = []
+    hits = []
+    for number in sample:
+        start = time.perf_counter()
+        await registry.resolve(start_event(number))
+        compiles.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        await registry.resolve(start_event(number))
+        hits.append(time.perf_counter() - start)
+    print(f"first call to a tenant (compile): {statistics.median(compiles) * 1000:8.2f} ms median")
+    print(f"later calls (cached):             {statistics.median(hits) * 1e6:8.2f} us median")
+
+    # Call volume falls off with a property's rank
+    weights = [1 / (rank + 1) for rank in range(len(numbers))]
+    calls = random.Random(1).choices(numbers, weights, k=args.calls)
+    before = registry.stats()
+    started = time.perf_counter()
+    for number in calls:
+        await registry.resolve(start_event(number))
+    elapsed = time.perf_counter() - started
+
+    stats = registry.stats()
+    hit_count = stats["hits"] - before["hits"]
+    print(
+        f"{args.calls} calls over {args.tenants} tenants: {hit_count / args.calls * 100:.1f}% cached, "
+        f"{elapsed / args.calls * 1e6:.1f} us per call, {stats['evictions']} evictions"
+    )
+    print(
+        f"cache: {stats['cached']} tenants in {stats['cached_bytes'] / 2**20:.2f} MiB "
+        f"(limit {args.cache_mb} MiB), {stats['cached_bytes'] / max(stats['cached'], 1) / 1024:.0f} KiB per tenant"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tenants", type=int, default=500, help="Number of tenant files")
+    parser.add_argument("--calls", type=int, default=10000, help="Calls to route after the first-call measurement")
+    parser.add_argument("--cache-mb", type=float, default=16, help="TENANT_CACHE_MB for the registry")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, directory))
+
+
+if __name__ == "__main__":
+    main()
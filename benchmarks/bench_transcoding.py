@@ -0,0 +1,80 @@
+"""
+Benchmark: CPU cost of transcoding call audio per call.
+
+Streams synthetic call audio through the Transcoders a call gets for each
+Settings audio format, in the chunk sizes the server sees: caller audio in
+400 ms chunks as twilio_receiver frames it, agent audio in --outbound-ms
+chunks as Deepgram sends it. Reports the CPU per second of call audio in
+each direction and the share of one core a call costs, next to 8 kHz mulaw,
+which needs no transcoding at all.
+
+Run from the repository root:
+    python -m benchmarks.bench_transcoding --seconds 60
+"""
+
+import argparse
+import math
+import time
+
+from transcoding import TELEPHONY_FORMAT, make_transcoder
+
+# main.twilio_receiver hands the sender 20 Twilio packets of 160 bytes at a time
+INBOUND_CHUNK_SECONDS = 0.4
+FORMATS = (
+    ("mulaw", 8000),
+    ("alaw", 8000),
+    ("linear16", 8000),
+    ("linear16", 16000),
+    ("linear16", 24000),
+    ("linear16", 48000),
+)
+
+
+def synthetic_audio(audio_format: tuple, seconds: float) -> bytes:
+    """A speech-band mix of tones at a talking level, in `audio_format`."""
+    rate = audio_format[1]
+    samples = [
+        int(6000 * math.sin(2 * math.pi * 220 * n / rate) + 2500 * math.sin(2 * math.pi * 1700 * n / rate))
+        for n in range(int(seconds * rate))
+    ]
+    linear = b"".join(sample.to_bytes(2, "little", signed=True) for sample in samples)
+    transcoder = make_transcoder(("linear16", rate), audio_format)
+    return transcoder.convert(linear) if transcoder is not None else linear
+
+
+def chunks(audio: bytes, audio_format: tuple, seconds: float) -> list:
+    size = int(audio_format[1] * seconds) * (2 if audio_format[0] == "linear16" else 1)
+    return [audio[i : i + size] for i in range(0, len(audio), size)]
+
+
+def cpu_per_second(transcoder, pieces: list, seconds: int) -> float:
+    """CPU seconds spent per second of audio converting `pieces`."""
+    if transcoder is None:
+        return 0.0
+    start = time.process_time()
+    for piece in pieces:
+        transcoder.convert(piece)
+    return (time.process_time() - start) / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=int, default=60, help="Seconds of call audio per direction")
+    parser.add_argument("--outbound-ms", type=int, default=20, help="Size of the agent audio chunks Deepgram sends")
+    args = parser.parse_args()
+
+    caller = chunks(synthetic_audio(TELEPHONY_FORMAT, args.seconds), TELEPHONY_FORMAT, INBOUND_CHUNK_SECONDS)
+    print(f"{'Settings format':<16} {'inbound us/s':>13} {'outbound us/s':>14} {'% of a core':>12} {'calls per core':>15}")
+    for audio_format in FORMATS:
+        inbound = cpu_per_second(make_transcoder(TELEPHONY_FORMAT, audio_format), caller, args.seconds)
+        agent = chunks(synthetic_audio(audio_format, args.seconds), audio_format, args.outbound_ms / 1000)
+        outbound = cpu_per_second(make_transcoder(audio_format, TELEPHONY_FORMAT), agent, args.seconds)
+        total = inbound + outbound
+        calls = f"{int(1 / total):>15}" if total else f"{'-':>15}"
+        print(
+            f"{'%s/%d' % audio_format:<16} {inbound * 1e6:13.1f} {outbound * 1e6:14.1f} {total * 100:11.3f}% {calls}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: CPU cost of the local energy VAD per call.
+
+Feeds synthetic 8 kHz mulaw audio (alternating line noise and a loud voiced
+tone) through EnergyVAD in 20 ms Twilio packets and reports the CPU time per
+frame, per second of call audio, and the share of one core a call costs.
+
+Run from the repository root:
+    python -m benchmarks.bench_vad --seconds 600
+"""
+
+import argparse
+import math
+import random
+import time
+
+from vad import EnergyVAD
+
+SAMPLE_RATE = 8000
+FRAME_SAMPLES = 160
+
+
+def linear_to_mulaw(sample: int) -> int:
+    """Encode one 16-bit linear sample as G.711 mulaw."""
+    sign = 0x80 if sample < 0 else 0
+    sample = min(abs(sample), 32635) + 0x84
+    exponent = max(sample.bit_length() - 8, 0)
+    mantissa = (sample >> (exponent + 3)) & 0x0F
+    return ~(sign | (exponent << 4) | mantissa) & 0xFF
+
+
+def synthetic_call(seconds: int) -> list:
+    """Two seconds of line noise, then one second of speech-like tone, repeated."""
+    rng = random.Random(7)
+    frames = []
+    for index in range(seconds * SAMPLE_RATE // FRAME_SAMPLES):
+        talking = (index // 50) % 3 == 2
+        samples = []
+        for n in range(FRAME_SAMPLES):
+            value = rng.gauss(0, 60)
+            if talking:
+                value += 8000 * math.sin(2 * math.pi * 220 * (index * FRAME_SAMPLES + n) / SAMPLE_RATE)
+            samples.append(linear_to_mulaw(int(value)))
+        frames.append(bytes(samples))
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=int, default=600, help="Seconds of call audio to analyse")
+    args = parser.parse_args()
+
+    frames = synthetic_call(args.seconds)
+    vad = EnergyVAD()
+    process = vad.process
+
+    start = time.process_time()
+    for frame in frames:
+        process(frame)
+    elapsed = time.process_time() - start
+
+    per_call_second = elapsed / args.seconds
+    print(f"frames analysed:        {len(frames)}")
+    print(f"speech starts detected: {vad.speech_starts} (expected {args.seconds // 3})")
+    print(f"CPU per 20 ms frame:    {elapsed / len(frames) * 1e6:.2f} us")
+    print(f"CPU per call-second:    {per_call_second * 1e6:.1f} us ({per_call_second * 100:.3f}% of one core per call)")
+    print(f"calls per core (VAD):   {int(1 / per_call_second)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Local stand-in for the Deepgram Voice Agent API.
+
+Speaks just enough of the agent protocol for benchmarks: it answers Settings
+with SettingsApplied and a short greeting, and can delay the opening
+handshake to mimic the TCP/TLS round trips to agent.deepgram.com.
+
+ScriptedDeepgram additionally echoes caller audio back as agent speech and
+interrupts itself on a schedule with UserStartedSpeaking and
+FunctionCallRequest messages, for load tests. ReplayDeepgram plays back what
+Deepgram sent in a recorded session.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+
+import websockets
+
+from session_recording import RECEIVED_AUDIO, RECEIVED_TEXT, SENT_TEXT
+
+GREETING_AUDIO = b"\xff" * 3200
+
+
+class FakeDeepgram:
+    def __init__(self, handshake_delay: float = 0.0, greeting: bytes = GREETING_AUDIO):
+        self.handshake_delay = handshake_delay
+        self.greeting = greeting
+        self.server = None
+        self.sessions = 0
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeDeepgram":
+        self.server = await websockets.serve(
+            self.handle,
+            host,
+            port,
+            subprotocols=["token"],
+            process_request=self._delay_handshake,
+            compression=None,
+        )
+        return self
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _delay_handshake(self, connection, request):
+        if self.handshake_delay:
+            await asyncio.sleep(self.handshake_delay)
+        return None
+
+    async def on_settings(self, ws, settings: dict) -> None:
+        await ws.send(json.dumps({"type": "SettingsApplied"}))
+        await ws.send(json.dumps({"type": "AgentStartedSpeaking"}))
+        await ws.send(self.greeting)
+        await ws.send(json.dumps({"type": "AgentAudioDone"}))
+
+    async def on_audio(self, ws, audio: bytes) -> None:
+        pass
+
+    async def handle(self, ws) -> None:
+        self.sessions += 1
+        try:
+            async for message in ws:
+                if isinstance(message, str):
+                    decoded = json.loads(message)
+                    if decoded.get("type") == "Settings":
+                        await self.on_settings(ws, decoded)
+                else:
+                    await self.on_audio(ws, message)
+        except websockets.ConnectionClosed:
+            pass
+
+
+# One lookup every cycle; the arguments match a reservation in hotel_functions
+LOOKUP_CALL = {
+    "name": "lookup_reservation",
+    "arguments": json.dumps({"confirmation_number": "GH-78432", "last_name": "Smith"}),
+}
+
+
+class ScriptedDeepgram(FakeDeepgram):
+    """
+    Echoes every audio chunk it receives and replays a per-session script.
+
+    Args:
+        script: (seconds after Settings, action) pairs, action being
+            'function_call' or 'barge_in'
+        period: The script repeats every `period` seconds for the whole session
+        on_session: Called with (first audio chunk, session) when a session
+            receives audio, so the caller can correlate sessions with calls
+
+    A session records the round trip of each function call and the send time
+    of each barge-in in `function_rtts` and `barge_ins`.
+    """
+
+    def __init__(self, script=((2.0, "function_call"), (4.0, "barge_in")), period: float = 6.0, on_session=None, **kwargs):
+        super().__init__(**kwargs)
+        self.script = script
+        self.period = period
+        self.on_session = on_session
+        self._function_ids = itertools.count()
+
+    async def _run_script(self, ws, session: dict) -> None:
+        started = time.monotonic()
+        for cycle in itertools.count():
+            for offset, action in self.script:
+                await asyncio.sleep(max(0.0, started + cycle * self.period + offset - time.monotonic()))
+                if action == "function_call":
+                    function_id = f"fc-{next(self._function_ids)}"
+                    session["pending_calls"][function_id] = time.monotonic()
+                    await ws.send(json.dumps({
+                        "type": "FunctionCallRequest",
+                        "functions": [dict(LOOKUP_CALL, id=function_id, client_side=True)],
+                    }))
+                elif action == "barge_in":
+                    session["barge_ins"].append(time.monotonic())
+                    session["interrupted"] = True
+                    await ws.send(json.dumps({"type": "UserStartedSpeaking"}))
+
+    async def handle(self, ws) -> None:
+        self.sessions += 1
+        session = {"pending_calls": {}, "function_rtts": [], "barge_ins": [], "interrupted": False, "call": None}
+        script = None
+        try:
+            async for message in ws:
+                if isinstance(message, str):
+                    decoded = json.loads(message)
+                    if decoded.get("type") == "Settings":
+                        await self.on_settings(ws, decoded)
+                        script = asyncio.ensure_future(self._run_script(ws, session))
+                    elif decoded.get("type") == "FunctionCallResponse":
+                        sent_at = session["pending_calls"].pop(decoded.get("id"), None)
+                        if sent_at is not None:
+                            session["function_rtts"].append(time.monotonic() - sent_at)
+                    continue
+
+                if session["call"] is None and self.on_session is not None:
+                    session["call"] = self.on_session(message, session)
+                if session["interrupted"]:
+                    # The server discards agent audio after a barge-in until the next turn starts
+                    session["interrupted"] = False
+                    await ws.send(json.dumps({"type": "AgentStartedSpeaking"}))
+                await ws.send(message)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if script is not None:
+                script.cancel()
+
+
+class ReplayDeepgram(FakeDeepgram):
+    """
+    Sends what Deepgram sent in a recorded session, at the recorded times.
+
+    Playback starts when Settings arrive; each message goes out at its
+    recorded offset from the Settings message, divided by `speed`. Like
+    ScriptedDeepgram, each session records function call round trips and
+    barge-in send times; `call` is whatever on_session returns.
+
+    Args:
+        records: (kind, seconds, payload) from session_recording.read_recording
+        speed: Play back this many times faster than recorded
+        on_session: Called with the session dict when Settings arrive
+    """
+
+    def __init__(self, records, speed: float = 1.0, on_session=None, **kwargs):
+        super().__init__(**kwargs)
+        self.on_session = on_session
+        settings_at = next((seconds for kind, seconds, _ in records if kind == SENT_TEXT), 0.0)
+        # (send offset, payload, message type or None for audio, function call ids)
+        self.playback = []
+        for kind, seconds, payload in records:
+            if kind not in (RECEIVED_TEXT, RECEIVED_AUDIO):
+                continue
+            message_type, function_ids = None, ()
+            if kind == RECEIVED_TEXT:
+                decoded = json.loads(payload)
+                message_type = decoded.get("type")
+                if message_type == "FunctionCallRequest":
+                    function_ids = tuple(function["id"] for function in decoded.get("functions", ()))
+            self.playback.append((max(seconds - settings_at, 0.0) / speed, payload, message_type, function_ids))
+
+    async def _play(self, ws, session: dict) -> None:
+        started = time.monotonic()
+        for offset, payload, message_type, function_ids in self.playback:
+            await asyncio.sleep(max(0.0, started + offset - time.monotonic()))
+            now = time.monotonic()
+            for function_id in function_ids:
+                session["pending_calls"][function_id] = now
+            if message_type == "UserStartedSpeaking":
+                session["barge_ins"].append(now)
+            await ws.send(payload)
+
+    async def handle(self, ws) -> None:
+        self.sessions += 1
+        session = {"pending_calls": {}, "function_rtts": [], "barge_ins": [], "call": None}
+        player = None
+        try:
+            async for message in ws:
+                if not isinstance(message, str):
+                    continue
+                decoded = json.loads(message)
+                if decoded.get("type") == "Settings" and player is None:
+                    if self.on_session is not None:
+                        session["call"] = self.on_session(session)
+                    player = asyncio.ensure_future(self._play(ws, session))
+                elif decoded.get("type") == "FunctionCallResponse":
+                    sent_at = session["pending_calls"].pop(decoded.get("id"), None)
+                    if sent_at is not None:
+                        session["function_rtts"].append(time.monotonic() - sent_at)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if player is not None:
+                player.cancel()
@@ -0,0 +1,177 @@
+"""
+Local stand-in for a Twilio Media Streams client.
+
+Plays 8 kHz mulaw audio to the server as `start`, `media` and `stop` events
+in real time (one 20 ms packet every 20 ms, against absolute deadlines) and
+records what comes back: time to first agent audio, the gaps between
+outbound media frames, `clear` events, and the round trip of marker packets
+that an echoing agent sends back through the server's outbound pacer.
+"""
+
+import asyncio
+import base64
+import json
+import time
+
+import websockets
+
+PACKET_SIZE = 160
+PACKET_DURATION = 0.02
+# The first packet of a call identifies it to ScriptedDeepgram
+CALL_HEADER = b"CALL"
+MARKER_HEADER = b"MARK"
+
+
+def load_mulaw(path: str) -> bytes:
+    """Read raw 8 kHz mulaw, or the data chunk of a mulaw WAV file."""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] == b"RIFF":
+        offset = 12
+        while offset + 8 <= len(data):
+            chunk_id = data[offset:offset + 4]
+            chunk_size = int.from_bytes(data[offset + 4:offset + 8], "little")
+            if chunk_id == b"data":
+                return data[offset + 8:offset + 8 + chunk_size]
+            offset += 8 + chunk_size + (chunk_size & 1)
+        raise ValueError(f"{path} has no data chunk")
+    return data
+
+
+def call_id_from_audio(chunk: bytes):
+    """The call id carried by the first packet of a call, or None."""
+    if chunk[:4] != CALL_HEADER:
+        return None
+    return int.from_bytes(chunk[4:8], "big")
+
+
+def _packet(header: bytes, number: int) -> bytes:
+    # Silence-padded so the packet is still valid audio
+    return (header + number.to_bytes(4, "big")).ljust(PACKET_SIZE, b"\xff")
+
+
+class FakeTwilioCall:
+    """
+    One simulated phone call.
+
+    Args:
+        call_id: Number carried in the first packet so the agent side can find this call
+        audio: mulaw audio to play, looped for the length of the call
+        duration: Seconds of audio to stream before sending `stop`
+        marker_interval: Seconds between marker packets used to time the echo round trip
+        speed: Play the audio this many times faster than real time
+    """
+
+    def __init__(self, call_id: int, audio: bytes, duration: float, marker_interval: float = 1.0, speed: float = 1.0):
+        self.call_id = call_id
+        # Whole packets only, so looping never splits one
+        self.audio = audio.ljust(-(-len(audio) // PACKET_SIZE) * PACKET_SIZE, b"\xff")
+        self.duration = duration
+        self.marker_interval = marker_interval
+        self.speed = speed
+        self.stream_sid = f"MZloadtest{call_id:08d}"
+
+        # Results, in seconds on the monotonic clock
+        self.connected_at = None
+        self.finished_at = None
+        self.time_to_first_audio = None
+        self.frames_sent = 0
+        self.frames_received = 0
+        self.frame_gaps = []
+        self.echo_rtts = []
+        self.clears = []
+        self.error = None
+        self._markers = {}
+
+    async def run(self, url: str) -> "FakeTwilioCall":
+        try:
+            async with websockets.connect(url, compression=None, open_timeout=30) as ws:
+                self.connected_at = time.monotonic()
+                receiver = asyncio.ensure_future(self._receive(ws))
+                try:
+                    await self._stream(ws)
+                    # The server hangs up once it has seen `stop`
+                    await asyncio.wait_for(receiver, 5)
+                finally:
+                    receiver.cancel()
+        except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+            self.error = f"{type(e).__name__}: {e}"
+        self.finished_at = time.monotonic()
+        return self
+
+    async def _stream(self, ws) -> None:
+        await ws.send(json.dumps({"event": "connected", "protocol": "Call", "version": "1.0.0"}))
+        await ws.send(json.dumps({
+            "event": "start",
+            "sequenceNumber": "1",
+            "start": {
+                "streamSid": self.stream_sid,
+                "callSid": f"CAloadtest{self.call_id:08d}",
+                "tracks": ["inbound"],
+                "mediaFormat": {"encoding": "audio/x-mulaw", "sampleRate": 8000, "channels": 1},
+                "customParameters": {},
+            },
+            "streamSid": self.stream_sid,
+        }))
+
+        packets = int(self.duration / PACKET_DURATION)
+        marker_every = max(1, int(self.marker_interval / PACKET_DURATION))
+        audio, position = self.audio, 0
+        deadline = time.monotonic()
+
+        for number in range(packets):
+            if number == 0:
+                packet = _packet(CALL_HEADER, self.call_id)
+            elif number % marker_every == 0:
+                packet = _packet(MARKER_HEADER, number)
+                self._markers[number] = time.monotonic()
+            else:
+                packet = audio[position:position + PACKET_SIZE]
+                position = (position + PACKET_SIZE) % len(audio)
+
+            await ws.send(json.dumps({
+                "event": "media",
+                "sequenceNumber": str(number + 2),
+                "media": {
+                    "track": "inbound",
+                    "chunk": str(number + 1),
+                    "timestamp": str(number * 20),
+                    "payload": base64.b64encode(packet).decode("ascii"),
+                },
+                "streamSid": self.stream_sid,
+            }))
+            self.frames_sent += 1
+
+            deadline += PACKET_DURATION / self.speed
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+
+        await ws.send(json.dumps({"event": "stop", "sequenceNumber": str(packets + 2), "streamSid": self.stream_sid}))
+
+    async def _receive(self, ws) -> None:
+        last_frame = None
+        try:
+            async for message in ws:
+                now = time.monotonic()
+                data = json.loads(message)
+                event = data.get("event")
+
+                if event == "media":
+                    self.frames_received += 1
+                    if self.time_to_first_audio is None:
+                        self.time_to_first_audio = now - self.connected_at
+                    if last_frame is not None:
+                        self.frame_gaps.append(now - last_frame)
+                    last_frame = now
+
+                    # 12 base64 characters decode to the 9-byte marker header
+                    head = base64.b64decode(data["media"]["payload"][:12])
+                    if head[:4] == MARKER_HEADER:
+                        sent_at = self._markers.pop(int.from_bytes(head[4:8], "big"), None)
+                        if sent_at is not None:
+                            self.echo_rtts.append(now - sent_at)
+                elif event == "clear":
+                    self.clears.append(now)
+                    # A gap across an intentional flush is not jitter
+                    last_frame = None
+        except websockets.ConnectionClosed:
+            pass
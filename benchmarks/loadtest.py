@@ -0,0 +1,201 @@
+"""
+Load test: how many concurrent calls one server process sustains.
+
+Runs main.py in a child process, pointed at a ScriptedDeepgram stand-in that
+echoes caller audio and sends a FunctionCallRequest and a UserStartedSpeaking
+every cycle. Fake Twilio calls stream mulaw in real time; each ramp step
+starts N calls, waits for them to finish and reports:
+
+- throughput: completed calls and media frames per second in each direction
+- tail latency: time to first audio, echo round trip through the outbound
+  pacer, function call round trip, barge-in to `clear`, outbound frame gaps
+- CPU and memory per call, read from the server's own /metrics endpoint
+
+Run from the repository root:
+    python -m benchmarks.loadtest --ramp 10,50,100 --duration 20
+    python -m benchmarks.loadtest --ramp 25 --audio caller.ulaw
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_vad import synthetic_call
+from benchmarks.fake_deepgram import ScriptedDeepgram
+from benchmarks.fake_twilio import FakeTwilioCall, call_id_from_audio, load_mulaw
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def scrape(port: int) -> dict:
+    """Unlabelled samples from the server's /metrics endpoint."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    body = (await reader.read()).decode("utf-8").split("\r\n\r\n", 1)[1]
+    writer.close()
+
+    samples = {}
+    for line in body.splitlines():
+        if line and not line.startswith("#") and "{" not in line:
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+async def start_server(deepgram_url: str, server_port: int, metrics_port: int, pool_size: int):
+    env = dict(
+        os.environ,
+        DEEPGRAM_API_KEY="loadtest",
+        DEEPGRAM_AGENT_URL=deepgram_url,
+        SERVER_HOST="127.0.0.1",
+        SERVER_PORT=str(server_port),
+        METRICS_HOST="127.0.0.1",
+        METRICS_PORT=str(metrics_port),
+        STS_POOL_SIZE=str(pool_size),
+        # The calls book rooms; keep them out of the repository's reservations.db
+        RESERVATIONS_DB_PATH=os.path.join(tempfile.mkdtemp(prefix="loadtest-"), "reservations.db"),
+    )
+    server = await asyncio.create_subprocess_exec(
+        sys.executable, "main.py", cwd=ROOT, env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL,
+    )
+
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", server_port)
+            writer.close()
+            return server
+        except OSError:
+            if server.returncode is not None:
+                break
+            await asyncio.sleep(0.1)
+    raise RuntimeError("main.py did not start; run it directly to see why")
+
+
+def percentiles(samples: list) -> str:
+    if not samples:
+        return f"{'-':>15}"
+    samples = sorted(samples)
+    p50 = samples[len(samples) // 2]
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"{p50 * 1000:6.0f}/{p99 * 1000:<6.0f}ms"
+
+
+def barge_in_latencies(sessions: list) -> list:
+    """Time from each UserStartedSpeaking to the first `clear` the call received after it."""
+    latencies = []
+    for session in sessions:
+        call = session["call"]
+        if call is None:
+            continue
+        clears = iter(call.clears)
+        clear = next(clears, None)
+        for sent_at in session["barge_ins"]:
+            while clear is not None and clear < sent_at:
+                clear = next(clears, None)
+            if clear is None:
+                break
+            latencies.append(clear - sent_at)
+    return latencies
+
+
+async def run_step(concurrency: int, args, audio: bytes, deepgram, calls: dict, first_id: int) -> None:
+    before = await scrape(args.metrics_port)
+    peak_rss = before["voice_agent_process_resident_memory_bytes"]
+    sessions = []
+    deepgram.on_session = lambda chunk, session: sessions.append(session) or calls.get(call_id_from_audio(chunk))
+
+    step = [FakeTwilioCall(first_id + n, audio, args.duration, args.marker_interval) for n in range(concurrency)]
+    calls.update((call.call_id, call) for call in step)
+
+    async def start_staggered(index: int, call: FakeTwilioCall):
+        await asyncio.sleep(args.stagger * index / concurrency)
+        return await call.run(f"ws://127.0.0.1:{args.server_port}")
+
+    started = time.monotonic()
+    running = asyncio.ensure_future(asyncio.gather(*(start_staggered(i, c) for i, c in enumerate(step))))
+    while not running.done():
+        await asyncio.wait([running], timeout=1.0)
+        peak_rss = max(peak_rss, (await scrape(args.metrics_port))["voice_agent_process_resident_memory_bytes"])
+    elapsed = time.monotonic() - started
+    after = await scrape(args.metrics_port)
+
+    ok = [call for call in step if call.error is None and call.time_to_first_audio is not None]
+    call_seconds = sum(call.finished_at - call.connected_at for call in ok) or 1.0
+    cpu = after["voice_agent_process_cpu_seconds_total"] - before["voice_agent_process_cpu_seconds_total"]
+    gaps = sorted(gap for call in ok for gap in call.frame_gaps)
+
+    print(
+        f"{concurrency:>5} {len(ok):>5} {concurrency - len(ok):>4} "
+        f"{len(ok) / elapsed:8.2f} "
+        f"{sum(c.frames_sent for c in ok) / elapsed:8.0f} {sum(c.frames_received for c in ok) / elapsed:8.0f}  "
+        f"{percentiles([c.time_to_first_audio for c in ok])} "
+        f"{percentiles([rtt for c in ok for rtt in c.echo_rtts])} "
+        f"{percentiles([rtt for s in sessions for rtt in s['function_rtts']])} "
+        f"{percentiles(barge_in_latencies(sessions))} "
+        f"{(gaps[int(len(gaps) * 0.99)] * 1000 if gaps else 0):7.1f}ms "
+        f"{cpu / call_seconds * 100:7.2f}% "
+        f"{(peak_rss - before['voice_agent_process_resident_memory_bytes']) / concurrency / 1024:7.0f}KiB"
+    )
+    for call in step:
+        if call.error:
+            print(f"      call {call.call_id} failed: {call.error}")
+            break
+
+
+async def run(args) -> None:
+    audio = load_mulaw(args.audio) if args.audio else b"".join(synthetic_call(6))
+    calls = {}
+    deepgram = await ScriptedDeepgram(
+        script=((args.function_at, "function_call"), (args.barge_in_at, "barge_in")),
+        period=args.period,
+    ).start()
+    args.server_port, args.metrics_port = free_port(), free_port()
+    server = await start_server(deepgram.url, args.server_port, args.metrics_port, args.pool_size)
+
+    print(
+        f"{'calls':>5} {'ok':>5} {'fail':>4} {'calls/s':>8} {'in fps':>8} {'out fps':>8}  "
+        f"{'first audio':>15} {'echo rtt':>15} {'function rtt':>15} {'barge-in':>15} "
+        f"{'gap p99':>9} {'cpu/call':>8} {'rss/call':>10}"
+    )
+    print(f"{'':>42}{'(p50/p99)':>15}")
+    try:
+        first_id = 0
+        for concurrency in args.ramp:
+            await run_step(concurrency, args, audio, deepgram, calls, first_id)
+            first_id += concurrency
+            calls.clear()
+    finally:
+        server.terminate()
+        await server.wait()
+        await deepgram.stop()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ramp", type=lambda s: [int(n) for n in s.split(",")], default=[10, 25, 50],
+                        help="Comma-separated concurrent call counts, one step each")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of audio per call")
+    parser.add_argument("--stagger", type=float, default=2, help="Seconds over which a step's calls start")
+    parser.add_argument("--audio", help="Raw 8 kHz mulaw or mulaw WAV file to play (default: synthetic)")
+    parser.add_argument("--marker-interval", type=float, default=1.0, help="Seconds between echo markers")
+    parser.add_argument("--function-at", type=float, default=2.0, help="Seconds into each cycle of the function call")
+    parser.add_argument("--barge-in-at", type=float, default=4.0, help="Seconds into each cycle of the barge-in")
+    parser.add_argument("--period", type=float, default=6.0, help="Length of one scripted cycle")
+    parser.add_argument("--pool-size", type=int, default=2, help="STS_POOL_SIZE for the server")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
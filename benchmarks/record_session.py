@@ -0,0 +1,64 @@
+"""
+Record: scripted calls saved as session recordings for replay_sessions.
+
+Replays need recordings, and recording real calls takes a Deepgram account
+and a phone. This plays synthetic caller audio through main.twilio_handler
+against the ScriptedDeepgram stand-in, with RECORD_SESSIONS_DIR pointed at
+the output directory, so a fresh checkout has something to replay. Each
+recording has the stand-in's echoed audio, function calls and barge-ins;
+recordings of real calls exercise the server more realistically.
+
+Run from the repository root:
+    python -m benchmarks.record_session recordings --calls 2 --seconds 20
+    python -m benchmarks.replay_sessions recordings
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+
+import websockets
+
+# Cold Deepgram connections to the stand-in, never the live API
+os.environ.setdefault("DEEPGRAM_API_KEY", "record")
+# Set before main is imported, so nothing opens the server's reservations.db
+os.environ["RESERVATIONS_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="record-"), "reservations.db")
+
+import main  # noqa: E402
+from benchmarks.bench_vad import synthetic_call  # noqa: E402
+from benchmarks.fake_deepgram import ScriptedDeepgram  # noqa: E402
+from benchmarks.fake_twilio import FakeTwilioCall  # noqa: E402
+
+
+async def run(args) -> None:
+    main.RECORD_SESSIONS_DIR = args.directory
+    deepgram = await ScriptedDeepgram().start()
+    main.DEEPGRAM_AGENT_URL = deepgram.url
+    server = await websockets.serve(main.twilio_handler, "127.0.0.1", 0, compression=None)
+    server_url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    audio = b"".join(synthetic_call(min(args.seconds, 30)))
+    try:
+        for call_id in range(args.calls):
+            # No echo markers; a replay does not look for them
+            call = await FakeTwilioCall(call_id, audio, args.seconds, marker_interval=args.seconds + 1).run(server_url)
+            if call.error:
+                raise SystemExit(f"call {call_id} failed: {call.error}")
+    finally:
+        server.close()
+        await server.wait_closed()
+        await deepgram.stop()
+    print(f"recorded {args.calls} calls of {args.seconds} s in {args.directory}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directory", help="Where to write the .dgrec files")
+    parser.add_argument("--calls", type=int, default=1, help="Calls to record")
+    parser.add_argument("--seconds", type=int, default=20, help="Length of each call")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
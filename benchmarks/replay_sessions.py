@@ -0,0 +1,201 @@
+"""
+Replay: recorded Deepgram sessions played back through twilio_handler.
+
+Each recording (made by running the server with RECORD_SESSIONS_DIR set) is
+played as one call through main.twilio_handler in this process. A
+ReplayDeepgram stand-in sends what Deepgram sent, at the recorded times,
+and a fake Twilio call streams the caller audio that went to Deepgram.
+For each recording it reports time to first agent audio, function call
+round trip, barge-in to `clear`, the p99 gap between outbound frames and
+the CPU time of the replay. The stand-ins do the same work on every build,
+so differences in CPU between builds come from the server.
+
+Every replay books, cancels and queues callbacks against a freshly seeded
+reservation store in a temporary directory, so the replays of a recording
+see the same rooms and the server's reservations.db is never touched.
+
+--speed plays the caller and Deepgram sides faster than real time; agent
+audio is still paced to Twilio in real time by the server. Save results
+with --output and compare a later build against them with --baseline.
+
+Run from the repository root (benchmarks/record_session.py makes scripted
+recordings without a Deepgram account or a phone):
+    RECORD_SESSIONS_DIR=recordings python main.py
+    python -m benchmarks.replay_sessions recordings --output before.json
+    python -m benchmarks.replay_sessions recordings --baseline before.json
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import websockets
+
+# Cold Deepgram connections to the stand-in, never the live API
+os.environ.setdefault("DEEPGRAM_API_KEY", "replay")
+# Set before main is imported, so nothing opens the server's reservations.db
+STORE_DIR = tempfile.mkdtemp(prefix="replay-")
+os.environ["RESERVATIONS_DB_PATH"] = os.path.join(STORE_DIR, "reservations.db")
+
+import hotel_functions  # noqa: E402
+import main  # noqa: E402
+from benchmarks.fake_deepgram import ReplayDeepgram  # noqa: E402
+from benchmarks.fake_twilio import FakeTwilioCall  # noqa: E402
+from benchmarks.loadtest import barge_in_latencies  # noqa: E402
+from session_recording import SENT_AUDIO, read_recording  # noqa: E402
+from transcoding import TELEPHONY_FORMAT, audio_format, make_transcoder  # noqa: E402
+
+# 8 kHz mulaw
+BYTES_PER_SECOND = 8000
+# Reported in milliseconds, except CPU
+METRICS = ("first_audio_ms", "function_rtt_ms", "barge_in_ms", "gap_p99_ms", "cpu_ms")
+
+
+def recordings(paths: list) -> list:
+    """Recording files named on the command line, directories expanded."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "*.dgrec"))))
+        else:
+            files.append(path)
+    return files
+
+
+def reset_reservations(index: int) -> None:
+    """Give the default hotel a newly seeded store, so a replay's bookings never reach the next one."""
+    if "STORE" in vars(hotel_functions):
+        # The previous replay's store; its connections would otherwise pile up
+        hotel_functions.STORE.close()
+    hotel = hotel_functions.Hotel.open(
+        hotel_functions.HOTEL_INFO,
+        os.path.join(STORE_DIR, f"replay-{index}.db"),
+        hotel_functions.RESERVATIONS_DB,
+    )
+    hotel_functions.STORE = hotel.store
+    hotel_functions.INVENTORY = hotel.inventory
+    hotel_functions.CALLBACKS = hotel.callbacks
+
+
+def _median_ms(samples: list):
+    return round(statistics.median(samples) * 1000, 2) if samples else None
+
+
+async def replay(path: str, speed: float, server_url: str, index: int = 0) -> dict:
+    header, records = read_recording(path)
+    if header.get("audio", main.settings_cache.get().config["audio"]) != main.settings_cache.get().config["audio"]:
+        print(f"warning: {path} was recorded with other audio formats than {main.CONFIG_PATH} sets")
+    caller_audio = b"".join(payload for kind, _, payload in records if kind == SENT_AUDIO)
+    if "audio" in header:
+        # Twilio streams mulaw whatever format the call sent Deepgram
+        transcoder = make_transcoder(audio_format(header["audio"]["input"]), TELEPHONY_FORMAT)
+        if transcoder is not None:
+            caller_audio = transcoder.convert(caller_audio)
+    length = records[-1][1] if records else 0.0
+    duration = max(length, len(caller_audio) / BYTES_PER_SECOND)
+
+    # No echo markers: the recorded agent never echoes
+    call = FakeTwilioCall(0, caller_audio or b"\xff", duration, marker_interval=duration + 1, speed=speed)
+    sessions = []
+    deepgram = await ReplayDeepgram(records, speed, on_session=lambda session: sessions.append(session) or call).start()
+    main.DEEPGRAM_AGENT_URL = deepgram.url
+
+    reset_reservations(index)
+    cpu = time.process_time()
+    try:
+        await call.run(server_url)
+    finally:
+        await deepgram.stop()
+    cpu = time.process_time() - cpu
+    if call.error:
+        raise RuntimeError(f"{path}: {call.error}")
+
+    gaps = sorted(call.frame_gaps)
+    return {
+        "call_id": header.get("call_id"),
+        "seconds": round(duration, 2),
+        "first_audio_ms": round(call.time_to_first_audio * 1000, 2) if call.time_to_first_audio else None,
+        "function_rtt_ms": _median_ms([rtt for s in sessions for rtt in s["function_rtts"]]),
+        "barge_in_ms": _median_ms(barge_in_latencies(sessions)),
+        "gap_p99_ms": round(gaps[int(len(gaps) * 0.99)] * 1000, 2) if gaps else None,
+        "cpu_ms": round(cpu * 1000, 1),
+        "frames_received": call.frames_received,
+    }
+
+
+def _format(value) -> str:
+    return f"{value:9.1f}" if value is not None else f"{'-':>9}"
+
+
+def _change(value, before) -> str:
+    if value is None or not before:
+        return f"{'':>8}"
+    return f"{(value - before) / before * 100:+7.0f}%"
+
+
+def report(results: dict, baseline: dict) -> None:
+    print(f"{'recording':<40} {'seconds':>7} " + " ".join(f"{name:>17}" for name in METRICS))
+    for name, result in results.items():
+        before = baseline.get(name, {})
+        columns = " ".join(f"{_format(result[m])}{_change(result[m], before.get(m))}" for m in METRICS)
+        print(f"{name[:40]:<40} {result['seconds']:7.1f} {columns}")
+
+
+async def run(args) -> None:
+    files = recordings(args.recordings)
+    missing = [path for path in files if not os.path.isfile(path)]
+    if missing or not files:
+        problem = f"no recording at {', '.join(missing)}" if missing else "no .dgrec recordings found"
+        raise SystemExit(
+            f"{problem}; record calls by running main.py with RECORD_SESSIONS_DIR set, "
+            "or scripted ones with: python -m benchmarks.record_session <directory>"
+        )
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    server = await websockets.serve(main.twilio_handler, "127.0.0.1", 0, compression=None)
+    server_url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+    results = {}
+    replays = 0
+    try:
+        for path in files:
+            runs = []
+            for _ in range(args.repeat):
+                runs.append(await replay(path, args.speed, server_url, replays))
+                replays += 1
+            # Median of each metric over the repeats
+            result = dict(runs[0])
+            for metric in METRICS:
+                values = [run[metric] for run in runs if run[metric] is not None]
+                result[metric] = statistics.median(values) if values else None
+            results[os.path.basename(path)] = result
+    finally:
+        server.close()
+        await server.wait_closed()
+
+    report(results, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("recordings", nargs="+", help="Recording files or directories of *.dgrec files")
+    parser.add_argument("--speed", type=float, default=1.0, help="Play back this many times faster than recorded")
+    parser.add_argument("--repeat", type=int, default=3, help="Replays per recording; the median is reported")
+    parser.add_argument("--output", help="Write the results as JSON, for --baseline on a later build")
+    parser.add_argument("--baseline", help="Results JSON of an earlier build to compare against")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,139 @@
+"""
+Simulation: a callback queue with tens of thousands of waiting guests.
+
+Starts with a backlog of queued callbacks, then keeps callbacks arriving at
+random while a pool of agents works them with randomly distributed handling
+times. The queue is a reservation store in a temporary directory, as in the
+server. Reports the cost of scheduler operations and, per priority, how the
+ETA quoted at enqueue compares with the wait the guest actually had.
+
+Run from the repository root:
+    python -m benchmarks.sim_callbacks --backlog 20000 --arrivals 50000
+"""
+
+import argparse
+import heapq
+import os
+import random
+import tempfile
+import time
+
+from callback_scheduler import PRIORITY_NAMES, CallbackScheduler, classify_priority
+from reservation_store import ReservationStore
+
+ISSUES = (
+    ("I was charged twice for my stay", 0.15),
+    ("Question about a refund for a cancelled booking", 0.15),
+    ("Medical emergency, need to arrange early departure", 0.03),
+    ("Need help planning a wedding block of rooms", 0.37),
+    ("Want to change the name on the reservation", 0.15),
+    ("General question about the hotel", 0.10),
+    ("Feedback on my last visit", 0.05),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backlog", type=int, default=20_000, help="Callbacks queued before agents start")
+    parser.add_argument("--arrivals", type=int, default=50_000, help="Callbacks arriving during the run")
+    parser.add_argument("--agents", type=int, default=40)
+    parser.add_argument("--handling-minutes", type=float, default=8.0)
+    parser.add_argument("--utilization", type=float, default=0.9, help="Arrival rate / agent throughput")
+    args = parser.parse_args()
+
+    rng = random.Random(17)
+    handling = args.handling_minutes * 60
+    arrival_rate = args.utilization * args.agents / handling
+    descriptions = [issue for issue, _ in ISSUES]
+    weights = [weight for _, weight in ISSUES]
+
+    store = ReservationStore(os.path.join(tempfile.mkdtemp(prefix="sim-callbacks-"), "callbacks.db"))
+    scheduler = CallbackScheduler(store, agents=args.agents, handling_seconds=handling)
+    quoted = {}  # callback id -> (enqueued at, quoted ETA, priority)
+    waits = {priority: [] for priority in range(len(PRIORITY_NAMES))}
+    busy = []  # (finishes at, callback id)
+    enqueue_time = dequeue_time = 0.0
+    operations = 0
+
+    def new_callback():
+        description = rng.choices(descriptions, weights)[0]
+        callback = {"guest_name": "Guest", "phone_number": "+1-555-000-0000", "issue_description": description,
+                    "requested_at": "2026-01-01 09:00", "status": "pending"}
+        return callback, classify_priority(description)
+
+    def enqueue(now):
+        nonlocal enqueue_time
+        callback, priority = new_callback()
+        start = time.perf_counter()
+        queued = scheduler.enqueue(callback, now)
+        enqueue_time += time.perf_counter() - start
+        quoted[queued["callback_id"]] = (now, queued["eta_seconds"], priority)
+
+    def start_work(now):
+        nonlocal dequeue_time, operations
+        while len(busy) < args.agents:
+            start = time.perf_counter()
+            callback = scheduler.dequeue(now)
+            dequeue_time += time.perf_counter() - start
+            operations += 1
+            if callback is None:
+                return
+            callback_id = callback["callback_id"]
+            enqueued_at, eta, priority = quoted.pop(callback_id)
+            waits[priority].append((now - enqueued_at, eta))
+            heapq.heappush(busy, (now + rng.expovariate(1 / handling), callback_id))
+
+    # The backlog is stored as if it had waited through a restart: already
+    # queued, quoted as of when agents start, and not counted as recent arrivals
+    for _ in range(args.backlog):
+        callback, priority = new_callback()
+        eta = scheduler.eta(priority, 0.0)
+        callback_id = store.add_callback({**callback, "priority": priority, "queued_at": -2 * scheduler.rate_window})
+        quoted[callback_id] = (0.0, eta, priority)
+    stats = scheduler.stats(0.0)
+    print(f"backlog: {stats['queued']:,} callbacks queued, {stats['waiting_by_priority']}")
+
+    now = 0.0
+    next_arrival = rng.expovariate(arrival_rate)
+    arrived = 0
+    learned_handling = handling
+    wall = time.perf_counter()
+    start_work(now)
+    while busy or arrived < args.arrivals:
+        if arrived < args.arrivals and (not busy or next_arrival < busy[0][0]):
+            now = next_arrival
+            enqueue(now)
+            arrived += 1
+            # Read before the drain at the end, where only the longest calls are still finishing
+            if arrived == args.arrivals:
+                learned_handling = scheduler.stats(now)["handling_seconds"]
+            next_arrival = now + rng.expovariate(arrival_rate)
+        else:
+            now, callback_id = heapq.heappop(busy)
+            scheduler.complete(callback_id, now)
+        start_work(now)
+    wall = time.perf_counter() - wall
+
+    total = args.backlog + args.arrivals
+    print(
+        f"simulated {total:,} callbacks over {now / 3600:,.1f} hours in {wall:.1f}s; "
+        f"enqueue {enqueue_time / max(args.arrivals, 1) * 1e6:.2f} us, dequeue {dequeue_time / operations * 1e6:.2f} us; "
+        f"learned handling time {learned_handling / 60:.1f} min"
+    )
+    print(f"{'priority':<9} {'calls':>7} {'mean wait':>10} {'mean ETA':>10} {'mean |error|':>13} {'within ETA':>11}")
+    for priority, samples in waits.items():
+        if not samples:
+            continue
+        count = len(samples)
+        mean_wait = sum(wait for wait, _ in samples) / count
+        mean_eta = sum(eta for _, eta in samples) / count
+        error = sum(abs(wait - eta) for wait, eta in samples) / count
+        on_time = sum(wait <= eta for wait, eta in samples) / count
+        print(
+            f"{PRIORITY_NAMES[priority]:<9} {count:>7,} {mean_wait / 60:>8.1f} m {mean_eta / 60:>8.1f} m "
+            f"{error / 60:>11.1f} m {on_time:>11.0%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
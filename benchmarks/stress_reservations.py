@@ -0,0 +1,161 @@
+"""
+Stress test: thousands of concurrent modify, cancel and callback requests.
+
+Hammers a handful of reservations from many threads through the real
+hotel_functions handlers, the same way the server's function-call pool does,
+then checks that no update was lost or half-applied:
+
+- every special request whose add was confirmed is present exactly once
+- nights, rate and total cost of each reservation agree with each other
+- each reservation's version equals the number of confirmed changes to it
+- a reservation is cancelled at most once
+- the room inventory matches the reservations left in the store
+- callback references are unique and consecutive
+
+Run from the repository root:
+    python -m benchmarks.stress_reservations --operations 5000 --threads 32
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--operations", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--reservations", type=int, default=10, help="Fewer means more contention")
+    parser.add_argument("--cancel-share", type=float, default=0.02, help="Share of operations that cancel")
+    args = parser.parse_args()
+
+    os.environ["RESERVATIONS_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="stress-"), "stress.db")
+    import hotel_functions
+    from hotel_functions import HOTEL_INFO, STORE
+    from room_inventory import RoomInventory
+
+    check_in = date(2027, 3, 1)
+    STORE.insert_many(
+        (
+            f"ST-{n:05d}",
+            {
+                "guest_name": "Stress Test", "last_name": "stress", "check_in": check_in.isoformat(),
+                "check_out": (check_in + timedelta(days=2)).isoformat(), "room_type": "deluxe",
+                "room_number": str(400 + n), "guests": 2, "nights": 2, "rate_per_night": 199.0,
+                "total_cost": 398.0, "status": "confirmed", "special_requests": [],
+            },
+        )
+        for n in range(args.reservations)
+    )
+    # Rebuild the room inventory so it includes the rows inserted directly
+    hotel_functions.INVENTORY = RoomInventory.from_reservations(
+        hotel_functions.INVENTORY.capacity, STORE.iter_stays()
+    )
+
+    rng = random.Random(5)
+    operations = []
+    for n in range(args.operations):
+        conf_num = f"ST-{rng.randrange(args.reservations):05d}"
+        roll = rng.random()
+        if roll < args.cancel_share:
+            # Only odd reservations are cancelled, so the even ones stay contended to the end
+            operations.append(("cancel", f"ST-{rng.randrange(1, args.reservations, 2):05d}", None))
+        elif roll < 0.05:
+            operations.append(("callback", None, None))
+        elif roll < 0.45:
+            operations.append(("add_request", conf_num, f"request {n}"))
+        elif roll < 0.65:
+            operations.append(("check_out_date", conf_num, (check_in + timedelta(days=rng.randint(1, 10))).isoformat()))
+        elif roll < 0.85:
+            operations.append(("room_type", conf_num, rng.choice(["standard", "deluxe", "suite"])))
+        else:
+            operations.append(("guest_count", conf_num, str(rng.randint(1, 2))))
+
+    # Count version conflicts: writes that found the row changed since it was read
+    conflicts = Counter()
+    update, cancel = STORE.update, STORE.cancel
+
+    def counted(write):
+        def wrapper(*args, **kwargs):
+            applied = write(*args, **kwargs)
+            conflicts["retried" if not applied else "applied"] += 1
+            return applied
+        return wrapper
+
+    STORE.update, STORE.cancel = counted(update), counted(cancel)
+
+    def run(operation):
+        kind, conf_num, value = operation
+        if kind == "cancel":
+            return hotel_functions.cancel_reservation(conf_num, "Stress", "other")
+        if kind == "callback":
+            return hotel_functions.request_callback("Stress Test", "+1-555-000-0000", "stress")
+        return hotel_functions.modify_reservation(conf_num, "Stress", kind, value)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        results = list(pool.map(run, operations))
+    elapsed = time.perf_counter() - start
+
+    outcomes = Counter(result.get("status") or result.get("error") for result in results)
+    print(f"{len(operations)} operations on {args.threads} threads in {elapsed:.2f}s "
+          f"({len(operations) / elapsed:,.0f} ops/s)")
+    print(f"outcomes: {dict(outcomes)}")
+    print(f"writes applied: {conflicts['applied']}, version conflicts retried: {conflicts['retried']}")
+
+    confirmed = defaultdict(int)
+    requests = defaultdict(list)
+    cancels = Counter()
+    callbacks = []
+    for (kind, conf_num, value), result in zip(operations, results):
+        if result.get("status") == "modified":
+            confirmed[conf_num] += 1
+            if kind == "add_request":
+                requests[conf_num].append(value)
+        elif result.get("status") == "cancelled":
+            confirmed[conf_num] += 1
+            cancels[conf_num] += 1
+        elif result.get("status") == "callback_scheduled":
+            callbacks.append(int(result["callback_reference"][3:]))
+
+    failures = []
+    for n in range(args.reservations):
+        conf_num = f"ST-{n:05d}"
+        reservation = STORE.get(conf_num)
+        nights = (date.fromisoformat(reservation["check_out"]) - date.fromisoformat(reservation["check_in"])).days
+        price = HOTEL_INFO["room_types"][reservation["room_type"]]["price_per_night"]
+        if sorted(reservation["special_requests"]) != sorted(requests[conf_num]):
+            failures.append(f"{conf_num}: special requests lost or duplicated")
+        if reservation["nights"] != nights or reservation["rate_per_night"] != price:
+            failures.append(f"{conf_num}: nights/rate out of step with dates/room type")
+        if reservation["total_cost"] != reservation["nights"] * reservation["rate_per_night"]:
+            failures.append(f"{conf_num}: total {reservation['total_cost']} != nights x rate")
+        if reservation["version"] != confirmed[conf_num]:
+            failures.append(f"{conf_num}: version {reservation['version']} but {confirmed[conf_num]} confirmed changes")
+        if cancels[conf_num] > 1 or (cancels[conf_num] == 1) != (reservation["status"] == "cancelled"):
+            failures.append(f"{conf_num}: cancelled {cancels[conf_num]} times, status {reservation['status']}")
+    inventory = hotel_functions.INVENTORY
+    rebuilt = RoomInventory.from_reservations(inventory.capacity, STORE.iter_stays())
+    for room_type in inventory.capacity:
+        for offset in range(12):
+            night = check_in + timedelta(days=offset)
+            stay = (room_type, night.isoformat(), (night + timedelta(days=1)).isoformat())
+            if inventory.rooms_free(*stay) != rebuilt.rooms_free(*stay):
+                failures.append(f"room inventory out of step with the store for {room_type} on {night}")
+    if callbacks and sorted(callbacks) != list(range(min(callbacks), min(callbacks) + len(callbacks))):
+        failures.append("callback references are not unique and consecutive")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    print("all invariants hold" if not failures else f"{len(failures)} invariant violations")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
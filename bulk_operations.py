@@ -0,0 +1,265 @@
+"""
+Bulk Operations
+Cancel, relocate and price many reservations at once.
+
+For staff, not the voice agent: when a wing closes or a storm hits, every
+reservation staying in a date window (optionally of one room type) is
+handled in one call and one database transaction.
+
+Cancellation terms change at two check-in dates: before the first there is
+no refund, from the second a full refund, in between the first night is
+kept. Sorting the matching reservations by check-in ordinal and bisecting
+at those two dates classifies all of them at once; prefix sums of total cost
+and nightly rate then give the refund owed over any check-in range without
+revisiting individual reservations. Each cancellation is recorded with the
+same fee, cancellation reference and result as cancel_reservation.
+"""
+
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from hotel_functions import (
+    DEFAULT_HOTEL,
+    FREE_CANCELLATION_HOURS,
+    FULL_REFUND,
+    NO_REFUND,
+    PARTIAL_REFUND,
+    Hotel,
+    cancellation_fields,
+    cancellation_response,
+)
+
+
+def fee_cutoffs(now: datetime) -> tuple:
+    """
+    Check-in ordinals where the cancellation terms change for a cancellation at `now`.
+
+    Returns:
+        tuple: (partial_from, full_from). Check-ins before partial_from get no
+            refund, from full_from a full refund, in between a partial refund.
+    """
+    # Check-in is at midnight; it is still ahead only from tomorrow on
+    partial_from = now.toordinal() + 1
+    free_from = now + timedelta(hours=FREE_CANCELLATION_HOURS)
+    full_from = free_from.toordinal()
+    if datetime.fromordinal(full_from) < free_from:
+        full_from += 1
+    return partial_from, full_from
+
+
+class FeeSchedule:
+    """
+    Cancellation terms for a set of reservations cancelled at `now`.
+
+    Args:
+        reservations: ReservationRecords, in any order
+        now: Time of the cancellation
+    """
+
+    def __init__(self, reservations, now: datetime):
+        self.now = now
+        self.reservations = sorted(reservations, key=lambda reservation: reservation.check_in_ordinal)
+        self._check_ins = [reservation.check_in_ordinal for reservation in self.reservations]
+
+        partial_from, full_from = fee_cutoffs(now)
+        self.partial_start = bisect_left(self._check_ins, partial_from)
+        self.full_start = bisect_left(self._check_ins, full_from)
+
+        self._totals = [0.0, *accumulate(reservation.total_cost for reservation in self.reservations)]
+        self._first_nights = [0.0, *accumulate(reservation.rate_per_night for reservation in self.reservations)]
+
+    def __len__(self) -> int:
+        return len(self.reservations)
+
+    def terms(self):
+        """(reservation, fee_info) for every reservation, in check-in order."""
+        for index, reservation in enumerate(self.reservations):
+            if index < self.partial_start:
+                yield reservation, NO_REFUND
+            elif index < self.full_start:
+                yield reservation, PARTIAL_REFUND
+            else:
+                yield reservation, FULL_REFUND
+
+    def _position(self, check_in: str, default: int) -> int:
+        if check_in is None:
+            return default
+        return bisect_left(self._check_ins, date.fromisoformat(check_in).toordinal())
+
+    def exposure(self, first_check_in: str = None, last_check_in: str = None) -> dict:
+        """
+        Refunds owed if the reservations checking in from `first_check_in`
+        up to `last_check_in` (YYYY-MM-DD, default all) were cancelled.
+        """
+        low = self._position(first_check_in, 0)
+        high = max(low, self._position(last_check_in, len(self)))
+        # Clamp the term boundaries into [low, high]
+        partial = min(max(self.partial_start, low), high)
+        full = min(max(self.full_start, low), high)
+
+        def total(start, end):
+            return self._totals[end] - self._totals[start]
+
+        def first_nights(start, end):
+            return self._first_nights[end] - self._first_nights[start]
+
+        full_refund = total(full, high)
+        partial_refund = total(partial, full) - first_nights(partial, full)
+        return {
+            "reservations": high - low,
+            "full_refund": {"count": high - full, "refund": round(full_refund, 2)},
+            "partial_refund": {
+                "count": full - partial,
+                "refund": round(partial_refund, 2),
+                "retained": round(first_nights(partial, full), 2),
+            },
+            "no_refund": {"count": partial - low, "retained": round(total(low, partial), 2)},
+            "total_refund": round(full_refund + partial_refund, 2),
+            "total_value": round(total(low, high), 2),
+        }
+
+
+# =============================================================================
+# OPERATIONS
+# =============================================================================
+
+
+def refund_exposure(start: str, end: str, room_type: str = None, now: datetime = None, hotel: Hotel = None) -> dict:
+    """
+    Refunds owed if every confirmed reservation staying from `start` up to `end` were cancelled now.
+
+    Args:
+        start: First night of the window (YYYY-MM-DD)
+        end: Day after the last night of the window (YYYY-MM-DD)
+        room_type: Only reservations of this room type, if given
+        now: Time of the hypothetical cancellation; defaults to now
+        hotel: The property, if not the default one
+
+    Returns:
+        dict: Counts and amounts per refund type, and the totals
+    """
+    hotel = hotel or DEFAULT_HOTEL
+    schedule = FeeSchedule(hotel.store.find_overlapping(start, end, room_type), now or datetime.now())
+    return {"start": start, "end": end, "room_type": room_type, **schedule.exposure()}
+
+
+def cancel_reservations(
+    start: str,
+    end: str,
+    room_type: str = None,
+    cancellation_reason: str = "hotel_initiated",
+    now: datetime = None,
+    hotel: Hotel = None,
+) -> dict:
+    """
+    Cancel every confirmed reservation staying from `start` up to `end`.
+
+    Args:
+        start: First night of the window (YYYY-MM-DD)
+        end: Day after the last night of the window (YYYY-MM-DD)
+        room_type: Only reservations of this room type, if given
+        cancellation_reason: Recorded on each cancellation
+        now: Time of the cancellation; defaults to now
+        hotel: The property, if not the default one
+
+    Returns:
+        dict: The cancel_reservation result of each cancelled reservation, the
+            confirmation numbers that changed concurrently and were left alone,
+            and the refund exposure of all matched reservations
+    """
+    hotel = hotel or DEFAULT_HOTEL
+    store, inventory = hotel.store, hotel.inventory
+    now = now or datetime.now()
+
+    with inventory.lock:
+        schedule = FeeSchedule(store.find_overlapping(start, end, room_type), now)
+        terms = list(schedule.terms())
+        cancellations = [
+            (
+                reservation.confirmation_number,
+                cancellation_fields(reservation.confirmation_number, cancellation_reason, fee_info, now),
+                reservation.version,
+            )
+            for reservation, fee_info in terms
+        ]
+        applied = store.cancel_many(cancellations)
+
+        results = []
+        skipped = []
+        for (reservation, fee_info), (conf_num, cancellation, _), ok in zip(terms, cancellations, applied):
+            if not ok:
+                skipped.append(conf_num)
+                continue
+            inventory.remove(reservation.room_type, reservation.check_in_ordinal, reservation.check_out_ordinal)
+            results.append(cancellation_response(conf_num, reservation, fee_info, cancellation["cancellation_ref"]))
+
+    return {
+        "cancelled": len(results),
+        "skipped": skipped,
+        "exposure": schedule.exposure(),
+        "results": results,
+    }
+
+
+def move_reservations(
+    start: str,
+    end: str,
+    from_room_type: str,
+    to_room_type: str,
+    hotel: Hotel = None,
+) -> dict:
+    """
+    Relocate every confirmed `from_room_type` reservation staying from `start` up to `end`.
+
+    A hotel-initiated move keeps each guest's rate and total. Reservations
+    are moved in check-in order while `to_room_type` has room for the whole
+    stay and for the party.
+
+    Args:
+        start: First night of the window (YYYY-MM-DD)
+        end: Day after the last night of the window (YYYY-MM-DD)
+        from_room_type: Room type being vacated
+        to_room_type: Room type guests move to
+        hotel: The property, if not the default one
+
+    Returns:
+        dict: Confirmation numbers moved, and those not moved with the reason
+    """
+    hotel = hotel or DEFAULT_HOTEL
+    store, inventory = hotel.store, hotel.inventory
+    room_types = hotel.info["room_types"]
+    if to_room_type not in room_types:
+        raise ValueError(f"Unknown room type: {to_room_type}")
+    max_guests = room_types[to_room_type]["max_guests"]
+
+    moved = []
+    not_moved = {}
+    with inventory.lock:
+        reservations = sorted(
+            store.find_overlapping(start, end, from_room_type),
+            key=lambda reservation: reservation.check_in_ordinal,
+        )
+        updates = []
+        stays = []
+        for reservation in reservations:
+            old_stay = (from_room_type, reservation.check_in_ordinal, reservation.check_out_ordinal)
+            new_stay = (to_room_type, reservation.check_in_ordinal, reservation.check_out_ordinal)
+            if reservation.guests > max_guests:
+                not_moved[reservation.confirmation_number] = "capacity_exceeded"
+            elif not inventory.can_move(old_stay, new_stay):
+                not_moved[reservation.confirmation_number] = "no_availability"
+            else:
+                # Claim the room now so later reservations see it taken
+                inventory.move(old_stay, new_stay)
+                updates.append((reservation.confirmation_number, {"room_type": to_room_type}, reservation.version))
+                stays.append((old_stay, new_stay))
+
+        for (conf_num, _, _), (old_stay, new_stay), ok in zip(updates, stays, store.update_many(updates)):
+            if ok:
+                moved.append(conf_num)
+            else:
+                inventory.move(new_stay, old_stay)
+                not_moved[conf_num] = "concurrent_modification"
+
+    return {"moved": moved, "not_moved": not_moved}
@@ -0,0 +1,239 @@
+"""
+Call Logging
+Structured, non-blocking logging for the voice agent.
+
+Logging on the event loop must never wait for stdout: a slow terminal or log
+collector would stall every call's audio. Log records are put on a bounded
+queue and written by a background thread; when the queue is full, records
+are dropped and counted instead of blocking. Messages are formatted on the
+writer thread, so log arguments must not be mutated after the call.
+
+Every record carries the call ID and Twilio stream SID of the call it was
+logged from, taken from a context variable that each call's tasks inherit.
+High-volume events (one per Deepgram message) can be sampled per event name.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import uuid
+from datetime import datetime
+
+# Attributes every LogRecord has; anything else was passed in `extra`
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+# Added to every record by CallContextFilter
+_CONTEXT_ATTRIBUTES = frozenset(("call_id", "stream_sid"))
+
+
+# =============================================================================
+# CALL CONTEXT
+# =============================================================================
+
+
+class CallContext:
+    """Identifiers of one call, shared by all of its tasks."""
+
+    __slots__ = ("call_id", "stream_sid")
+
+    def __init__(self, call_id: str):
+        self.call_id = call_id
+        self.stream_sid = None
+
+
+_current_call = contextvars.ContextVar("current_call", default=None)
+
+
+def start_call() -> CallContext:
+    """
+    Give the current task a new call context.
+
+    Tasks created afterwards inherit it; set `stream_sid` on the returned
+    context once the Twilio start event arrives.
+    """
+    context = CallContext(uuid.uuid4().hex[:12])
+    _current_call.set(context)
+    return context
+
+
+def event(name: str, **fields) -> dict:
+    """`extra` for a log call: the event name, used for sampling, plus structured fields."""
+    return {"event": name, **fields}
+
+
+# =============================================================================
+# FILTERS
+# =============================================================================
+
+
+class CallContextFilter(logging.Filter):
+    """Stamps records with the call they were logged from."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = _current_call.get()
+        record.call_id = context.call_id if context is not None else "-"
+        record.stream_sid = (context.stream_sid if context is not None else None) or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of the records of selected events.
+
+    Records below WARNING with an `event` in `rates` are kept at that rate,
+    evenly spaced (rate 0.1 keeps every tenth). Warnings and errors are
+    always kept.
+
+    Args:
+        rates: Event name -> share of records to keep, 0 to 1
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+        self.seen = dict.fromkeys(rates, 0)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        name = getattr(record, "event", None)
+        rate = self.rates.get(name)
+        if rate is None or record.levelno >= logging.WARNING:
+            return True
+        seen = self.seen[name]
+        self.seen[name] = seen + 1
+        return int((seen + 1) * rate) > int(seen * rate)
+
+
+def parse_sample_rates(spec: str) -> dict:
+    """'deepgram_message=0.1,function_result=0.5' -> {event: rate}."""
+    rates = {}
+    for item in spec.split(","):
+        if item.strip():
+            name, _, rate = item.partition("=")
+            rates[name.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+# =============================================================================
+# HANDLER AND FORMATTERS
+# =============================================================================
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """A QueueHandler that drops records when its bounded queue is full instead of blocking."""
+
+    def __init__(self, maxsize: int):
+        super().__init__(queue.Queue(maxsize))
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, so the record need not be made picklable; formatting
+        # is left to the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _DrainingQueueListener(logging.handlers.QueueListener):
+    """A QueueListener whose stop waits for room in a full queue rather than failing."""
+
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)
+
+
+def _extras(record: logging.LogRecord) -> dict:
+    return {
+        key: value
+        for key, value in vars(record).items()
+        if key not in _RECORD_ATTRIBUTES and key not in _CONTEXT_ATTRIBUTES
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the call context and any `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "call_id": getattr(record, "call_id", "-"),
+            "stream_sid": getattr(record, "stream_sid", "-"),
+            "message": record.getMessage(),
+            **_extras(record),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines: time, level, call context, message, then `extra` fields as key=value."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s [%(call_id)s %(stream_sid)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        record.call_id = getattr(record, "call_id", "-")
+        record.stream_sid = getattr(record, "stream_sid", "-")
+        line = super().format(record)
+        extras = " ".join(f"{key}={value}" for key, value in _extras(record).items())
+        return f"{line} {extras}" if extras else line
+
+
+FORMATTERS = {"json": JsonFormatter, "text": TextFormatter}
+
+
+def configure_logging(
+    level: str = "INFO",
+    log_format: str = "text",
+    queue_size: int = 10000,
+    sample_rates: dict = None,
+    stream=None,
+) -> DroppingQueueHandler:
+    """
+    Route all logging through a bounded queue to a writer thread.
+
+    Also lowers the websockets library to warnings and errors.
+
+    Args:
+        level: Minimum level logged, e.g. "INFO" or "DEBUG"
+        log_format: "text" or "json"
+        queue_size: Records buffered before new ones are dropped
+        sample_rates: Event name -> share of its records to keep
+        stream: Where the writer thread writes; defaults to stdout
+
+    Returns:
+        DroppingQueueHandler: The handler, whose `dropped` counts lost records
+    """
+    if log_format not in FORMATTERS:
+        raise ValueError(f"Unknown log format {log_format!r}; expected one of {sorted(FORMATTERS)}")
+
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(FORMATTERS[log_format]())
+
+    handler = DroppingQueueHandler(queue_size)
+    # Sampled-out records are discarded before anything else is done with them
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+    handler.addFilter(CallContextFilter())
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+    # websockets logs every handshake header at DEBUG and every connection at INFO
+    logging.getLogger("websockets").setLevel(max(root.level, logging.WARNING))
+
+    listener = _DrainingQueueListener(handler.queue, writer)
+    listener.start()
+    # Write out whatever is still queued when the process exits
+    atexit.register(listener.stop)
+    return handler
@@ -0,0 +1,151 @@
+"""
+Callback Scheduler
+Priority queue of callback requests waiting for a human agent.
+
+Callbacks are ordered by priority, then by arrival. The priority comes from
+keywords in the issue description, so an emergency jumps ahead of a billing
+question. ETAs come from how many callbacks are ahead, how many agents are
+busy, and the average time agents took over the most recent callbacks,
+stretched by the recent arrival rate of more urgent callbacks that will cut
+in line.
+
+The queue lives in the reservation store, not in memory: every server
+process and the agents' tools see the same callbacks, an agent's claim is a
+single conditional update, and no process keeps a copy that could drift.
+"""
+
+import time
+
+URGENT, HIGH, NORMAL, LOW = range(4)
+PRIORITY_NAMES = ("urgent", "high", "normal", "low")
+
+# Checked in order; the first priority with a matching keyword wins
+PRIORITY_KEYWORDS = (
+    (URGENT, ("emergency", "urgent", "medical", "safety", "locked out", "fraud", "stolen", "injur")),
+    (HIGH, ("charged twice", "double charge", "overcharged", "billing", "refund", "payment", "cancel")),
+    (LOW, ("feedback", "suggestion", "general question", "information")),
+)
+
+
+def classify_priority(issue_description: str) -> int:
+    text = issue_description.lower()
+    for priority, keywords in PRIORITY_KEYWORDS:
+        if any(keyword in text for keyword in keywords):
+            return priority
+    return NORMAL
+
+
+# Share of agent time more urgent arrivals are assumed to take at most when
+# stretching an ETA; keeps the estimate finite when the queue is overloaded
+MAX_PREEMPTING_LOAD = 0.9
+
+
+class CallbackScheduler:
+    """
+    The callback queue of one reservation store.
+
+    Args:
+        store: ReservationStore holding the callback requests
+        agents: Human agents working the callback queue
+        handling_seconds: Estimate of the time an agent spends per callback
+            until `recent` callbacks have been completed
+        recent: Completed callbacks whose handling times are averaged
+        rate_window: Seconds over which arrival rates are counted
+    """
+
+    def __init__(
+        self, store, agents: int = 4, handling_seconds: float = 480.0, recent: int = 50, rate_window: float = 3600.0
+    ):
+        self.store = store
+        self.agents = agents
+        self.handling_seconds = handling_seconds
+        self.recent = recent
+        self.rate_window = rate_window
+
+    def enqueue(self, callback: dict, now: float = None) -> dict:
+        """
+        Store a new callback request at the back of its priority.
+
+        Args:
+            callback: guest_name, phone_number, issue_description, requested_at and status
+            now: Current time in seconds; defaults to time.time(), which every process shares
+
+        Returns:
+            dict: Its callback_id, priority name, the callbacks ahead of it and its ETA in seconds
+        """
+        priority = classify_priority(callback.get("issue_description") or "")
+        now = time.time() if now is None else now
+        queue = self.store.callback_queue(now - self.rate_window, self.recent)
+        callback_id = self.store.add_callback({**callback, "priority": priority, "queued_at": now})
+        return {
+            "callback_id": callback_id,
+            "priority": PRIORITY_NAMES[priority],
+            "ahead": _ahead(queue, priority),
+            "eta_seconds": self._eta(queue, priority),
+        }
+
+    def dequeue(self, now: float = None):
+        """
+        Hand the most urgent, longest-waiting callback to an agent.
+
+        Args:
+            now: Current time in seconds; defaults to time.time(). The
+                simulation benchmark passes its own clock.
+
+        Returns:
+            dict: The callback request, now 'in_progress', or None if the queue is empty
+        """
+        return self.store.claim_callback(time.time() if now is None else now)
+
+    def complete(self, callback_id: str, now: float = None) -> bool:
+        """An agent finished a callback; its duration feeds later handling-time estimates."""
+        return self.store.complete_callback(callback_id, time.time() if now is None else now)
+
+    def eta(self, priority: int, now: float = None) -> float:
+        """
+        Expected wait of a new callback of `priority`.
+
+        It starts once enough agents free up for every callback ahead of it
+        plus itself; agents finish one callback every handling time / agents
+        on average. Meanwhile more urgent callbacks keep arriving and take a
+        share of agent time, which stretches the wait by 1 / (1 - that share).
+        """
+        now = time.time() if now is None else now
+        return self._eta(self.store.callback_queue(now - self.rate_window, self.recent), priority)
+
+    def _handling(self, queue: dict) -> float:
+        # The initial estimate stands in for completions not seen yet
+        handling = queue["handling"]
+        missing = max(self.recent - len(handling), 0)
+        return (sum(handling) + missing * self.handling_seconds) / (len(handling) + missing)
+
+    def _eta(self, queue: dict, priority: int) -> float:
+        handling = self._handling(queue)
+        free_agents = max(self.agents - queue["in_progress"], 0)
+        must_finish = max(_ahead(queue, priority) + 1 - free_agents, 0)
+        preempting = sum(queue["arrivals"].get(more_urgent, 0) for more_urgent in range(priority))
+        preempting_rate = preempting / self.rate_window
+        load = min(preempting_rate * handling / self.agents, MAX_PREEMPTING_LOAD)
+        return must_finish * handling / self.agents / (1 - load)
+
+    def stats(self, now: float = None) -> dict:
+        now = time.time() if now is None else now
+        queue = self.store.callback_queue(now - self.rate_window, self.recent)
+        return {
+            "queued": sum(queue["waiting"].values()),
+            "waiting_by_priority": {
+                name: queue["waiting"].get(priority, 0) for priority, name in enumerate(PRIORITY_NAMES)
+            },
+            "in_progress": queue["in_progress"],
+            "agents": self.agents,
+            "handling_seconds": round(self._handling(queue), 1),
+            "arrivals_per_hour": {
+                name: round(queue["arrivals"].get(priority, 0) / self.rate_window * 3600, 1)
+                for priority, name in enumerate(PRIORITY_NAMES)
+            },
+        }
+
+
+def _ahead(queue: dict, priority: int) -> int:
+    """Waiting callbacks a new one of `priority` queues behind: its own priority and every more urgent one."""
+    return sum(count for waiting_priority, count in queue["waiting"].items() if waiting_priority <= priority)
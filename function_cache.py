@@ -0,0 +1,90 @@
+"""
+Function Result Cache
+Per-call idempotency for function calls.
+
+Deepgram may re-send a FunctionCallRequest with the same id, and the LLM
+sometimes repeats an identical call ("cancel it" twice). Each function call
+is remembered by its id and by its normalized (name, arguments); a repeat
+awaits the first execution's result instead of running the handler again,
+even while that first execution is still in flight. Once it has finished,
+only a result is reused; an error reply is forgotten so a retry runs again.
+"""
+
+import json
+import time
+from collections import OrderedDict
+
+
+def normalize_arguments(func_name: str, arguments: dict) -> tuple:
+    """Cache key for a call: case, surrounding and repeated whitespace do not matter."""
+    normalized = {
+        key: " ".join(value.lower().split()) if isinstance(value, str) else value
+        for key, value in arguments.items()
+    }
+    return (func_name, json.dumps(normalized, sort_keys=True))
+
+
+class FunctionResultCache:
+    """
+    Results (as futures) of one call's function calls, bounded in age and number.
+
+    Args:
+        ttl: Seconds a result can be reused
+        max_entries: Maximum remembered calls; the oldest is evicted first
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._by_id = OrderedDict()
+        self._by_arguments = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, func_id: str, key: tuple):
+        """The future of an earlier identical call, or None."""
+        now = time.monotonic()
+        for entries, entry_key in ((self._by_id, func_id), (self._by_arguments, key)):
+            entry = entries.get(entry_key)
+            if entry is not None:
+                expires_at, future = entry
+                if expires_at > now:
+                    self.hits += 1
+                    return future
+                del entries[entry_key]
+        self.misses += 1
+        return None
+
+    def put(self, func_id: str, key: tuple, future) -> None:
+        expires_at = time.monotonic() + self.ttl
+        for entries, entry_key in ((self._by_id, func_id), (self._by_arguments, key)):
+            entries[entry_key] = (expires_at, future)
+            entries.move_to_end(entry_key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def discard(self, func_id: str, key: tuple, future=None) -> None:
+        """
+        Forget a call whose result must not be reused, e.g. it timed out.
+
+        With `future`, only entries still holding that future are forgotten, so
+        a late failure does not drop the retry that replaced it.
+        """
+        for entries, entry_key in ((self._by_id, func_id), (self._by_arguments, key)):
+            entry = entries.get(entry_key)
+            if entry is not None and (future is None or entry[1] is future):
+                del entries[entry_key]
+
+    def invalidate_arguments(self, keep: tuple = None) -> None:
+        """
+        Forget argument-keyed results after a reservation changed, except `keep`.
+
+        Results by id stay: a re-sent request id is still the same request.
+        """
+        kept = self._by_arguments.get(keep)
+        self._by_arguments.clear()
+        if kept is not None:
+            self._by_arguments[keep] = kept
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._by_id)}
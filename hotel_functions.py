@@ -2,12 +2,24 @@
 Hotel Customer Support Voice Agent Functions
 Grand Horizon Hotel & Spa
 
-This module provides all functions for the hotel customer support voice agent,
-including a fake in-memory database with pre-seeded reservations for testing.
+This module provides all functions for the hotel customer support voice agent.
+Reservations live in a SQLite store (see reservation_store.py) that is seeded
+with the demo reservations below the first time it is created. The store is
+opened on first use, not on import, so importing this module creates no files.
 """
 
+import os
 import random
+import threading
+import time
 from datetime import datetime
+from functools import lru_cache
+
+from callback_scheduler import CallbackScheduler
+from hotel_info_index import HotelInfoIndex
+from reservation_record import ReservationRecord
+from reservation_store import ReservationStore
+from room_inventory import RoomInventory
 
 # =============================================================================
 # HOTEL INFORMATION DATABASE
@@ -57,31 +69,35 @@ HOTEL_INFO = {
             "name": "Standard Room",
             "description": "Comfortable 325 sq ft room with one king or two queen beds, city view",
             "price_per_night": 149,
+            "rooms": 480,
             "max_guests": 2,
         },
         "deluxe": {
             "name": "Deluxe Room",
             "description": "Spacious 425 sq ft room with ocean view, sitting area, and premium amenities",
             "price_per_night": 199,
+            "rooms": 320,
             "max_guests": 3,
         },
         "suite": {
             "name": "Executive Suite",
             "description": "Luxurious 650 sq ft suite with separate living area, ocean view, and executive lounge access",
             "price_per_night": 349,
+            "rooms": 150,
             "max_guests": 4,
         },
         "penthouse": {
             "name": "Penthouse Suite",
             "description": "Ultimate luxury in 1,200 sq ft with wraparound terrace, private butler service, and panoramic views",
             "price_per_night": 699,
+            "rooms": 50,
             "max_guests": 6,
         },
     },
 }
 
 # =============================================================================
-# RESERVATIONS DATABASE (Pre-seeded with test data)
+# RESERVATIONS DATABASE (Seed data for a new store)
 # =============================================================================
 
 RESERVATIONS_DB = {
@@ -200,67 +216,311 @@ RESERVATIONS_DB = {
     "next_callback_id": 5001,
 }
 
+# =============================================================================
+# HOTEL (One per property)
+# =============================================================================
+
+
+class Hotel:
+    """
+    One property: its information and its live reservation state.
+
+    Handlers that accept a `hotel` keyword act on the Hotel main.py passes
+    them (tenants.py builds one per property), or on DEFAULT_HOTEL, made of
+    this module's HOTEL_INFO, STORE, INVENTORY and CALLBACKS.
+
+    Args:
+        info: Hotel information shaped like HOTEL_INFO
+        store: The property's ReservationStore
+        inventory: RoomInventory kept in step with `store`
+        callbacks: CallbackScheduler over the callback queue in `store`
+    """
+
+    def __init__(self, info: dict, store: ReservationStore, inventory: RoomInventory, callbacks: CallbackScheduler):
+        self.info = info
+        self.store = store
+        self.inventory = inventory
+        self.callbacks = callbacks
+        self.info_index = HotelInfoIndex(info)
+
+    @classmethod
+    def open(cls, info: dict, db_path: str, seed: dict = None) -> "Hotel":
+        """
+        Open a property's reservation store and load its inventory.
+
+        Args:
+            info: Hotel information shaped like HOTEL_INFO
+            db_path: SQLite file of the property's reservations
+            seed: Demo data shaped like RESERVATIONS_DB for a new store
+        """
+        store = ReservationStore(db_path)
+        if seed is not None:
+            store.seed(seed)
+        callbacks = CallbackScheduler(store, agents=CALLBACK_AGENTS, handling_seconds=CALLBACK_HANDLING_SECONDS)
+        return cls(info, store, RoomInventory.from_reservations(room_capacity(info), store.iter_stays()), callbacks)
+
+    def with_info(self, info: dict) -> "Hotel":
+        """This property with new hotel information, sharing its reservation state."""
+        return Hotel(info, self.store, self.inventory, self.callbacks)
+
+
+class _DefaultHotel(Hotel):
+    """
+    The hotel made of this module's globals.
+
+    Read at call time, so benchmarks and staff tools that replace STORE,
+    INVENTORY or HOTEL_INFO affect the handlers as before.
+    """
+
+    def __init__(self):
+        pass
+
+    info = property(lambda self: HOTEL_INFO)
+    store = property(lambda self: _default_state("STORE"))
+    inventory = property(lambda self: _default_state("INVENTORY"))
+    callbacks = property(lambda self: _default_state("CALLBACKS"))
+    info_index = property(lambda self: _hotel_info_index())
+
+
+def room_capacity(info: dict) -> dict:
+    """Room type -> number of rooms, from hotel information."""
+    return {key: room["rooms"] for key, room in info["room_types"].items()}
+
+
+CALLBACK_AGENTS = int(os.getenv("CALLBACK_AGENTS", "4"))
+CALLBACK_HANDLING_SECONDS = float(os.getenv("CALLBACK_HANDLING_MINUTES", "8")) * 60
+
+# The default hotel's live state, created by open_default_hotel(): STORE, the
+# reservation store; INVENTORY, rooms taken per room type per night, kept in
+# step with STORE; CALLBACKS, the callback queue kept in STORE
+_DEFAULT_STATE = ("STORE", "INVENTORY", "CALLBACKS")
+_default_lock = threading.Lock()
+DEFAULT_HOTEL = _DefaultHotel()
+
+
+def open_default_hotel() -> None:
+    """
+    Open the default hotel's store at RESERVATIONS_DB_PATH, seeding it the
+    first time, and load its inventory.
+
+    Runs on first use of STORE, INVENTORY, CALLBACKS or DEFAULT_HOTEL; the
+    server calls it at startup. Globals a caller already replaced are kept.
+    """
+    with _default_lock:
+        if all(name in globals() for name in _DEFAULT_STATE):
+            return
+        hotel = Hotel.open(HOTEL_INFO, os.getenv("RESERVATIONS_DB_PATH", "reservations.db"), RESERVATIONS_DB)
+        for name, value in zip(_DEFAULT_STATE, (hotel.store, hotel.inventory, hotel.callbacks)):
+            globals().setdefault(name, value)
+
+
+def _default_state(name: str):
+    try:
+        return globals()[name]
+    except KeyError:
+        open_default_hotel()
+        return globals()[name]
+
+
+def __getattr__(name: str):
+    # hotel_functions.STORE and `from hotel_functions import STORE` open the store on first use
+    if name in _DEFAULT_STATE:
+        return _default_state(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# How many times a cancel or modify re-reads and retries when another call
+# changed the same reservation between its read and its write
+MUTATION_ATTEMPTS = 5
+
+# =============================================================================
+# GUEST SESSION (One per phone call)
+# =============================================================================
+
+
+class GuestSession:
+    """
+    State shared by the function calls of one phone call.
+
+    Remembers reservations the caller has already verified, so a lookup
+    followed by a modify and a cancel reads the store once. Cancelling or
+    modifying a reservation drops it from the session; the next call reads it
+    fresh. Handlers that accept a `session` keyword receive it from main.py.
+    """
+
+    def __init__(self):
+        self.verified = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, conf_num: str, last_name: str):
+        """A copy of a reservation verified earlier in this call with the same last name, or None."""
+        entry = self.verified.get(conf_num)
+        if entry is None or entry[0] != last_name:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1].copy()
+
+    def remember(self, conf_num: str, last_name: str, reservation: ReservationRecord) -> None:
+        self.verified[conf_num] = (last_name, reservation.copy())
+
+    def forget(self, conf_num: str) -> None:
+        self.verified.pop(conf_num, None)
+
+    def stats(self) -> dict:
+        return {"verified": len(self.verified), "hits": self.hits, "misses": self.misses}
+
+
 # =============================================================================
 # HELPER FUNCTIONS
 # =============================================================================
 
 
-def _verify_reservation(confirmation_number: str, last_name: str) -> tuple:
+def _verify_reservation(confirmation_number: str, last_name: str, session: GuestSession = None, hotel: Hotel = None) -> tuple:
     """
     Verify a reservation exists and the last name matches.
     Returns (success: bool, reservation_or_error: dict/str)
     """
+    hotel = hotel or DEFAULT_HOTEL
     conf_num = confirmation_number.upper().strip()
+    last_name = last_name.lower().strip()
+
+    # Already verified earlier in this call
+    if session is not None:
+        reservation = session.get(conf_num, last_name)
+        if reservation is not None:
+            return (True, reservation)
 
     # Check if reservation exists
-    if conf_num not in RESERVATIONS_DB["reservations"]:
-        # Check cancelled reservations
-        if conf_num in RESERVATIONS_DB["cancelled_reservations"]:
-            return (False, "cancelled")
+    reservation = hotel.store.get(conf_num)
+    if reservation is None:
         return (False, "not_found")
-
-    reservation = RESERVATIONS_DB["reservations"][conf_num]
+    if reservation.status == "cancelled":
+        return (False, "cancelled")
 
     # Verify last name (case-insensitive)
-    if reservation["last_name"] != last_name.lower().strip():
+    if reservation.last_name != last_name:
         return (False, "name_mismatch")
 
+    if session is not None:
+        session.remember(conf_num, last_name, reservation)
     return (True, reservation)
 
 
-def _calculate_cancellation_fee(check_in_date: str) -> dict:
+def _backoff(attempt: int) -> None:
+    """Sleep a short, jittered, growing delay before retrying a conflicting write."""
+    time.sleep(random.uniform(0, 0.002 * 2**attempt))
+
+
+def _conflict_error() -> dict:
+    """Returned when a reservation kept changing under a cancel or modify."""
+    return {
+        "error": "concurrent_modification",
+        "message": "This reservation is being updated by another request right now. Please give me a moment and I'll try again.",
+    }
+
+
+def _no_availability_error(hotel: Hotel, room_type: str, check_in: str, check_out: str) -> dict:
+    """Returned when a modification would need a room that is not free."""
+    room_name = hotel.info["room_types"][room_type]["name"]
+    return {
+        "error": "no_availability",
+        "message": f"I'm sorry, we don't have a {room_name} available for every night from {check_in} to {check_out}. Would you like to try different dates or another room type?",
+    }
+
+
+# Cancellation terms; which applies depends on the time left before check-in
+FREE_CANCELLATION_HOURS = 48
+FULL_REFUND = {
+    "fee": 0,
+    "refund_type": "full_refund",
+    "message": "Your cancellation is more than 48 hours before check-in. You will receive a full refund.",
+}
+PARTIAL_REFUND = {
+    "fee": "first_night",
+    "refund_type": "partial_refund",
+    "message": "Your cancellation is within 48 hours of check-in. The first night will be charged as per our cancellation policy.",
+}
+NO_REFUND = {
+    "fee": "full_amount",
+    "refund_type": "no_refund",
+    "message": "The check-in date has passed. Unfortunately, no refund is available for this reservation.",
+}
+
+
+def _calculate_cancellation_fee(check_in_ordinal: int, now: datetime = None) -> dict:
     """
     Calculate cancellation fee based on check-in date and policy.
     """
-    check_in = datetime.strptime(check_in_date, "%Y-%m-%d")
-    now = datetime.now()
+    check_in = datetime.fromordinal(check_in_ordinal)
+    now = now or datetime.now()
     hours_until_checkin = (check_in - now).total_seconds() / 3600
 
-    if hours_until_checkin >= 48:
-        return {
-            "fee": 0,
-            "refund_type": "full_refund",
-            "message": "Your cancellation is more than 48 hours before check-in. You will receive a full refund.",
-        }
+    if hours_until_checkin >= FREE_CANCELLATION_HOURS:
+        return dict(FULL_REFUND)
     elif hours_until_checkin > 0:
-        return {
-            "fee": "first_night",
-            "refund_type": "partial_refund",
-            "message": "Your cancellation is within 48 hours of check-in. The first night will be charged as per our cancellation policy.",
-        }
+        return dict(PARTIAL_REFUND)
     else:
-        return {
-            "fee": "full_amount",
-            "refund_type": "no_refund",
-            "message": "The check-in date has passed. Unfortunately, no refund is available for this reservation.",
-        }
+        return dict(NO_REFUND)
+
+
+@lru_cache(maxsize=1)
+def _cancellation_stamps(now: datetime) -> tuple:
+    """(cancelled_on, reference date) for a cancellation at `now`; bulk cancellations share one `now`."""
+    return now.strftime("%Y-%m-%d %H:%M"), now.strftime("%Y%m%d")
+
+
+def cancellation_fields(conf_num: str, cancellation_reason: str, fee_info: dict, now: datetime) -> dict:
+    """What ReservationStore.cancel records about a cancellation made at `now`."""
+    cancelled_on, reference_date = _cancellation_stamps(now)
+    return {
+        "cancelled_on": cancelled_on,
+        "cancellation_reason": cancellation_reason,
+        "cancellation_ref": f"CXL-{conf_num}-{reference_date}",
+        "cancellation_fee": fee_info["fee"],
+        "refund_type": fee_info["refund_type"],
+    }
+
+
+def cancellation_response(conf_num: str, reservation: ReservationRecord, fee_info: dict, cancellation_ref: str) -> dict:
+    """The cancel_reservation result for a reservation that was cancelled."""
+    # Prepare response based on refund type
+    if fee_info["refund_type"] == "full_refund":
+        refund_message = f"A full refund of ${reservation.total_cost:.2f} will be processed to your original payment method within 5-7 business days."
+    elif fee_info["refund_type"] == "partial_refund":
+        refund_amount = reservation.total_cost - reservation.rate_per_night
+        refund_message = f"As per our cancellation policy, the first night (${reservation.rate_per_night:.2f}) will be charged. A refund of ${refund_amount:.2f} will be processed within 5-7 business days."
+    else:
+        refund_message = "As the check-in date has passed, no refund is available for this reservation."
+
+    return {
+        "status": "cancelled",
+        "cancellation_reference": cancellation_ref,
+        "original_confirmation": conf_num,
+        "guest_name": reservation.guest_name,
+        "check_in_date": reservation.check_in,
+        "check_out_date": reservation.check_out,
+        "cancellation_policy_applied": fee_info["message"],
+        "refund_information": refund_message,
+        "message": f"Your reservation has been successfully cancelled. Your cancellation reference number is {cancellation_ref}. Please save this for your records. {refund_message}",
+    }
 
 
-def _generate_callback_id() -> str:
-    """Generate a unique callback reference number."""
-    callback_id = f"CB-{RESERVATIONS_DB['next_callback_id']}"
-    RESERVATIONS_DB["next_callback_id"] += 1
-    return callback_id
+_info_index = HotelInfoIndex(HOTEL_INFO)
+
+
+def _hotel_info_index() -> HotelInfoIndex:
+    """The answer index for HOTEL_INFO, rebuilt if HOTEL_INFO was replaced."""
+    global _info_index
+    if _info_index.source is not HOTEL_INFO:
+        _info_index = HotelInfoIndex(HOTEL_INFO)
+    return _info_index
+
+
+def invalidate_hotel_info_cache() -> None:
+    """Rebuild get_hotel_info answers after HOTEL_INFO was edited in place."""
+    global _info_index
+    _info_index = HotelInfoIndex(HOTEL_INFO)
 
 
 # =============================================================================
@@ -268,7 +528,7 @@ def _generate_callback_id() -> str:
 # =============================================================================
 
 
-def get_hotel_info(category: str) -> dict:
+def get_hotel_info(category: str, hotel: Hotel = None) -> dict:
     """
     Get hotel information for a specific category.
 
@@ -279,75 +539,18 @@ def get_hotel_info(category: str) -> dict:
             - 'cancellation_policy', 'pet_policy', 'smoking_policy'
             - 'location', 'directions', 'contact'
             - 'room_types'
+        hotel: The property the caller rang, if not the default one
 
     Returns:
-        dict: The requested information
+        dict: The requested information. Close matches and synonyms
+            ("swimming pool", "checkout") get the answer for the nearest category.
     """
     category = category.lower().strip().replace(" ", "_")
 
-    # Direct hotel info fields
-    direct_fields = [
-        "name",
-        "address",
-        "phone",
-        "email",
-        "website",
-        "check_in_time",
-        "early_check_in",
-        "check_out_time",
-        "late_check_out",
-        "location",
-        "directions",
-        "contact",
-    ]
-
-    if category in direct_fields:
-        return {"category": category, "information": HOTEL_INFO[category]}
-
-    # Amenity-specific queries
-    if category in HOTEL_INFO["amenities"]:
-        return {"category": category, "information": HOTEL_INFO["amenities"][category]}
-
-    # All amenities
-    if category == "amenities" or category == "all_amenities":
-        amenities_list = []
-        for name, description in HOTEL_INFO["amenities"].items():
-            amenities_list.append(f"{name.title()}: {description}")
-        return {
-            "category": "amenities",
-            "information": "Our hotel amenities include: " + "; ".join(amenities_list),
-        }
-
-    # Policy queries
-    policy_mapping = {
-        "cancellation_policy": "cancellation",
-        "cancellation": "cancellation",
-        "pet_policy": "pets",
-        "pets": "pets",
-        "smoking_policy": "smoking",
-        "smoking": "smoking",
-        "age_requirement": "age_requirement",
-        "payment": "payment",
-        "quiet_hours": "quiet_hours",
-    }
-
-    if category in policy_mapping:
-        policy_key = policy_mapping[category]
-        return {"category": category, "information": HOTEL_INFO["policies"][policy_key]}
-
-    # Room types
-    if category == "room_types" or category == "rooms":
-        room_info = []
-        for room_key, room_data in HOTEL_INFO["room_types"].items():
-            room_info.append(
-                f"{room_data['name']} - ${room_data['price_per_night']} per night, "
-                f"up to {room_data['max_guests']} guests. {room_data['description']}"
-            )
-        return {
-            "category": "room_types",
-            "information": "We offer the following room types: "
-            + " | ".join(room_info),
-        }
+    index = (hotel or DEFAULT_HOTEL).info_index
+    answer = index.lookup(category)
+    if answer is not None:
+        return answer
 
     # Unknown category
     return {
@@ -356,18 +559,21 @@ def get_hotel_info(category: str) -> dict:
     }
 
 
-def lookup_reservation(confirmation_number: str, last_name: str) -> dict:
+def lookup_reservation(confirmation_number: str, last_name: str, session: GuestSession = None, hotel: Hotel = None) -> dict:
     """
     Look up a reservation by confirmation number and verify with last name.
 
     Args:
         confirmation_number: The reservation confirmation number (e.g., 'GH-78432')
         last_name: Guest's last name for verification
+        session: The caller's GuestSession, if any
+        hotel: The property the caller rang, if not the default one
 
     Returns:
         dict: Reservation details or error message
     """
-    success, result = _verify_reservation(confirmation_number, last_name)
+    hotel = hotel or DEFAULT_HOTEL
+    success, result = _verify_reservation(confirmation_number, last_name, session, hotel)
 
     if not success:
         if result == "not_found":
@@ -376,9 +582,7 @@ def lookup_reservation(confirmation_number: str, last_name: str) -> dict:
                 "message": f"I couldn't find a reservation with confirmation number {confirmation_number.upper()}. Please double-check the number. It should start with 'GH-' followed by 5 digits.",
             }
         elif result == "cancelled":
-            cancelled = RESERVATIONS_DB["cancelled_reservations"].get(
-                confirmation_number.upper(), {}
-            )
+            cancelled = hotel.store.get(confirmation_number.upper().strip()) or {}
             return {
                 "error": "reservation_cancelled",
                 "message": f"This reservation was cancelled on {cancelled.get('cancelled_on', 'a previous date')}. Cancellation reference: {cancelled.get('cancellation_ref', 'N/A')}.",
@@ -391,29 +595,33 @@ def lookup_reservation(confirmation_number: str, last_name: str) -> dict:
 
     # Success - return reservation details
     reservation = result
-    room_type_info = HOTEL_INFO["room_types"].get(reservation["room_type"], {})
+    room_type_info = hotel.info["room_types"].get(reservation.room_type, {})
 
     return {
         "status": "found",
         "confirmation_number": confirmation_number.upper(),
-        "guest_name": reservation["guest_name"],
-        "check_in_date": reservation["check_in"],
-        "check_out_date": reservation["check_out"],
-        "nights": reservation["nights"],
-        "room_type": room_type_info.get("name", reservation["room_type"]),
-        "room_number": reservation["room_number"],
-        "number_of_guests": reservation["guests"],
-        "rate_per_night": f"${reservation['rate_per_night']:.2f}",
-        "total_cost": f"${reservation['total_cost']:.2f}",
-        "reservation_status": reservation["status"],
-        "payment_status": reservation["payment_status"],
-        "special_requests": reservation["special_requests"],
-        "message": f"I found your reservation, {reservation['guest_name']}. You have a {room_type_info.get('name', reservation['room_type'])} booked for {reservation['nights']} nights, checking in on {reservation['check_in']} and checking out on {reservation['check_out']}. Your room number is {reservation['room_number']} and the total cost is ${reservation['total_cost']:.2f}.",
+        "guest_name": reservation.guest_name,
+        "check_in_date": reservation.check_in,
+        "check_out_date": reservation.check_out,
+        "nights": reservation.nights,
+        "room_type": room_type_info.get("name", reservation.room_type),
+        "room_number": reservation.room_number,
+        "number_of_guests": reservation.guests,
+        "rate_per_night": f"${reservation.rate_per_night:.2f}",
+        "total_cost": f"${reservation.total_cost:.2f}",
+        "reservation_status": reservation.status,
+        "payment_status": reservation.payment_status,
+        "special_requests": reservation.special_requests,
+        "message": f"I found your reservation, {reservation.guest_name}. You have a {room_type_info.get('name', reservation.room_type)} booked for {reservation.nights} nights, checking in on {reservation.check_in} and checking out on {reservation.check_out}. Your room number is {reservation.room_number} and the total cost is ${reservation.total_cost:.2f}.",
     }
 
 
 def cancel_reservation(
-    confirmation_number: str, last_name: str, cancellation_reason: str
+    confirmation_number: str,
+    last_name: str,
+    cancellation_reason: str,
+    session: GuestSession = None,
+    hotel: Hotel = None,
 ) -> dict:
     """
     Cancel a reservation after verification.
@@ -423,76 +631,65 @@ def cancel_reservation(
         last_name: Guest's last name for verification
         cancellation_reason: Reason for cancellation (change_of_plans, emergency,
                            found_alternative, price_concern, other)
+        session: The caller's GuestSession, if any
+        hotel: The property the caller rang, if not the default one
 
     Returns:
         dict: Cancellation confirmation or error
     """
-    success, result = _verify_reservation(confirmation_number, last_name)
-
-    if not success:
-        if result == "not_found":
-            return {
-                "error": "reservation_not_found",
-                "message": f"I couldn't find a reservation with confirmation number {confirmation_number.upper()}. Please verify the confirmation number is correct.",
-            }
-        elif result == "cancelled":
-            return {
-                "error": "already_cancelled",
-                "message": "This reservation has already been cancelled. No further action is needed.",
-            }
-        elif result == "name_mismatch":
-            return {
-                "error": "verification_failed",
-                "message": "The last name provided doesn't match our records. For security purposes, I cannot process this cancellation. Please verify you have the correct information.",
-            }
-
-    reservation = result
-    conf_num = confirmation_number.upper().strip()
-
-    # Calculate cancellation fee
-    fee_info = _calculate_cancellation_fee(reservation["check_in"])
+    hotel = hotel or DEFAULT_HOTEL
+    for attempt in range(MUTATION_ATTEMPTS):
+        success, result = _verify_reservation(confirmation_number, last_name, session, hotel)
 
-    # Generate cancellation reference
-    cancellation_ref = f"CXL-{conf_num}-{datetime.now().strftime('%Y%m%d')}"
-
-    # Process cancellation
-    cancelled_reservation = {
-        **reservation,
-        "cancelled_on": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "cancellation_reason": cancellation_reason,
-        "cancellation_ref": cancellation_ref,
-        "cancellation_fee": fee_info["fee"],
-        "refund_type": fee_info["refund_type"],
-    }
-
-    # Move to cancelled reservations
-    RESERVATIONS_DB["cancelled_reservations"][conf_num] = cancelled_reservation
-    del RESERVATIONS_DB["reservations"][conf_num]
+        if not success:
+            if result == "not_found":
+                return {
+                    "error": "reservation_not_found",
+                    "message": f"I couldn't find a reservation with confirmation number {confirmation_number.upper()}. Please verify the confirmation number is correct.",
+                }
+            elif result == "cancelled":
+                return {
+                    "error": "already_cancelled",
+                    "message": "This reservation has already been cancelled. No further action is needed.",
+                }
+            elif result == "name_mismatch":
+                return {
+                    "error": "verification_failed",
+                    "message": "The last name provided doesn't match our records. For security purposes, I cannot process this cancellation. Please verify you have the correct information.",
+                }
 
-    # Prepare response based on refund type
-    if fee_info["refund_type"] == "full_refund":
-        refund_message = f"A full refund of ${reservation['total_cost']:.2f} will be processed to your original payment method within 5-7 business days."
-    elif fee_info["refund_type"] == "partial_refund":
-        refund_amount = reservation["total_cost"] - reservation["rate_per_night"]
-        refund_message = f"As per our cancellation policy, the first night (${reservation['rate_per_night']:.2f}) will be charged. A refund of ${refund_amount:.2f} will be processed within 5-7 business days."
+        reservation = result
+        conf_num = confirmation_number.upper().strip()
+
+        # Calculate cancellation fee
+        now = datetime.now()
+        fee_info = _calculate_cancellation_fee(reservation.check_in_ordinal, now)
+        cancellation = cancellation_fields(conf_num, cancellation_reason, fee_info, now)
+
+        # Whether the write below succeeds or conflicts, the cached copy is stale
+        if session is not None:
+            session.forget(conf_num)
+
+        # Process cancellation, unless the reservation changed since it was read
+        with hotel.inventory.lock:
+            if hotel.store.cancel(conf_num, cancellation, expected_version=reservation.version):
+                # Free the room for the cancelled nights
+                hotel.inventory.remove(reservation.room_type, reservation.check_in, reservation.check_out)
+                break
+        _backoff(attempt)
     else:
-        refund_message = "As the check-in date has passed, no refund is available for this reservation."
+        return _conflict_error()
 
-    return {
-        "status": "cancelled",
-        "cancellation_reference": cancellation_ref,
-        "original_confirmation": conf_num,
-        "guest_name": reservation["guest_name"],
-        "check_in_date": reservation["check_in"],
-        "check_out_date": reservation["check_out"],
-        "cancellation_policy_applied": fee_info["message"],
-        "refund_information": refund_message,
-        "message": f"Your reservation has been successfully cancelled. Your cancellation reference number is {cancellation_ref}. Please save this for your records. {refund_message}",
-    }
+    return cancellation_response(conf_num, reservation, fee_info, cancellation["cancellation_ref"])
 
 
 def modify_reservation(
-    confirmation_number: str, last_name: str, modification_type: str, new_value: str
+    confirmation_number: str,
+    last_name: str,
+    modification_type: str,
+    new_value: str,
+    session: GuestSession = None,
+    hotel: Hotel = None,
 ) -> dict:
     """
     Modify an existing reservation.
@@ -503,188 +700,220 @@ def modify_reservation(
         modification_type: Type of modification (check_in_date, check_out_date,
                           room_type, guest_count, add_request)
         new_value: The new value for the modification
+        session: The caller's GuestSession, if any
+        hotel: The property the caller rang, if not the default one
 
     Returns:
         dict: Modification confirmation or error
     """
-    success, result = _verify_reservation(confirmation_number, last_name)
+    hotel = hotel or DEFAULT_HOTEL
+    for attempt in range(MUTATION_ATTEMPTS):
+        success, result = _verify_reservation(confirmation_number, last_name, session, hotel)
 
-    if not success:
-        if result == "not_found":
-            return {
-                "error": "reservation_not_found",
-                "message": f"I couldn't find a reservation with confirmation number {confirmation_number.upper()}.",
-            }
-        elif result == "cancelled":
-            return {
-                "error": "reservation_cancelled",
-                "message": "This reservation has been cancelled and cannot be modified. Would you like me to help you make a new reservation?",
-            }
-        elif result == "name_mismatch":
-            return {
-                "error": "verification_failed",
-                "message": "The last name provided doesn't match our records. I cannot process this modification.",
-            }
+        if not success:
+            if result == "not_found":
+                return {
+                    "error": "reservation_not_found",
+                    "message": f"I couldn't find a reservation with confirmation number {confirmation_number.upper()}.",
+                }
+            elif result == "cancelled":
+                return {
+                    "error": "reservation_cancelled",
+                    "message": "This reservation has been cancelled and cannot be modified. Would you like me to help you make a new reservation?",
+                }
+            elif result == "name_mismatch":
+                return {
+                    "error": "verification_failed",
+                    "message": "The last name provided doesn't match our records. I cannot process this modification.",
+                }
 
-    reservation = result
-    conf_num = confirmation_number.upper().strip()
-    modification_type = modification_type.lower().strip()
-
-    # Store original values for comparison
-    original_total = reservation["total_cost"]
-    changes_made = []
-
-    if modification_type == "check_in_date":
-        try:
-            new_date = datetime.strptime(new_value, "%Y-%m-%d")
-            old_date = reservation["check_in"]
-            reservation["check_in"] = new_value
-
-            # Recalculate nights and total
-            check_out = datetime.strptime(reservation["check_out"], "%Y-%m-%d")
-            nights = (check_out - new_date).days
-            if nights <= 0:
-                reservation["check_in"] = old_date  # Revert
+        reservation = result
+        conf_num = confirmation_number.upper().strip()
+        modification_type = modification_type.lower().strip()
+
+        # Store original values for comparison
+        original_total = reservation.total_cost
+        changes_made = []
+        # Fields to write back to the store; `reservation` is a private copy
+        updates = {}
+
+        if modification_type == "check_in_date":
+            try:
+                new_date = datetime.strptime(new_value, "%Y-%m-%d").date()
+                old_date = reservation.check_in
+
+                # Recalculate nights and total
+                nights = reservation.check_out_ordinal - new_date.toordinal()
+                if nights <= 0:
+                    return {
+                        "error": "invalid_dates",
+                        "message": "The new check-in date must be before the check-out date. Please provide a valid date.",
+                    }
+
+                updates["check_in"] = new_date.isoformat()
+                updates["nights"] = nights
+                updates["total_cost"] = nights * reservation.rate_per_night
+                changes_made.append(f"Check-in date changed from {old_date} to {new_value}")
+
+            except ValueError:
                 return {
-                    "error": "invalid_dates",
-                    "message": "The new check-in date must be before the check-out date. Please provide a valid date.",
+                    "error": "invalid_date_format",
+                    "message": "Please provide the date in YYYY-MM-DD format, for example 2025-01-15.",
                 }
 
-            reservation["nights"] = nights
-            reservation["total_cost"] = nights * reservation["rate_per_night"]
-            changes_made.append(f"Check-in date changed from {old_date} to {new_value}")
+        elif modification_type == "check_out_date":
+            try:
+                new_date = datetime.strptime(new_value, "%Y-%m-%d").date()
+                old_date = reservation.check_out
+                nights = new_date.toordinal() - reservation.check_in_ordinal
+
+                if nights <= 0:
+                    return {
+                        "error": "invalid_dates",
+                        "message": "The check-out date must be after the check-in date. Please provide a valid date.",
+                    }
+
+                updates["check_out"] = new_date.isoformat()
+                updates["nights"] = nights
+                updates["total_cost"] = nights * reservation.rate_per_night
+                changes_made.append(
+                    f"Check-out date changed from {old_date} to {new_value}"
+                )
+
+            except ValueError:
+                return {
+                    "error": "invalid_date_format",
+                    "message": "Please provide the date in YYYY-MM-DD format, for example 2025-01-18.",
+                }
 
-        except ValueError:
-            return {
-                "error": "invalid_date_format",
-                "message": "Please provide the date in YYYY-MM-DD format, for example 2025-01-15.",
-            }
+        elif modification_type == "room_type":
+            new_room = new_value.lower().strip()
+            if new_room not in hotel.info["room_types"]:
+                available = ", ".join(
+                    [r["name"] for r in hotel.info["room_types"].values()]
+                )
+                return {
+                    "error": "invalid_room_type",
+                    "message": f"'{new_value}' is not a valid room type. Available options are: {available}.",
+                }
 
-    elif modification_type == "check_out_date":
-        try:
-            new_date = datetime.strptime(new_value, "%Y-%m-%d")
-            old_date = reservation["check_out"]
-            check_in = datetime.strptime(reservation["check_in"], "%Y-%m-%d")
-            nights = (new_date - check_in).days
+            old_room = reservation.room_type
+            old_room_name = hotel.info["room_types"][old_room]["name"]
+            new_room_info = hotel.info["room_types"][new_room]
 
-            if nights <= 0:
+            # Check guest capacity
+            if reservation.guests > new_room_info["max_guests"]:
                 return {
-                    "error": "invalid_dates",
-                    "message": "The check-out date must be after the check-in date. Please provide a valid date.",
+                    "error": "capacity_exceeded",
+                    "message": f"The {new_room_info['name']} has a maximum capacity of {new_room_info['max_guests']} guests, but your reservation is for {reservation.guests} guests. Please choose a larger room type or reduce the number of guests.",
                 }
 
-            reservation["check_out"] = new_value
-            reservation["nights"] = nights
-            reservation["total_cost"] = nights * reservation["rate_per_night"]
-            changes_made.append(
-                f"Check-out date changed from {old_date} to {new_value}"
+            updates["room_type"] = new_room
+            updates["rate_per_night"] = new_room_info["price_per_night"]
+            updates["total_cost"] = (
+                reservation.nights * new_room_info["price_per_night"]
             )
-
-        except ValueError:
-            return {
-                "error": "invalid_date_format",
-                "message": "Please provide the date in YYYY-MM-DD format, for example 2025-01-18.",
-            }
-
-    elif modification_type == "room_type":
-        new_room = new_value.lower().strip()
-        if new_room not in HOTEL_INFO["room_types"]:
-            available = ", ".join(
-                [r["name"] for r in HOTEL_INFO["room_types"].values()]
+            changes_made.append(
+                f"Room type changed from {old_room_name} to {new_room_info['name']}"
             )
-            return {
-                "error": "invalid_room_type",
-                "message": f"'{new_value}' is not a valid room type. Available options are: {available}.",
-            }
-
-        old_room = reservation["room_type"]
-        old_room_name = HOTEL_INFO["room_types"][old_room]["name"]
-        new_room_info = HOTEL_INFO["room_types"][new_room]
-
-        # Check guest capacity
-        if reservation["guests"] > new_room_info["max_guests"]:
-            return {
-                "error": "capacity_exceeded",
-                "message": f"The {new_room_info['name']} has a maximum capacity of {new_room_info['max_guests']} guests, but your reservation is for {reservation['guests']} guests. Please choose a larger room type or reduce the number of guests.",
-            }
-
-        reservation["room_type"] = new_room
-        reservation["rate_per_night"] = new_room_info["price_per_night"]
-        reservation["total_cost"] = (
-            reservation["nights"] * new_room_info["price_per_night"]
-        )
-        changes_made.append(
-            f"Room type changed from {old_room_name} to {new_room_info['name']}"
-        )
 
-    elif modification_type == "guest_count":
-        try:
-            new_guests = int(new_value)
-            room_info = HOTEL_INFO["room_types"][reservation["room_type"]]
-
-            if new_guests <= 0:
+        elif modification_type == "guest_count":
+            try:
+                new_guests = int(new_value)
+                room_info = hotel.info["room_types"][reservation.room_type]
+
+                if new_guests <= 0:
+                    return {
+                        "error": "invalid_guest_count",
+                        "message": "The number of guests must be at least 1.",
+                    }
+
+                if new_guests > room_info["max_guests"]:
+                    return {
+                        "error": "capacity_exceeded",
+                        "message": f"Your current room ({room_info['name']}) has a maximum capacity of {room_info['max_guests']} guests. Would you like to upgrade to a larger room type?",
+                    }
+
+                old_guests = reservation.guests
+                updates["guests"] = new_guests
+                changes_made.append(
+                    f"Number of guests changed from {old_guests} to {new_guests}"
+                )
+
+            except ValueError:
                 return {
                     "error": "invalid_guest_count",
-                    "message": "The number of guests must be at least 1.",
-                }
-
-            if new_guests > room_info["max_guests"]:
-                return {
-                    "error": "capacity_exceeded",
-                    "message": f"Your current room ({room_info['name']}) has a maximum capacity of {room_info['max_guests']} guests. Would you like to upgrade to a larger room type?",
+                    "message": "Please provide a valid number for the guest count.",
                 }
 
-            old_guests = reservation["guests"]
-            reservation["guests"] = new_guests
-            changes_made.append(
-                f"Number of guests changed from {old_guests} to {new_guests}"
-            )
+        elif modification_type == "add_request":
+            updates["special_requests"] = reservation.special_requests + [new_value]
+            changes_made.append(f"Added special request: {new_value}")
 
-        except ValueError:
+        else:
             return {
-                "error": "invalid_guest_count",
-                "message": "Please provide a valid number for the guest count.",
+                "error": "invalid_modification_type",
+                "message": "I can help you modify: check-in date, check-out date, room type, guest count, or add a special request. What would you like to change?",
             }
 
-    elif modification_type == "add_request":
-        reservation["special_requests"].append(new_value)
-        changes_made.append(f"Added special request: {new_value}")
+        # Whether the write below succeeds or conflicts, the cached copy is stale
+        if session is not None:
+            session.forget(conf_num)
 
+        # New dates or a new room type need those nights free in that room type
+        old_stay = (reservation.room_type, reservation.check_in, reservation.check_out)
+        new_stay = (
+            updates.get("room_type", old_stay[0]),
+            updates.get("check_in", old_stay[1]),
+            updates.get("check_out", old_stay[2]),
+        )
+        if new_stay == old_stay:
+            # Commit only if nobody changed the reservation since it was read
+            if hotel.store.update(conf_num, updates, expected_version=reservation.version):
+                break
+        else:
+            # Hold the inventory from the availability check until it reflects the commit
+            with hotel.inventory.lock:
+                if not hotel.inventory.can_move(old_stay, new_stay):
+                    return _no_availability_error(hotel, *new_stay)
+                if hotel.store.update(conf_num, updates, expected_version=reservation.version):
+                    hotel.inventory.move(old_stay, new_stay)
+                    break
+        _backoff(attempt)
     else:
-        return {
-            "error": "invalid_modification_type",
-            "message": "I can help you modify: check-in date, check-out date, room type, guest count, or add a special request. What would you like to change?",
-        }
+        return _conflict_error()
+
+    reservation.update(updates)
 
     # Calculate price difference
-    price_difference = reservation["total_cost"] - original_total
+    price_difference = reservation.total_cost - original_total
 
     if price_difference > 0:
-        price_message = f"This change results in an additional charge of ${price_difference:.2f}. Your new total is ${reservation['total_cost']:.2f}."
+        price_message = f"This change results in an additional charge of ${price_difference:.2f}. Your new total is ${reservation.total_cost:.2f}."
     elif price_difference < 0:
-        price_message = f"This change results in a credit of ${abs(price_difference):.2f}. Your new total is ${reservation['total_cost']:.2f}."
+        price_message = f"This change results in a credit of ${abs(price_difference):.2f}. Your new total is ${reservation.total_cost:.2f}."
     else:
-        price_message = f"Your total remains ${reservation['total_cost']:.2f}."
+        price_message = f"Your total remains ${reservation.total_cost:.2f}."
 
     return {
         "status": "modified",
         "confirmation_number": conf_num,
         "changes_made": changes_made,
-        "new_check_in": reservation["check_in"],
-        "new_check_out": reservation["check_out"],
-        "new_room_type": HOTEL_INFO["room_types"][reservation["room_type"]]["name"],
-        "new_guest_count": reservation["guests"],
-        "new_total": f"${reservation['total_cost']:.2f}",
+        "new_check_in": reservation.check_in,
+        "new_check_out": reservation.check_out,
+        "new_room_type": hotel.info["room_types"][reservation.room_type]["name"],
+        "new_guest_count": reservation.guests,
+        "new_total": f"${reservation.total_cost:.2f}",
         "price_difference": f"${price_difference:.2f}"
         if price_difference != 0
         else "No change",
-        "special_requests": reservation["special_requests"],
+        "special_requests": reservation.special_requests,
         "message": f"Your reservation has been updated. {'; '.join(changes_made)}. {price_message}",
     }
 
 
 def request_callback(
-    guest_name: str, phone_number: str, issue_description: str
+    guest_name: str, phone_number: str, issue_description: str, hotel: Hotel = None
 ) -> dict:
     """
     Request a callback from a human agent for complex issues.
@@ -693,23 +922,25 @@ def request_callback(
         guest_name: Name of the guest requesting callback
         phone_number: Phone number to call back
         issue_description: Brief description of the issue
+        hotel: The property the caller rang, if not the default one
 
     Returns:
         dict: Callback request confirmation
     """
-    callback_id = _generate_callback_id()
-
-    # Store callback request
-    RESERVATIONS_DB["callback_requests"][callback_id] = {
-        "guest_name": guest_name,
-        "phone_number": phone_number,
-        "issue_description": issue_description,
-        "requested_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "status": "pending",
-    }
-
-    # Estimate wait time based on "queue" (random for demo)
-    estimated_wait = random.choice([15, 30, 45, 60])
+    hotel = hotel or DEFAULT_HOTEL
+    # Store callback request under the next reference number, queued by priority
+    queued = hotel.callbacks.enqueue(
+        {
+            "guest_name": guest_name,
+            "phone_number": phone_number,
+            "issue_description": issue_description,
+            "requested_at": datetime.now().strftime("%Y-%m-%d %H:%M"),
+            "status": "pending",
+        }
+    )
+    callback_id = queued["callback_id"]
+    # Quote whole five-minute steps, never less than five minutes
+    estimated_wait = max(5, -(-int(queued["eta_seconds"]) // 300) * 5)
 
     return {
         "status": "callback_scheduled",
@@ -717,10 +948,43 @@ def request_callback(
         "guest_name": guest_name,
         "phone_number": phone_number,
         "estimated_callback_time": f"Within {estimated_wait} minutes",
+        "priority": queued["priority"],
         "message": f"Thank you, {guest_name}. I've submitted a callback request with reference number {callback_id}. A member of our guest services team will call you at {phone_number} within {estimated_wait} minutes. Is there anything else I can help you with in the meantime?",
     }
 
 
+# =============================================================================
+# AGENT CONSOLE (Used by guest services staff, not the voice agent)
+# =============================================================================
+
+
+def next_callback(hotel: Hotel = None):
+    """
+    Take the most urgent pending callback for an agent to work on.
+
+    Args:
+        hotel: The agent's property, if not the default one
+
+    Returns:
+        dict: The callback request, now 'in_progress', or None if none are waiting
+    """
+    return (hotel or DEFAULT_HOTEL).callbacks.dequeue()
+
+
+def complete_callback(callback_id: str, hotel: Hotel = None) -> bool:
+    """
+    Mark a callback taken with next_callback() as done.
+
+    Args:
+        callback_id: The callback reference, e.g. CB-5001
+        hotel: The agent's property, if not the default one
+
+    Returns:
+        bool: Whether the callback existed and was not already completed
+    """
+    return (hotel or DEFAULT_HOTEL).callbacks.complete(callback_id)
+
+
 # =============================================================================
 # FUNCTION MAPPING (Used by voice agent)
 # =============================================================================
@@ -732,3 +996,10 @@ FUNCTION_MAP = {
     "modify_reservation": modify_reservation,
     "request_callback": request_callback,
 }
+
+# Functions that change reservations; results of earlier calls may be stale after them
+MUTATING_FUNCTIONS = {"cancel_reservation", "modify_reservation"}
+
+# Functions that write to the store. A timed-out call of one keeps running in its
+# thread, so a repeat must wait for that run instead of starting a second one
+WRITING_FUNCTIONS = MUTATING_FUNCTIONS | {"request_callback"}
@@ -0,0 +1,209 @@
+"""
+Hotel Info Index
+Precompiled answers for get_hotel_info, with synonym and fuzzy lookup.
+
+Every answer the hotel information can give is built once, together with
+its JSON serialization, so a lookup is a dict hit and the response content
+needs no json.dumps. Categories the LLM phrases differently ("swimming
+pool", "checkout", "pets allowed") are resolved through a synonym table,
+then through a character trigram index that tolerates typos and extra words.
+A fuzzy match is only trusted when it is clearly closer than the best match
+in any other category; a query between two categories ("hours") gets the
+error listing what can be asked instead of a confident wrong answer.
+"""
+
+import json
+
+# Canonical category -> other ways a caller or the LLM may ask for it
+SYNONYMS = {
+    "name": ["hotel_name"],
+    "address": ["street_address", "hotel_address"],
+    "phone": ["phone_number", "telephone", "call"],
+    "email": ["email_address", "e-mail"],
+    "website": ["web_site", "url", "online"],
+    "check_in_time": ["check_in", "checkin", "checkin_time", "arrival_time"],
+    "early_check_in": ["early_checkin", "early_arrival"],
+    "check_out_time": ["check_out", "checkout", "checkout_time", "departure_time"],
+    "late_check_out": ["late_checkout", "late_departure"],
+    "location": ["where", "area", "neighborhood", "nearby"],
+    "directions": ["how_to_get_there", "getting_here", "from_the_airport"],
+    "contact": ["contact_information", "contact_info", "reach_us"],
+    "pool": ["swimming_pool", "swimming", "infinity_pool", "rooftop_pool"],
+    "gym": ["fitness", "fitness_center", "workout", "exercise"],
+    "spa": ["massage", "facial", "treatments", "serenity_spa"],
+    "restaurant": ["dining", "food", "breakfast", "lunch", "dinner", "horizon_grill"],
+    "bar": ["lounge", "drinks", "cocktails", "skyline_lounge"],
+    "wifi": ["wi-fi", "internet", "wireless"],
+    "parking": ["valet", "garage", "car_park", "ev_charging"],
+    "business_center": ["business", "printing", "meeting"],
+    "concierge": ["tours", "recommendations"],
+    "room_service": ["in_room_dining", "in-room_dining"],
+    "amenities": ["facilities", "services", "hotel_amenities"],
+    "policies": ["policy", "hotel_policies", "all_policies", "rules", "house_rules"],
+    "cancellation_policy": ["cancel", "cancelling", "refund", "refunds", "cancellation_fee"],
+    "pet_policy": ["pet", "dog", "dogs", "animals", "pet_friendly", "pets_allowed"],
+    "smoking_policy": ["smoke", "non_smoking", "no_smoking"],
+    "age_requirement": ["minimum_age", "age", "age_limit"],
+    "payment": ["credit_card", "payment_methods", "pay"],
+    "quiet_hours": ["noise", "quiet"],
+    "room_types": ["room_type", "room", "suites", "room_prices", "room_rates"],
+}
+
+DIRECT_FIELDS = (
+    "name",
+    "address",
+    "phone",
+    "email",
+    "website",
+    "check_in_time",
+    "early_check_in",
+    "check_out_time",
+    "late_check_out",
+    "location",
+    "directions",
+    "contact",
+)
+
+POLICY_MAPPING = {
+    "cancellation_policy": "cancellation",
+    "cancellation": "cancellation",
+    "pet_policy": "pets",
+    "pets": "pets",
+    "smoking_policy": "smoking",
+    "smoking": "smoking",
+    "age_requirement": "age_requirement",
+    "payment": "payment",
+    "quiet_hours": "quiet_hours",
+}
+
+# Minimum Dice similarity of trigram sets for a fuzzy match
+FUZZY_THRESHOLD = 0.5
+# How much closer a fuzzy match must be than the closest alias with a different answer
+FUZZY_MARGIN = 0.1
+# Resolved fuzzy queries kept before the memo is cleared
+FUZZY_MEMO_SIZE = 1024
+
+
+class InfoAnswer(dict):
+    """
+    A get_hotel_info result with its JSON serialization attached.
+
+    Answers are shared between calls and must not be modified.
+    """
+
+    __slots__ = ("content",)
+
+    def __init__(self, answer: dict):
+        super().__init__(answer)
+        self.content = json.dumps(answer)
+
+
+def normalize(category: str) -> str:
+    return category.lower().strip().replace(" ", "_")
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key.replace('_', ' ')} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def build_answers(hotel_info: dict) -> dict:
+    """Every exact category get_hotel_info understands -> its answer."""
+    answers = {}
+
+    for field in DIRECT_FIELDS:
+        answers[field] = {"category": field, "information": hotel_info[field]}
+
+    for amenity, description in hotel_info["amenities"].items():
+        answers[amenity] = {"category": amenity, "information": description}
+
+    amenities_list = [f"{name.title()}: {description}" for name, description in hotel_info["amenities"].items()]
+    everything = {"category": "amenities", "information": "Our hotel amenities include: " + "; ".join(amenities_list)}
+    answers["amenities"] = answers["all_amenities"] = everything
+
+    for category, policy_key in POLICY_MAPPING.items():
+        answers[category] = {"category": category, "information": hotel_info["policies"][policy_key]}
+
+    policies_list = [f"{name.replace('_', ' ').title()}: {text}" for name, text in hotel_info["policies"].items()]
+    answers["policies"] = {"category": "policies", "information": "Our hotel policies: " + "; ".join(policies_list)}
+
+    room_info = [
+        f"{room_data['name']} - ${room_data['price_per_night']} per night, "
+        f"up to {room_data['max_guests']} guests. {room_data['description']}"
+        for room_data in hotel_info["room_types"].values()
+    ]
+    rooms = {"category": "room_types", "information": "We offer the following room types: " + " | ".join(room_info)}
+    answers["room_types"] = answers["rooms"] = rooms
+
+    return answers
+
+
+class HotelInfoIndex:
+    """
+    Answers for one HOTEL_INFO dict.
+
+    Args:
+        hotel_info: The hotel information; kept as `source` so callers can
+            tell when it has been replaced
+    """
+
+    def __init__(self, hotel_info: dict):
+        self.source = hotel_info
+        self.answers = {key: InfoAnswer(answer) for key, answer in build_answers(hotel_info).items()}
+
+        # Synonyms resolve to the canonical category's answer
+        self.aliases = {key: key for key in self.answers}
+        for canonical, synonyms in SYNONYMS.items():
+            if canonical in self.answers:
+                for synonym in synonyms:
+                    self.aliases.setdefault(normalize(synonym), canonical)
+
+        self._trigrams = {alias: trigrams(alias) for alias in self.aliases}
+        self._postings = {}
+        for alias, grams in self._trigrams.items():
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(alias)
+        self._fuzzy_memo = {}
+
+    def lookup(self, category: str):
+        """The answer for a normalized category, or None if nothing matches well enough."""
+        alias = self.aliases.get(category)
+        if alias is not None:
+            return self.answers[alias]
+
+        if category in self._fuzzy_memo:
+            return self._fuzzy_memo[category]
+
+        answer = None
+        alias = self._closest_alias(category)
+        if alias is not None:
+            answer = self.answers[self.aliases[alias]]
+
+        if len(self._fuzzy_memo) >= FUZZY_MEMO_SIZE:
+            self._fuzzy_memo.clear()
+        self._fuzzy_memo[category] = answer
+        return answer
+
+    def _closest_alias(self, category: str):
+        grams = trigrams(category)
+        shared = {}
+        for gram in grams:
+            for alias in self._postings.get(gram, ()):
+                shared[alias] = shared.get(alias, 0) + 1
+
+        if not shared:
+            return None
+        # Dice coefficient; ties go to the alphabetically first alias so results are stable
+        ranked = sorted(
+            (-2 * count / (len(grams) + len(self._trigrams[alias])), alias) for alias, count in shared.items()
+        )
+        score, alias = ranked[0]
+        if -score < FUZZY_THRESHOLD:
+            return None
+        # The closest alias with another answer; names for the same answer never compete
+        information = self.answers[self.aliases[alias]]["information"]
+        runner_up = next(
+            (-other for other, other_alias in ranked if self.answers[self.aliases[other_alias]]["information"] != information),
+            0.0,
+        )
+        return alias if -score - runner_up >= FUZZY_MARGIN else None
@@ -1,74 +1,284 @@
 import asyncio
 import base64
+import functools
+import inspect
 import json
+import logging
 import os
+import time
 import websockets
+from http import HTTPStatus
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
-from hotel_functions import FUNCTION_MAP
+from audio_pipeline import BoundedAudioQueue, OutboundPacer
+from call_logging import configure_logging, event, parse_sample_rates, start_call
+from function_cache import FunctionResultCache, normalize_arguments
+from hotel_functions import DEFAULT_HOTEL, FUNCTION_MAP, MUTATING_FUNCTIONS, WRITING_FUNCTIONS, GuestSession, open_default_hotel
+from metrics import COUNT_BUCKETS, REGISTRY, CallTimeline, start_metrics_server
+from session_recording import RecordingConnection, SessionRecorder
+from sessions import MAX_CALLS_REACHED, CallSession, SessionRegistry
+from settings_cache import SettingsCache
+from sts_pool import StsPool
+from tenants import TenantRegistry, TenantUnavailable
+from transcoding import TELEPHONY_FORMAT, make_transcoder
+from vad import EnergyVAD
+from workers import Supervisor, worker_count
 
 load_dotenv() 
 
+AUDIO_QUEUE_MAXSIZE = int(os.getenv("AUDIO_QUEUE_MAXSIZE", "5"))
+AUDIO_QUEUE_OVERFLOW = os.getenv("AUDIO_QUEUE_OVERFLOW", "drop_oldest")
+OUTBOUND_FRAME_MS = int(os.getenv("OUTBOUND_FRAME_MS", "20"))
+JITTER_BUFFER_FRAMES = int(os.getenv("JITTER_BUFFER_FRAMES", "3"))
+LOCAL_VAD = os.getenv("LOCAL_VAD", "false").lower() in ("1", "true", "yes")
+LOCAL_VAD_THRESHOLD_DB = float(os.getenv("LOCAL_VAD_THRESHOLD_DB", "-35"))
+LOCAL_VAD_CONFIRM_MS = int(os.getenv("LOCAL_VAD_CONFIRM_MS", "1500"))
+DEEPGRAM_AGENT_URL = os.getenv(
+    "DEEPGRAM_AGENT_URL", "wss://agent.deepgram.com/v1/agent/converse"
+)
+SERVER_HOST = os.getenv("SERVER_HOST", "localhost")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "5000"))
+CONFIG_PATH = os.getenv("CONFIG_PATH", "config.json")
+SETTINGS_RELOAD_INTERVAL = float(os.getenv("SETTINGS_RELOAD_INTERVAL", "1"))
+# Directory of per-property tenant files; empty serves config.json to every call
+TENANTS_DIR = os.getenv("TENANTS_DIR", "")
+TENANT_CACHE_MB = float(os.getenv("TENANT_CACHE_MB", "128"))
+STS_POOL_SIZE = int(os.getenv("STS_POOL_SIZE", "2"))
+STS_POOL_REFILL_RATE = float(os.getenv("STS_POOL_REFILL_RATE", "2"))
+STS_POOL_IDLE_EXPIRY = float(os.getenv("STS_POOL_IDLE_EXPIRY", "20"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9091"))
+FUNCTION_WORKERS = int(os.getenv("FUNCTION_WORKERS", "8"))
+FUNCTION_TIMEOUT_SECONDS = float(os.getenv("FUNCTION_TIMEOUT_SECONDS", "10"))
+FUNCTION_RESULT_TTL_SECONDS = float(os.getenv("FUNCTION_RESULT_TTL_SECONDS", "300"))
+FUNCTION_RESULT_CACHE_SIZE = int(os.getenv("FUNCTION_RESULT_CACHE_SIZE", "64"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+WORKERS = worker_count(int(os.getenv("WORKERS", "1")))
+WORKER_DRAIN_SECONDS = float(os.getenv("WORKER_DRAIN_SECONDS", "30"))
+MAX_CALLS = int(os.getenv("MAX_CALLS", "0"))
+ADMISSION_MAX_LOOP_LAG_MS = float(os.getenv("ADMISSION_MAX_LOOP_LAG_MS", "100"))
+# Directory to record every Deepgram session to, for replay; empty disables recording
+RECORD_SESSIONS_DIR = os.getenv("RECORD_SESSIONS_DIR", "")
+
+# Deepgram messages worth seeing at INFO; the rest (audio done, speaking
+# started, ...) are logged at DEBUG
+NOTABLE_DEEPGRAM_MESSAGES = {"Welcome", "ConversationText", "FunctionCallRequest"}
+
+log = logging.getLogger("voice_agent")
+
+# Per-function overrides, e.g. FUNCTION_TIMEOUT_MODIFY_RESERVATION=5
+FUNCTION_TIMEOUTS = {
+    name: float(os.getenv(f"FUNCTION_TIMEOUT_{name.upper()}", FUNCTION_TIMEOUT_SECONDS))
+    for name in FUNCTION_MAP
+}
+# Handlers that take the call's GuestSession as a `session` keyword
+SESSION_FUNCTIONS = {
+    name for name, func in FUNCTION_MAP.items() if "session" in inspect.signature(func).parameters
+}
+# Handlers that take the Hotel of the call's tenant as a `hotel` keyword
+HOTEL_FUNCTIONS = {
+    name for name, func in FUNCTION_MAP.items() if "hotel" in inspect.signature(func).parameters
+}
+
+function_executor = ThreadPoolExecutor(
+    max_workers=FUNCTION_WORKERS, thread_name_prefix="function-call"
+)
+settings_cache = SettingsCache(
+    CONFIG_PATH, known_functions=FUNCTION_MAP, check_interval=SETTINGS_RELOAD_INTERVAL
+)
+tenants = (
+    TenantRegistry(
+        TENANTS_DIR,
+        settings_cache,
+        known_functions=FUNCTION_MAP,
+        max_bytes=int(TENANT_CACHE_MB * 2**20),
+        check_interval=SETTINGS_RELOAD_INTERVAL,
+    )
+    if TENANTS_DIR
+    else None
+)
+# Strong references to in-flight function call tasks so they are not garbage collected
+function_tasks = set()
+# Strong references to the server's long-running background tasks (watchers, monitors)
+background_tasks = set()
+# Pre-warmed Deepgram connections, created in main() when STS_POOL_SIZE > 0
+sts_pool = None
+# This process's WorkerContext in worker mode (WORKERS > 1), else None
+worker = None
+
+# Live calls, and frame totals of finished calls
+sessions = SessionRegistry(MAX_CALLS, ADMISSION_MAX_LOOP_LAG_MS / 1000)
+finished_frames = {"inbound": 0, "outbound": 0}
+
+REGISTRY.gauge("active_calls", lambda: len(sessions))
+REGISTRY.gauge("peak_active_calls", lambda: sessions.peak)
+REGISTRY.gauge("calls_admitted_total", lambda: sessions.admitted, kind="counter")
+REGISTRY.gauge("calls_rejected_total", lambda: sessions.rejected, kind="counter", label="reason")
+REGISTRY.gauge("event_loop_lag_seconds", lambda: sessions.loop_lag)
+REGISTRY.gauge(
+    "inbound_frames_total",
+    lambda: finished_frames["inbound"] + sum(call.timeline.frames_in for call in sessions),
+    kind="counter",
+)
+REGISTRY.gauge(
+    "outbound_frames_total",
+    lambda: finished_frames["outbound"] + sum(call.pacer.frames_sent for call in sessions),
+    kind="counter",
+)
+if tenants is not None:
+    REGISTRY.gauge("tenants_cached", lambda: tenants.stats()["cached"])
+    REGISTRY.gauge("tenant_cache_bytes", lambda: tenants.cached_bytes)
+    REGISTRY.gauge("tenant_cache_hits_total", lambda: tenants.hits, kind="counter")
+    REGISTRY.gauge("tenant_cache_misses_total", lambda: tenants.misses, kind="counter")
+    REGISTRY.gauge("tenant_cache_evictions_total", lambda: tenants.evictions, kind="counter")
+    REGISTRY.gauge("tenant_compile_errors_total", lambda: tenants.compile_errors, kind="counter")
+    REGISTRY.gauge("tenant_calls_unavailable_total", lambda: tenants.unavailable, kind="counter")
+
 
 def sts_connect():
     api_key = os.getenv("DEEPGRAM_API_KEY")
     if not api_key:
         raise Exception("DEEPGRAM_API_KEY not found")
 
-    sts_ws = websockets.connect(
-        "wss://agent.deepgram.com/v1/agent/converse", subprotocols=["token", api_key]
-    )
+    sts_ws = websockets.connect(DEEPGRAM_AGENT_URL, subprotocols=["token", api_key])
     return sts_ws 
 
 
-def load_config():
-    with open("config.json", "r") as f:
-        return json.load(f)
+async def open_agent():
+    """A Deepgram agent connection, pre-warmed from the pool when there is one."""
+    return await sts_pool.acquire() if sts_pool is not None else await sts_connect()
 
 
-async def handle_barge_in(decoded, twilio_ws, streamsid):
-    if decoded["type"] == "UserStartedSpeaking":
-        clear_message = {"event": "clear", "streamSid": streamsid}
-        await twilio_ws.send(json.dumps(clear_message))
+async def discard_agent(opening):
+    """Stop or close the agent connection `opening` for a call that ended before using it."""
+    if not opening.done():
+        opening.cancel()
+    elif not opening.cancelled() and opening.exception() is None:
+        await opening.result().close()
 
 
-def execute_function_call(func_name, arguments):
-    if func_name in FUNCTION_MAP:
-        result = FUNCTION_MAP[func_name](**arguments)
-        print(f"Function call result: {result}")
-        return result
-    else:
+async def handle_barge_in(decoded, pacer, received_at, timeline):
+    if decoded["type"] == "UserStartedSpeaking":
+        latency = await pacer.barge_in(received_at)
+        if latency is not None:
+            timeline.stage("barge_in_to_clear", latency, source="deepgram")
+    elif decoded["type"] == "AgentStartedSpeaking" or (
+        decoded["type"] == "ConversationText" and decoded.get("role") == "assistant"
+    ):
+        # A new agent turn; stop discarding audio from the interrupted one
+        pacer.start_turn()
+
+
+async def execute_function_call(func_name, arguments, session=None, hotel=None):
+    if func_name not in FUNCTION_MAP:
         result = {"error": f"Unknown function: {func_name}"}
-        print(result)
+        log.warning("Unknown function %s", func_name, extra=event("function_call"))
         return result
 
+    func = FUNCTION_MAP[func_name]
+    if func_name in SESSION_FUNCTIONS:
+        # Overrides any "session" the LLM put in the arguments
+        arguments = {**arguments, "session": session}
+    if func_name in HOTEL_FUNCTIONS:
+        # Likewise the call's property; None is the default hotel
+        arguments = {**arguments, "hotel": hotel}
+    started = time.monotonic()
+    try:
+        if inspect.iscoroutinefunction(func):
+            result = await func(**arguments)
+        else:
+            # Plain handlers may block (database, HTTP), so keep them off the event loop
+            result = await asyncio.get_running_loop().run_in_executor(
+                function_executor, functools.partial(func, **arguments)
+            )
+    finally:
+        REGISTRY.observe("function_call_seconds", time.monotonic() - started, function=func_name)
+
+    log.debug("Function call result %s", result, extra=event("function_result", function=func_name))
+    return result
+
 
 def create_function_call_response(func_id, func_name, result):
     return {
         "type": "FunctionCallResponse",
         "id": func_id,
         "name": func_name,
-        "content": json.dumps(result),
+        # Cached answers (hotel_info_index.InfoAnswer) carry their serialized form
+        "content": getattr(result, "content", None) or json.dumps(result),
+    }
+
+
+def settle_function_result(results, func_name, func_id, key, execution):
+    """Decide whether a finished execution may answer repeats of the same call."""
+    if execution.cancelled() or execution.exception() is not None:
+        results.discard(func_id, key, execution)
+    elif isinstance(execution.result(), dict) and "error" in execution.result():
+        # Only outcomes are replayed; a retry after an error (a conflicting
+        # change, a slow store) must reach the store again
+        results.discard(func_id, key, execution)
+    elif func_name in MUTATING_FUNCTIONS:
+        # Earlier lookups may describe the reservation as it was before this change
+        results.invalidate_arguments(keep=key)
+
+
+def function_timed_out(results, func_name, func_id, key, execution):
+    """The reply for a call whose handler is still running after its time limit."""
+    REGISTRY.inc("function_call_timeouts_total", function=func_name)
+    if func_name not in WRITING_FUNCTIONS:
+        # A lookup can simply run again on a repeat. A write keeps its entry until
+        # its thread finishes, so a repeat waits for it instead of writing twice
+        results.discard(func_id, key, execution)
+    return {
+        "error": "function_timeout",
+        "message": "I'm sorry, our system is taking longer than expected to respond. Please give me a moment and I'll try again, or I can arrange a callback from our guest services team.",
     }
 
 
-async def handle_function_call_request(decoded, sts_ws):
+async def run_function_call(function_call, sts_ws, session, results, hotel=None):
     try:
-        for function_call in decoded["functions"]:
-            func_name = function_call["name"]
-            func_id = function_call["id"]
-            arguments = json.loads(function_call["arguments"])
+        func_name = function_call["name"]
+        func_id = function_call["id"]
+        arguments = json.loads(function_call["arguments"])
 
-            print(f"Function call: {func_name} (ID: {func_id}), arguments: {arguments}")
+        log.info(
+            "Function call %s", func_name, extra=event("function_call", function_id=func_id, arguments=arguments)
+        )
 
-            result = execute_function_call(func_name, arguments)
+        # A re-sent id or an identical repeat shares the first execution, even mid-flight
+        key = normalize_arguments(func_name, arguments)
+        execution = results.get(func_id, key)
+        if execution is None:
+            execution = asyncio.ensure_future(execute_function_call(func_name, arguments, session, hotel))
+            results.put(func_id, key, execution)
+            execution.add_done_callback(
+                functools.partial(settle_function_result, results, func_name, func_id, key)
+            )
+        else:
+            REGISTRY.inc("function_calls_deduplicated_total", function=func_name)
+            log.info(
+                "Reusing the result of an identical earlier %s call",
+                func_name,
+                extra=event("function_call_deduplicated", function_id=func_id),
+            )
+
+        # Shielded so a hang-up or a timeout does not cancel an execution others share
+        try:
+            result = await asyncio.wait_for(
+                asyncio.shield(execution), FUNCTION_TIMEOUTS.get(func_name, FUNCTION_TIMEOUT_SECONDS)
+            )
+        except asyncio.TimeoutError:
+            result = function_timed_out(results, func_name, func_id, key, execution)
 
-            function_result = create_function_call_response(func_id, func_name, result)
-            await sts_ws.send(json.dumps(function_result))
-            print(f"Sent function result: {function_result}")
+        function_result = create_function_call_response(func_id, func_name, result)
+        await sts_ws.send(json.dumps(function_result))
+        log.debug("Sent function result %s", function_result, extra=event("function_result_sent"))
 
     except Exception as e:
-        print(f"Error calling function: {e}")
+        log.exception("Error calling function", extra=event("function_call_error"))
         error_result = create_function_call_response(
             func_id if "func_id" in locals() else "unknown",
             func_name if "func_name" in locals() else "unknown",
@@ -77,100 +287,322 @@ async def handle_function_call_request(decoded, sts_ws):
         await sts_ws.send(json.dumps(error_result))
 
 
-async def handle_text_message(decoded, twilio_ws, sts_ws, streamsid):
-    await handle_barge_in(decoded, twilio_ws, streamsid)
+async def handle_function_call_request(decoded, sts_ws, session, results, hotel=None):
+    # Independent calls in one request run concurrently; each replies as soon as it is done
+    await asyncio.gather(
+        *(
+            run_function_call(function_call, sts_ws, session, results, hotel)
+            for function_call in decoded["functions"]
+        )
+    )
+
+
+async def handle_text_message(decoded, sts_ws, received_at, call):
+    await handle_barge_in(decoded, call.pacer, received_at, call.timeline)
+
+    if decoded["type"] == "AgentAudioDone":
+        call.pacer.end_of_turn()
 
     if decoded["type"] == "FunctionCallRequest":
-        await handle_function_call_request(decoded, sts_ws)
+        call.timeline.mark("first_function_call")
+        # Run in the background so sts_receiver keeps forwarding agent audio meanwhile
+        hotel = call.tenant.hotel if call.tenant is not None else None
+        task = asyncio.ensure_future(
+            handle_function_call_request(decoded, sts_ws, call.guest, call.results, hotel)
+        )
+        function_tasks.add(task)
+        task.add_done_callback(function_tasks.discard)
 
 
-async def sts_sender(sts_ws, audio_queue):
-    print("sts_sender started")
+async def sts_sender(sts_ws, audio_queue, transcoder=None):
+    log.debug("sts_sender started")
     while True:
         chunk = await audio_queue.get()
+        REGISTRY.observe("audio_queue_depth", audio_queue.qsize(), COUNT_BUCKETS)
+        if transcoder is not None:
+            # Twilio's mulaw to the Settings audio.input format
+            chunk = transcoder.convert(chunk)
         await sts_ws.send(chunk)
 
 
-async def sts_receiver(sts_ws, twilio_ws, streamsid_queue):
-    print("sts_receiver started")
-    streamsid = await streamsid_queue.get()
+async def sts_receiver(sts_ws, call):
+    log.debug("sts_receiver started")
+    pacer = call.pacer
+    timeline = call.timeline
+    transcoder = call.outbound_transcoder
+    streamsid = await call.streamsid_queue.get()
+    pacer.bind(streamsid)
 
     async for message in sts_ws:
         if type(message) is str:
-            print(message)
+            received_at = time.monotonic()
             decoded = json.loads(message)
-            await handle_text_message(decoded, twilio_ws, sts_ws, streamsid)
+            if decoded.get("type") in ("Error", "Warning"):
+                log.warning("Deepgram %s", message, extra=event("deepgram_message"))
+            else:
+                level = logging.INFO if decoded.get("type") in NOTABLE_DEEPGRAM_MESSAGES else logging.DEBUG
+                log.log(level, "Deepgram %s", message, extra=event("deepgram_message"))
+            await handle_text_message(decoded, sts_ws, received_at, call)
             continue
 
-        raw_mulaw = message
+        if timeline.mark("first_agent_audio"):
+            timeline.stage("time_to_first_audio", timeline.events["first_agent_audio"])
 
-        media_message = {
-            "event": "media",
-            "streamSid": streamsid,
-            "media": {"payload": base64.b64encode(raw_mulaw).decode("ascii")},
-        }
+        if transcoder is not None:
+            # The Settings audio.output format to Twilio's mulaw
+            message = transcoder.convert(message)
+        # Raw mulaw; the pacer re-frames it and sends it to Twilio in real time
+        pacer.push(message)
+        REGISTRY.observe("outbound_buffer_frames", pacer.buffered(), COUNT_BUCKETS)
 
-        await twilio_ws.send(json.dumps(media_message))
 
+def start_stream(start, call):
+    call.timeline.mark("twilio_start")
+    call.stream_sid = start["streamSid"]
+    log.info("Stream started", extra=event("twilio_start", call_sid=start.get("callSid")))
+    call.streamsid_queue.put_nowait(call.stream_sid)
 
-async def twilio_receiver(twilio_ws, audio_queue, streamsid_queue):
+
+async def receive_start(twilio_ws, call):
+    """Read Twilio messages up to the start event; its `start` object, or None if the call ended first."""
+    async for message in twilio_ws:
+        try:
+            data = json.loads(message)
+            if data["event"] == "start":
+                start_stream(data["start"], call)
+                return data["start"]
+            if data["event"] == "stop":
+                return None
+        except (ValueError, KeyError):
+            return None
+    return None
+
+
+async def twilio_receiver(twilio_ws, call):
+    audio_queue = call.audio_queue
+    timeline = call.timeline
+    vad = call.vad
     BUFFER_SIZE = 20 * 160
     inbuffer = bytearray(b"")
 
     async for message in twilio_ws:
         try:
             data = json.loads(message)
-            event = data["event"]
-
-            if event == "start":
-                print("get our streamsid")
-                start = data["start"]
-                streamsid = start["streamSid"]
-                streamsid_queue.put_nowait(streamsid)
-            elif event == "connected":
+            event_type = data["event"]
+
+            if event_type == "start":
+                start_stream(data["start"], call)
+            elif event_type == "connected":
                 continue
-            elif event == "media":
+            elif event_type == "media":
                 media = data["media"]
                 chunk = base64.b64decode(media["payload"])
                 if media["track"] == "inbound":
+                    timeline.frames_in += 1
                     inbuffer.extend(chunk)
-            elif event == "stop":
+                    while len(inbuffer) >= BUFFER_SIZE:
+                        audio_queue.put_nowait(inbuffer[:BUFFER_SIZE])
+                        inbuffer = inbuffer[BUFFER_SIZE:]
+                    if vad is not None and vad.process(chunk):
+                        latency = await call.pacer.barge_in(time.monotonic(), source="local")
+                        if latency is not None:
+                            timeline.stage("barge_in_to_clear", latency, source="local")
+            elif event_type == "stop":
                 break
-
-            while len(inbuffer) >= BUFFER_SIZE:
-                chunk = inbuffer[:BUFFER_SIZE]
-                audio_queue.put_nowait(chunk)
-                inbuffer = inbuffer[BUFFER_SIZE:]
         except:
             break
 
 
+async def admit_call(connection, request):
+    """process_request hook: turn calls away with a 503 before the handshake when there is no room."""
+    reason = sessions.admission()
+    if reason is None:
+        return None
+    log.info("Call rejected: %s", reason, extra=event("call_rejected", reason=reason, sessions=len(sessions)))
+    response = connection.respond(HTTPStatus.SERVICE_UNAVAILABLE, "At capacity, try again later\n")
+    response.headers["Retry-After"] = "1"
+    return response
+
+
 async def twilio_handler(twilio_ws):
-    audio_queue = asyncio.Queue()
-    streamsid_queue = asyncio.Queue()
-
-    async with sts_connect() as sts_ws:
-        config_message = load_config()
-        await sts_ws.send(json.dumps(config_message))
-
-        await asyncio.wait(
-            [
-                asyncio.ensure_future(sts_sender(sts_ws, audio_queue)),
-                asyncio.ensure_future(sts_receiver(sts_ws, twilio_ws, streamsid_queue)),
-                asyncio.ensure_future(
-                    twilio_receiver(twilio_ws, audio_queue, streamsid_queue)
-                ),
-            ]
-        )
+    if not sessions.has_room():
+        log.info("Call rejected: %s", MAX_CALLS_REACHED, extra=event("call_rejected", reason=MAX_CALLS_REACHED))
+        # 1013: try again later
+        await twilio_ws.close(1013)
+        return
+
+    # 8 kHz mulaw is one byte per sample
+    pacer = OutboundPacer(
+        twilio_ws.send,
+        frame_size=8 * OUTBOUND_FRAME_MS,
+        frame_duration=OUTBOUND_FRAME_MS / 1000,
+        jitter_depth=JITTER_BUFFER_FRAMES,
+        confirm_timeout=LOCAL_VAD_CONFIRM_MS / 1000,
+    )
+    call = CallSession(
+        # Inherited by the call's tasks, so their log records carry its IDs
+        start_call(),
+        CallTimeline(),
+        BoundedAudioQueue(AUDIO_QUEUE_MAXSIZE, AUDIO_QUEUE_OVERFLOW),
+        pacer,
+        EnergyVAD(LOCAL_VAD_THRESHOLD_DB) if LOCAL_VAD else None,
+        GuestSession(),
+        FunctionResultCache(FUNCTION_RESULT_TTL_SECONDS, FUNCTION_RESULT_CACHE_SIZE),
+    )
+    sessions.add(call)
+    if worker is not None:
+        worker.call_started()
+    timeline = call.timeline
+    audio_queue = call.audio_queue
+
+    opening = None
+    recorder = None
+    try:
+        if tenants is not None:
+            # The tenant is named in the start event, so the Settings wait for
+            # it; the Deepgram handshake does not have to
+            opening = asyncio.ensure_future(open_agent())
+            start = await receive_start(twilio_ws, call)
+            if start is None:
+                return
+            try:
+                call.tenant = await tenants.resolve(start)
+            except TenantUnavailable as e:
+                # Never another hotel's prompt and data; Twilio moves on to the TwiML after <Connect>
+                log.warning(
+                    "Call rejected: tenant %s has no valid configuration",
+                    e,
+                    extra=event("call_rejected", reason="tenant_unavailable", tenant=str(e)),
+                )
+                await twilio_ws.close(1011)
+                return
+
+        # Held for the whole call, so a config reload mid-call does not affect it
+        settings = call.tenant.settings if call.tenant is not None else settings_cache.get()
+        call.inbound_transcoder = make_transcoder(TELEPHONY_FORMAT, settings.input_format)
+        call.outbound_transcoder = make_transcoder(settings.output_format, TELEPHONY_FORMAT)
+
+        sts_ws = await (opening if opening is not None else open_agent())
+        opening = None
+
+        async with sts_ws:
+            if RECORD_SESSIONS_DIR:
+                recorder = SessionRecorder.for_call(RECORD_SESSIONS_DIR, call.call_id, settings.config["audio"])
+                sts_ws = RecordingConnection(sts_ws, recorder)
+            await sts_ws.send(settings.payload, text=True)
+
+            call.tasks = (
+                asyncio.ensure_future(sts_sender(sts_ws, audio_queue, call.inbound_transcoder)),
+                asyncio.ensure_future(sts_receiver(sts_ws, call)),
+                asyncio.ensure_future(pacer.run()),
+                asyncio.ensure_future(twilio_receiver(twilio_ws, call)),
+            )
+            # The call is over as soon as either side hangs up; the sender and
+            # pacer loops never finish on their own
+            await asyncio.wait(call.tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in call.tasks:
+                task.cancel()
+
+            await twilio_ws.close()
+    finally:
+        if opening is not None:
+            await discard_agent(opening)
+        if recorder is not None:
+            recorder.close()
+        sessions.remove(call)
+        if worker is not None:
+            worker.call_finished()
+        timeline.frames_out = pacer.frames_sent
+        finished_frames["inbound"] += timeline.frames_in
+        finished_frames["outbound"] += timeline.frames_out
+        REGISTRY.inc("audio_frames_dropped_total", audio_queue.dropped)
+        REGISTRY.inc("outbound_underruns_total", pacer.underruns)
+
+    log.info(
+        "Call finished",
+        extra=event(
+            "call_finished",
+            timeline=timeline.finish(),
+            audio_queue=audio_queue.stats(),
+            outbound_audio=pacer.stats(),
+            tenant=call.tenant.tenant_id if call.tenant is not None else None,
+            guest_session=call.guest.stats(),
+            function_results=call.results.stats(),
+            local_vad=call.vad.stats() if call.vad is not None else None,
+            inbound_transcoder=call.inbound_transcoder.stats() if call.inbound_transcoder is not None else None,
+            outbound_transcoder=call.outbound_transcoder.stats() if call.outbound_transcoder is not None else None,
+        ),
+    )
+
+
+async def main(worker_context=None):
+    """
+    Run the server until the process is stopped.
+
+    Args:
+        worker_context: WorkerContext when running as one of several worker
+            processes, which then share the port and drain when asked to stop
+    """
+    global sts_pool, worker
 
-        await twilio_ws.close()
+    worker = worker_context
+    log_handler = configure_logging(LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES)
+    REGISTRY.gauge("log_records_dropped_total", lambda: log_handler.dropped, kind="counter")
 
+    if STS_POOL_SIZE > 0:
+        sts_pool = StsPool(
+            sts_connect,
+            size=STS_POOL_SIZE,
+            refill_rate=STS_POOL_REFILL_RATE,
+            idle_expiry=STS_POOL_IDLE_EXPIRY,
+        )
+        sts_pool.start()
+
+    background_tasks.add(asyncio.ensure_future(settings_cache.watch()))
+    if tenants is not None:
+        background_tasks.add(asyncio.ensure_future(tenants.watch()))
+
+    # Seed the store and load the inventory before serving, not inside the first call
+    await asyncio.get_running_loop().run_in_executor(None, open_default_hotel)
+
+    metrics_port = METRICS_PORT
+    if worker is not None:
+        # Other workers change reservations too
+        DEFAULT_HOTEL.inventory.share(DEFAULT_HOTEL.store)
+        if tenants is not None:
+            tenants.share()
+        # The supervisor serves METRICS_PORT
+        metrics_port = METRICS_PORT + 1 + worker.index if METRICS_PORT > 0 else 0
+
+    if metrics_port > 0:
+        await start_metrics_server(METRICS_HOST, metrics_port)
+        if sts_pool is not None:
+            REGISTRY.gauge("sts_pool_idle", lambda: sts_pool.stats()["idle"])
+
+    background_tasks.add(asyncio.ensure_future(sessions.monitor_loop_lag()))
+    server = await websockets.serve(
+        twilio_handler,
+        SERVER_HOST,
+        SERVER_PORT,
+        process_request=admit_call,
+        reuse_port=worker is not None,
+    )
+    if worker is None:
+        log.info("Started server on %s:%s", SERVER_HOST, SERVER_PORT)
+        await asyncio.Future()
+    else:
+        log.info("Worker %d started server on %s:%s", worker.index, SERVER_HOST, SERVER_PORT)
+        await worker.serve_until_stopped(server, sessions)
 
-async def main():
-    await websockets.serve(twilio_handler, "localhost", 5000)
-    print("Started server.")
-    await asyncio.Future()
+
+def run_worker(worker_context) -> None:
+    """Entry point of each worker process in worker mode."""
+    asyncio.run(main(worker_context))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if WORKERS > 1:
+        configure_logging(LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES)
+        Supervisor(run_worker, WORKERS, WORKER_DRAIN_SECONDS, METRICS_HOST, METRICS_PORT).run()
+    else:
+        asyncio.run(main())
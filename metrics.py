@@ -0,0 +1,241 @@
+"""
+Metrics
+Per-call latency timelines, low-overhead histograms and a Prometheus-style
+text endpoint.
+
+Histograms use fixed, log-spaced buckets so recording a sample is one bisect
+and two additions on the event loop. Percentiles (p50/p95/p99) are estimated
+by interpolating inside the bucket that holds the requested rank.
+"""
+
+import asyncio
+import logging
+import os
+import resource
+import time
+from bisect import bisect_left
+from itertools import groupby
+
+log = logging.getLogger(__name__)
+
+# 100 us .. ~100 s, each bucket 25% wider than the previous one
+DEFAULT_BUCKETS = tuple(0.0001 * 1.25**i for i in range(63))
+# Queue depths and other small counts
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 30, 50, 75, 100, 150, 250, 500, 1000)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds=DEFAULT_BUCKETS):
+        self.bounds = bounds
+        # One extra slot for values above the last bound (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else lower
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.bounds[-1]
+
+
+class MetricsRegistry:
+    """Named counters, gauges and histograms, each optionally labelled."""
+
+    def __init__(self, prefix: str = "voice_agent"):
+        self.prefix = prefix
+        self.counters = {}
+        self.histograms = {}
+        self.gauges = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets)
+        histogram.observe(value)
+
+    def gauge(self, name: str, callback, kind: str = "gauge", label: str = None) -> None:
+        """
+        Register a metric whose value is read from `callback()` at scrape time.
+
+        Use kind='counter' for monotonically increasing totals that are cheaper
+        to sum on demand than to increment on a hot path. With `label`,
+        `callback()` returns {label value: value}, one series per entry.
+        """
+        self.gauges[name] = (callback, kind, label)
+
+    def summary(self) -> dict:
+        """p50/p95/p99 per histogram, in milliseconds, for logs and debugging."""
+        return {
+            _series(name, labels): {
+                f"p{int(q * 100)}_ms": round(histogram.quantile(q) * 1000, 3) for q in QUANTILES
+            }
+            for (name, labels), histogram in self.histograms.items()
+        }
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        prefix = self.prefix
+        typed = set()
+
+        def declare(metric, kind):
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} {kind}")
+
+        for (name, labels), value in sorted(self.counters.items()):
+            declare(f"{prefix}_{name}", "counter")
+            lines.append(f"{prefix}_{_series(name, labels)} {value}")
+
+        for name, (callback, kind, label) in sorted(self.gauges.items()):
+            declare(f"{prefix}_{name}", kind)
+            if label is None:
+                lines.append(f"{prefix}_{name} {callback()}")
+            else:
+                for label_value, value in callback().items():
+                    lines.append(f"{prefix}_{_series(name, ((label, label_value),))} {value}")
+
+        # Each family contiguous: all of a histogram's series, then its quantile gauges
+        for name, series in groupby(sorted(self.histograms.items()), key=lambda item: item[0][0]):
+            metric = f"{prefix}_{name}"
+            series = [(labels, histogram) for (_, labels), histogram in series]
+            declare(metric, "histogram")
+            for labels, histogram in series:
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.bounds, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f"{_series(metric + '_bucket', labels + (('le', f'{bound:.6g}'),))} {cumulative}")
+                lines.append(f"{_series(metric + '_bucket', labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{_series(metric + '_sum', labels)} {histogram.sum}")
+                lines.append(f"{_series(metric + '_count', labels)} {histogram.count}")
+            declare(metric + "_quantile", "gauge")
+            for labels, histogram in series:
+                for q in QUANTILES:
+                    lines.append(
+                        f"{_series(metric + '_quantile', labels + (('quantile', str(q)),))} {histogram.quantile(q)}"
+                    )
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value) -> str:
+    """A label value as the exposition format quotes it."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _series(name: str, labels: tuple) -> str:
+    if not labels:
+        return name
+    return name + "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def resident_memory_bytes() -> int:
+    """Current resident set size, or the peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+# Process-wide registry shared by every call
+REGISTRY = MetricsRegistry()
+REGISTRY.gauge("process_cpu_seconds_total", time.process_time, kind="counter")
+REGISTRY.gauge("process_resident_memory_bytes", resident_memory_bytes)
+
+
+class CallTimeline:
+    """
+    Monotonic timestamps of the milestones of one call.
+
+    `mark()` keeps only the first occurrence of each event, so it can be called
+    from hot paths; `stage()` records a duration into the shared histograms.
+    """
+
+    __slots__ = ("started", "events", "frames_in", "frames_out", "registry")
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY):
+        self.started = time.monotonic()
+        self.events = {}
+        self.frames_in = 0
+        self.frames_out = 0
+        self.registry = registry
+
+    def mark(self, event: str) -> bool:
+        """Record the first time `event` happens. Returns True if this was the first time."""
+        if event in self.events:
+            return False
+        self.events[event] = time.monotonic() - self.started
+        return True
+
+    def stage(self, name: str, seconds: float, **labels) -> None:
+        self.registry.observe(f"{name}_seconds", seconds, **labels)
+
+    def finish(self) -> dict:
+        duration = time.monotonic() - self.started
+        self.registry.observe("call_duration_seconds", duration)
+        return {
+            "duration_s": round(duration, 3),
+            "events_ms": {event: round(offset * 1000, 1) for event, offset in self.events.items()},
+            "inbound_fps": round(self.frames_in / duration, 2) if duration else 0.0,
+            "outbound_fps": round(self.frames_out / duration, 2) if duration else 0.0,
+        }
+
+
+# =============================================================================
+# HTTP ENDPOINT
+# =============================================================================
+
+
+async def _handle_scrape(reader, writer, registry: MetricsRegistry) -> None:
+    try:
+        request_line = await reader.readline()
+        # Drain the request headers
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        parts = request_line.split()
+        if len(parts) >= 2 and parts[1] in (b"/metrics", b"/"):
+            status, body = "200 OK", registry.render().encode("utf-8")
+        else:
+            status, body = "404 Not Found", b"not found\n"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii") + body
+        )
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_metrics_server(host: str, port: int, registry: MetricsRegistry = REGISTRY):
+    server = await asyncio.start_server(
+        lambda reader, writer: _handle_scrape(reader, writer, registry), host, port
+    )
+    log.info("Metrics available at http://%s:%s/metrics", host, port)
+    return server
@@ -0,0 +1,189 @@
+"""
+Reservation Record
+Compact, typed in-memory form of one reservation.
+
+A reservation read as a plain dict costs a hash table of ~23 keys plus a
+string per date. ReservationRecord keeps the same fields in __slots__, stores
+check-in and check-out as date ordinals (days since 0001-01-01), and interns
+the few strings that repeat across reservations (room type, status, ...).
+Date arithmetic is integer subtraction instead of parsing strings.
+
+check_in / check_out still read and write as YYYY-MM-DD strings, and
+record["field"], record.get() and dict(record) work as they did on the dict,
+so function outputs are unchanged.
+"""
+
+import sys
+from datetime import date
+
+# Public field names, in the column order of the reservations table
+FIELDS = (
+    "confirmation_number",
+    "guest_name",
+    "last_name",
+    "phone",
+    "email",
+    "check_in",
+    "check_out",
+    "room_type",
+    "room_number",
+    "guests",
+    "nights",
+    "rate_per_night",
+    "total_cost",
+    "status",
+    "special_requests",
+    "created_at",
+    "payment_status",
+    "cancelled_on",
+    "cancellation_reason",
+    "cancellation_ref",
+    "cancellation_fee",
+    "refund_type",
+    "version",
+)
+_FIELD_SET = frozenset(FIELDS)
+
+# Low-cardinality strings shared between records instead of copied per record
+INTERNED_FIELDS = frozenset(("last_name", "room_type", "status", "created_at", "payment_status", "refund_type"))
+
+
+class ReservationRecord:
+    """One reservation. Build it with keyword fields, or from_row() for a store row."""
+
+    __slots__ = (
+        "confirmation_number",
+        "guest_name",
+        "last_name",
+        "phone",
+        "email",
+        "check_in_ordinal",
+        "check_out_ordinal",
+        "room_type",
+        "room_number",
+        "guests",
+        "nights",
+        "rate_per_night",
+        "total_cost",
+        "status",
+        "_special_requests",
+        "created_at",
+        "payment_status",
+        "cancelled_on",
+        "cancellation_reason",
+        "cancellation_ref",
+        "cancellation_fee",
+        "refund_type",
+        "version",
+    )
+
+    def __init__(self, **fields):
+        unknown = fields.keys() - _FIELD_SET
+        if unknown:
+            raise KeyError(f"Unknown reservation fields: {sorted(unknown)}")
+        for field in FIELDS:
+            self._set(field, fields.get(field))
+        if self.version is None:
+            self.version = 0
+
+    @classmethod
+    def from_row(cls, row, special_requests: list) -> "ReservationRecord":
+        """
+        A record from a reservations table row (columns in FIELDS order).
+
+        Args:
+            row: The row, e.g. a sqlite3.Row
+            special_requests: The row's special requests, already decoded
+        """
+        record = cls.__new__(cls)
+        for field, value in zip(FIELDS, row):
+            if field == "special_requests":
+                value = special_requests
+            record._set(field, value)
+        return record
+
+    def _set(self, field: str, value) -> None:
+        if field in INTERNED_FIELDS and isinstance(value, str):
+            value = sys.intern(value)
+        setattr(self, field, value)
+
+    # -------------------------------------------------------------------------
+    # Fields stored in another form
+    # -------------------------------------------------------------------------
+
+    @property
+    def check_in(self) -> str:
+        return _isoformat(self.check_in_ordinal)
+
+    @check_in.setter
+    def check_in(self, value: str) -> None:
+        self.check_in_ordinal = _ordinal(value)
+
+    @property
+    def check_out(self) -> str:
+        return _isoformat(self.check_out_ordinal)
+
+    @check_out.setter
+    def check_out(self, value: str) -> None:
+        self.check_out_ordinal = _ordinal(value)
+
+    @property
+    def special_requests(self) -> list:
+        """A new list each time; assign to change it."""
+        return list(self._special_requests)
+
+    @special_requests.setter
+    def special_requests(self, value) -> None:
+        self._special_requests = tuple(value or ())
+
+    # -------------------------------------------------------------------------
+    # Dict compatibility
+    # -------------------------------------------------------------------------
+
+    def __getitem__(self, field: str):
+        if field not in _FIELD_SET:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def get(self, field: str, default=None):
+        return getattr(self, field) if field in _FIELD_SET else default
+
+    def keys(self) -> tuple:
+        return FIELDS
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in FIELDS}
+
+    def update(self, changes: dict) -> None:
+        """Apply field name -> new value changes, as dict.update would."""
+        for field, value in changes.items():
+            if field not in _FIELD_SET:
+                raise KeyError(field)
+            self._set(field, value)
+
+    def copy(self) -> "ReservationRecord":
+        record = ReservationRecord.__new__(ReservationRecord)
+        for slot in self.__slots__:
+            setattr(record, slot, getattr(self, slot))
+        return record
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ReservationRecord):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"ReservationRecord({self.confirmation_number!r}, {self.check_in} to {self.check_out}, {self.status})"
+
+
+def _isoformat(ordinal):
+    return date.fromordinal(ordinal).isoformat() if ordinal is not None else None
+
+
+def _ordinal(value) -> int:
+    """Date ordinal of a YYYY-MM-DD string; ordinals pass through."""
+    if isinstance(value, int) or value is None:
+        return value
+    return date.fromisoformat(value).toordinal()
@@ -0,0 +1,583 @@
+"""
+Reservation Store
+Embedded SQLite storage for reservations and callback requests.
+
+The database runs in WAL mode so lookups never wait for a writer and several
+server processes can share one file. Function calls run on a thread pool, so
+each thread gets its own connection.
+
+Every reservation row carries a version number that each write increments.
+Writers read a reservation, compute their change, and commit it only if the
+version is still the one they read (optimistic concurrency), so concurrent
+calls never overwrite each other's changes.
+"""
+
+import json
+import sqlite3
+import threading
+
+from reservation_record import ReservationRecord
+
+RESERVATION_FIELDS = (
+    "guest_name",
+    "last_name",
+    "phone",
+    "email",
+    "check_in",
+    "check_out",
+    "room_type",
+    "room_number",
+    "guests",
+    "nights",
+    "rate_per_night",
+    "total_cost",
+    "status",
+    "special_requests",
+    "created_at",
+    "payment_status",
+)
+CANCELLATION_FIELDS = (
+    "cancelled_on",
+    "cancellation_reason",
+    "cancellation_ref",
+    "cancellation_fee",
+    "refund_type",
+)
+CALLBACK_FIELDS = ("guest_name", "phone_number", "issue_description", "requested_at", "status", "priority", "queued_at")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reservations (
+    confirmation_number TEXT PRIMARY KEY,
+    guest_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    phone TEXT,
+    email TEXT,
+    check_in TEXT NOT NULL,
+    check_out TEXT NOT NULL,
+    room_type TEXT NOT NULL,
+    room_number TEXT,
+    guests INTEGER NOT NULL,
+    nights INTEGER NOT NULL,
+    rate_per_night REAL NOT NULL,
+    total_cost REAL NOT NULL,
+    status TEXT NOT NULL,
+    special_requests TEXT NOT NULL DEFAULT '[]',
+    created_at TEXT,
+    payment_status TEXT,
+    cancelled_on TEXT,
+    cancellation_reason TEXT,
+    cancellation_ref TEXT,
+    cancellation_fee,
+    refund_type TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_reservations_last_name ON reservations (last_name);
+CREATE INDEX IF NOT EXISTS idx_reservations_check_in ON reservations (check_in);
+-- Leads with status so "confirmed in this date range" scans only the range
+CREATE INDEX IF NOT EXISTS idx_reservations_status_check_in ON reservations (status, check_in);
+
+CREATE TABLE IF NOT EXISTS callback_requests (
+    callback_id TEXT PRIMARY KEY,
+    guest_name TEXT NOT NULL,
+    phone_number TEXT NOT NULL,
+    issue_description TEXT,
+    requested_at TEXT NOT NULL,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 2,
+    queued_at REAL,
+    claimed_at REAL,
+    completed_at REAL
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+-- Occupancy changes (rooms taken per night, as date ordinals) logged by
+-- RoomInventory.share so other processes can apply them instead of reloading
+CREATE TABLE IF NOT EXISTS inventory_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    room_type TEXT NOT NULL,
+    check_in INTEGER NOT NULL,
+    check_out INTEGER NOT NULL,
+    rooms INTEGER NOT NULL
+);
+"""
+
+# Most recent inventory changes kept; a process further behind reloads
+INVENTORY_LOG_ROWS = 10_000
+
+# Created after the migration in ReservationStore.__init__, which adds their columns to older stores
+CALLBACK_INDEXES = """
+-- The queue: pending callbacks by priority, then arrival (rowid)
+CREATE INDEX IF NOT EXISTS idx_callback_requests_queue ON callback_requests (status, priority);
+CREATE INDEX IF NOT EXISTS idx_callback_requests_queued_at ON callback_requests (queued_at);
+CREATE INDEX IF NOT EXISTS idx_callback_requests_completed_at ON callback_requests (completed_at);
+"""
+
+# Open callbacks per status and priority, changed by the same transactions as
+# callback_requests, so ETAs cost the same however long the queue is
+CALLBACK_COUNTS = """
+CREATE TABLE callback_counts (
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (status, priority)
+)
+"""
+
+
+class ReservationStore:
+    """
+    Reservations and callback requests in a SQLite database file.
+
+    A cancelled reservation keeps its row with status 'cancelled' and the
+    cancellation details filled in.
+
+    Args:
+        path: Database file, created on first use
+        timeout: Seconds a writer waits for another writer's lock
+    """
+
+    def __init__(self, path: str = "reservations.db", timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        # Every thread's connection, so close() can reach them all
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        conn = self._connection()
+        conn.executescript(SCHEMA)
+        # Stores created before rows were versioned
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(reservations)")}
+        if "version" not in columns:
+            conn.execute("ALTER TABLE reservations ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        # Stores created before callbacks were queued in the database; their
+        # pending callbacks join the queue at normal priority
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(callback_requests)")}
+        for column, declaration in (
+            ("priority", "INTEGER NOT NULL DEFAULT 2"),
+            ("queued_at", "REAL"),
+            ("claimed_at", "REAL"),
+            ("completed_at", "REAL"),
+        ):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE callback_requests ADD COLUMN {column} {declaration}")
+        conn.executescript(CALLBACK_INDEXES)
+        with self._transaction() as conn:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'callback_counts'").fetchone():
+                conn.execute(CALLBACK_COUNTS)
+                conn.execute(
+                    "INSERT INTO callback_counts (status, priority, count) SELECT status, priority, COUNT(*) "
+                    "FROM callback_requests WHERE status IN ('pending', 'in_progress') GROUP BY status, priority"
+                )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; writes are grouped with explicit BEGIN IMMEDIATE. Only
+            # its own thread uses a connection, but close() may run on another
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def transaction(self):
+        """
+        BEGIN IMMEDIATE ... COMMIT on the calling thread's connection.
+
+        Writes made in the block, including through the methods below, commit
+        together. Holds the database's write lock, which every process using
+        the same file shares.
+        """
+        return self._transaction()
+
+    def close(self) -> None:
+        """
+        Close every thread's connection.
+
+        Call it once no thread is using the store; using it afterwards opens
+        new connections.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+    # -------------------------------------------------------------------------
+    # Seeding
+    # -------------------------------------------------------------------------
+
+    def seed(self, data: dict) -> bool:
+        """
+        Load demo data shaped like hotel_functions.RESERVATIONS_DB into an empty store.
+
+        Returns:
+            bool: True if the data was loaded, False if the store already had reservations
+        """
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM reservations LIMIT 1").fetchone():
+                return False
+            self._insert(conn, data.get("reservations", {}).items())
+            for conf_num, reservation in data.get("cancelled_reservations", {}).items():
+                self._insert(conn, [(conf_num, {**reservation, "status": "cancelled"})])
+            conn.execute(
+                "INSERT OR REPLACE INTO counters (name, value) VALUES ('next_callback_id', ?)",
+                (data.get("next_callback_id", 1),),
+            )
+        return True
+
+    def insert_many(self, reservations) -> None:
+        """Insert (confirmation_number, reservation) pairs in one transaction."""
+        with self._transaction() as conn:
+            self._insert(conn, reservations)
+
+    def _insert(self, conn, reservations) -> None:
+        columns = ("confirmation_number",) + RESERVATION_FIELDS + CANCELLATION_FIELDS
+        conn.executemany(
+            f"INSERT INTO reservations ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            (
+                (conf_num,)
+                + tuple(_encode(field, reservation.get(field)) for field in RESERVATION_FIELDS)
+                + tuple(_encode(field, reservation.get(field)) for field in CANCELLATION_FIELDS)
+                for conf_num, reservation in reservations
+            ),
+        )
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+
+    def get(self, confirmation_number: str):
+        """The reservation as a ReservationRecord, or None if there is no such confirmation number."""
+        row = self._connection().execute(
+            "SELECT * FROM reservations WHERE confirmation_number = ?", (confirmation_number,)
+        ).fetchone()
+        return _decode(row) if row is not None else None
+
+    def find_by_last_name(self, last_name: str) -> list:
+        rows = self._connection().execute(
+            "SELECT * FROM reservations WHERE last_name = ?", (last_name.lower().strip(),)
+        )
+        return [_decode(row) for row in rows]
+
+    def find_by_check_in(self, start: str, end: str, status: str = "confirmed") -> list:
+        """Reservations with `start <= check_in < end` (YYYY-MM-DD) in the given status."""
+        rows = self._connection().execute(
+            "SELECT * FROM reservations WHERE check_in >= ? AND check_in < ? AND status = ?",
+            (start, end, status),
+        )
+        return [_decode(row) for row in rows]
+
+    def find_overlapping(self, start: str, end: str, room_type: str = None, status: str = "confirmed") -> list:
+        """Reservations staying at least one night from `start` up to `end` (YYYY-MM-DD), optionally of one room type."""
+        sql = "SELECT * FROM reservations WHERE status = ? AND check_in < ? AND check_out > ?"
+        params = (status, end, start)
+        if room_type is not None:
+            sql += " AND room_type = ?"
+            params += (room_type,)
+        return [_decode(row) for row in self._connection().execute(sql, params)]
+
+    def iter_stays(self):
+        """(room_type, check_in, check_out) of every reservation that is not cancelled."""
+        return self._connection().execute(
+            "SELECT room_type, check_in, check_out FROM reservations WHERE status != 'cancelled'"
+        )
+
+    def inventory_snapshot(self) -> tuple:
+        """
+        The stays an inventory is built from and the inventory log position they include.
+
+        Returns:
+            tuple: (last logged change, list of (room_type, check_in, check_out))
+        """
+        conn = self._connection()
+        # One read transaction, so the stays are exactly those as of that change
+        with _Transaction(conn, "BEGIN") as conn:
+            (seq,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM inventory_changes").fetchone()
+            return seq, self.iter_stays().fetchall()
+
+    def inventory_changes(self, after: int):
+        """
+        Inventory changes logged after the change numbered `after`, oldest first.
+
+        Returns:
+            list: (seq, room_type, check_in, check_out, rooms) tuples, or None if
+                changes after `after` were already pruned from the log
+        """
+        conn = self._connection()
+        rows = conn.execute(
+            "SELECT seq, room_type, check_in, check_out, rooms FROM inventory_changes WHERE seq > ? ORDER BY seq",
+            (after,),
+        ).fetchall()
+        # Committed changes are numbered consecutively, so a gap means pruned rows
+        if rows and rows[0][0] != after + 1:
+            return None
+        return rows
+
+    def log_inventory_changes(self, changes) -> int:
+        """
+        Append (room_type, check_in, check_out, rooms) changes to the inventory log.
+
+        Call inside transaction(), with the writes the changes reflect.
+
+        Returns:
+            int: The number of the last change logged
+        """
+        conn = self._connection()
+        conn.executemany(
+            "INSERT INTO inventory_changes (room_type, check_in, check_out, rooms) VALUES (?, ?, ?, ?)", changes
+        )
+        (seq,) = conn.execute("SELECT MAX(seq) FROM inventory_changes").fetchone()
+        conn.execute("DELETE FROM inventory_changes WHERE seq <= ?", (seq - INVENTORY_LOG_ROWS,))
+        return seq
+
+    def count_by_status(self) -> dict:
+        rows = self._connection().execute(
+            "SELECT status, COUNT(*) FROM reservations GROUP BY status"
+        )
+        return dict(rows.fetchall())
+
+    # -------------------------------------------------------------------------
+    # Mutations
+    # -------------------------------------------------------------------------
+
+    def update(self, confirmation_number: str, changes: dict, expected_version=None) -> bool:
+        """
+        Set several fields of a reservation atomically and bump its version.
+
+        Args:
+            confirmation_number: Reservation to change
+            changes: Field name -> new value
+            expected_version: Only apply the change if the row is still at this version
+
+        Returns:
+            bool: False if the reservation does not exist or its version moved on
+        """
+        columns = [field for field in changes if field in RESERVATION_FIELDS + CANCELLATION_FIELDS]
+        if len(columns) != len(changes):
+            raise ValueError(f"Unknown reservation fields: {sorted(set(changes) - set(columns))}")
+        return self._write(confirmation_number, changes, expected_version)
+
+    def cancel(self, confirmation_number: str, cancellation: dict, expected_version=None) -> bool:
+        """Mark a reservation cancelled. Returns False if it was already cancelled or has changed."""
+        return self._write(
+            confirmation_number,
+            {"status": "cancelled", **cancellation},
+            expected_version,
+            "AND status != 'cancelled'",
+        )
+
+    def update_many(self, updates) -> list:
+        """
+        Apply several update() calls in one transaction.
+
+        Args:
+            updates: (confirmation_number, changes, expected_version) tuples
+
+        Returns:
+            list: Per update, whether it was applied
+        """
+        with self._transaction():
+            return [self.update(*update) for update in updates]
+
+    def cancel_many(self, cancellations) -> list:
+        """
+        Apply several cancel() calls in one transaction.
+
+        Args:
+            cancellations: (confirmation_number, cancellation, expected_version) tuples
+
+        Returns:
+            list: Per cancellation, whether it was applied
+        """
+        with self._transaction():
+            return [self.cancel(*cancellation) for cancellation in cancellations]
+
+    def _write(self, confirmation_number: str, changes: dict, expected_version, condition: str = "") -> bool:
+        sql = (
+            f"UPDATE reservations SET {''.join(f'{c} = ?, ' for c in changes)}version = version + 1 "
+            f"WHERE confirmation_number = ? {condition}"
+        )
+        params = tuple(_encode(c, v) for c, v in changes.items()) + (confirmation_number,)
+        if expected_version is not None:
+            sql += " AND version = ?"
+            params += (expected_version,)
+
+        # A single UPDATE is atomic on its own; no explicit transaction needed
+        return self._connection().execute(sql, params).rowcount == 1
+
+    def add_callback(self, callback: dict) -> str:
+        """Store a callback request under the next CB- reference and return the reference."""
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO counters (name, value) VALUES ('next_callback_id', 1)"
+            )
+            # BEGIN IMMEDIATE holds the write lock from here to COMMIT, so no
+            # other connection or process can read the same number
+            (number,) = conn.execute(
+                "SELECT value FROM counters WHERE name = 'next_callback_id'"
+            ).fetchone()
+            conn.execute("UPDATE counters SET value = value + 1 WHERE name = 'next_callback_id'")
+            callback_id = f"CB-{number}"
+            # Fields left out take their column defaults (priority: normal)
+            fields = [field for field in CALLBACK_FIELDS if field in callback]
+            conn.execute(
+                f"INSERT INTO callback_requests (callback_id, {', '.join(fields)}) "
+                f"VALUES (?{', ?' * len(fields)})",
+                (callback_id,) + tuple(callback[field] for field in fields),
+            )
+            row = conn.execute(
+                "SELECT status, priority FROM callback_requests WHERE callback_id = ?", (callback_id,)
+            ).fetchone()
+            _count_callback(conn, row["status"], row["priority"], 1)
+        return callback_id
+
+    def get_callback(self, callback_id: str):
+        row = self._connection().execute(
+            "SELECT * FROM callback_requests WHERE callback_id = ?", (callback_id,)
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def iter_callbacks(self, status: str = "pending"):
+        """Callback requests with `status`, oldest first."""
+        rows = self._connection().execute(
+            "SELECT * FROM callback_requests WHERE status = ? ORDER BY rowid", (status,)
+        )
+        for row in rows:
+            yield dict(row)
+
+    def claim_callback(self, now: float):
+        """
+        Hand the most urgent, longest-waiting pending callback to an agent.
+
+        The conditional UPDATE inside BEGIN IMMEDIATE means two agents, even in
+        different processes, never claim the same callback.
+
+        Args:
+            now: Time the agent took it, in seconds
+
+        Returns:
+            dict: The callback request, now 'in_progress', or None if none are waiting
+        """
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT callback_id, priority FROM callback_requests WHERE status = 'pending' "
+                "ORDER BY priority, rowid LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            claimed = conn.execute(
+                "UPDATE callback_requests SET status = 'in_progress', claimed_at = ? "
+                "WHERE callback_id = ? AND status = 'pending'",
+                (now, row["callback_id"]),
+            ).rowcount
+            if not claimed:
+                return None
+            _count_callback(conn, "pending", row["priority"], -1)
+            _count_callback(conn, "in_progress", row["priority"], 1)
+        return self.get_callback(row["callback_id"])
+
+    def complete_callback(self, callback_id: str, now: float) -> bool:
+        """Mark a pending or in-progress callback completed. Returns False if there is no such open callback."""
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT status, priority FROM callback_requests WHERE callback_id = ?", (callback_id,)
+            ).fetchone()
+            if row is None or row["status"] not in ("pending", "in_progress"):
+                return False
+            conn.execute(
+                "UPDATE callback_requests SET status = 'completed', completed_at = ? WHERE callback_id = ?",
+                (now, callback_id),
+            )
+            _count_callback(conn, row["status"], row["priority"], -1)
+        return True
+
+    def callback_queue(self, since: float, recent: int) -> dict:
+        """
+        What callback ETAs are estimated from, read in one snapshot.
+
+        Args:
+            since: Count arrivals queued at or after this time
+            recent: Number of most recently completed callbacks to report handling times for
+
+        Returns:
+            dict: 'waiting' and 'arrivals' (priority -> count), 'in_progress'
+            (count) and 'handling' (seconds each recent callback took)
+        """
+        conn = self._connection()
+        # One read transaction, so the counts agree with each other
+        conn.execute("BEGIN")
+        try:
+            waiting = dict(conn.execute(
+                "SELECT priority, count FROM callback_counts WHERE status = 'pending' AND count > 0"
+            ).fetchall())
+            (in_progress,) = conn.execute(
+                "SELECT COALESCE(SUM(count), 0) FROM callback_counts WHERE status = 'in_progress'"
+            ).fetchone()
+            arrivals = dict(conn.execute(
+                "SELECT priority, COUNT(*) FROM callback_requests WHERE queued_at >= ? GROUP BY priority", (since,)
+            ).fetchall())
+            handling = [
+                seconds
+                for (seconds,) in conn.execute(
+                    "SELECT completed_at - claimed_at FROM callback_requests WHERE completed_at IS NOT NULL "
+                    "AND claimed_at IS NOT NULL ORDER BY completed_at DESC LIMIT ?",
+                    (recent,),
+                )
+            ]
+        finally:
+            conn.execute("COMMIT")
+        return {"waiting": waiting, "in_progress": in_progress, "arrivals": arrivals, "handling": handling}
+
+
+class _Transaction:
+    """
+    BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises.
+
+    Inside a transaction that is already open, the block joins it and the
+    outer one decides whether it commits.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, begin: str = "BEGIN IMMEDIATE"):
+        self.conn = conn
+        self.begin = begin
+        self.outer = False
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.outer = not self.conn.in_transaction
+        if self.outer:
+            self.conn.execute(self.begin)
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self.outer:
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _count_callback(conn: sqlite3.Connection, status: str, priority: int, delta: int) -> None:
+    if status in ("pending", "in_progress"):
+        conn.execute(
+            "INSERT INTO callback_counts (status, priority, count) VALUES (?, ?, ?) "
+            "ON CONFLICT (status, priority) DO UPDATE SET count = count + excluded.count",
+            (status, priority, delta),
+        )
+
+
+def _encode(field: str, value):
+    if field == "special_requests":
+        return json.dumps(value or [])
+    return value
+
+
+def _decode(row: sqlite3.Row) -> ReservationRecord:
+    return ReservationRecord.from_row(row, json.loads(row["special_requests"]))
@@ -0,0 +1,241 @@
+"""
+Room Inventory
+Per-night occupancy of each room type, for availability checks.
+
+Each room type has an array with one counter per night, indexed by days
+since an origin date. Checking a stay scans only its own nights, so the cost
+depends on the length of the stay, not on the number of reservations.
+Arrays grow on demand in either direction. Dates are YYYY-MM-DD strings or
+date ordinals.
+
+The inventory mirrors the reservation store and is updated as reservations
+are cancelled or modified. Callers hold `lock` across "check availability,
+commit to the store, update inventory" so two calls cannot both take the
+last room. When several processes use the same store (worker mode), share()
+makes `lock` the store's write lock, exclusive across all of them and
+independent of other stores. Each change to occupancy is then logged in the
+store with the reservation write it reflects, and the other processes apply
+the logged changes they have not seen the next time they take the lock, so
+nobody reloads the whole inventory.
+"""
+
+import threading
+from array import array
+from datetime import date
+
+
+class RoomInventory:
+    """
+    Occupied rooms per room type per night.
+
+    Args:
+        capacity: Room type -> number of rooms of that type
+    """
+
+    def __init__(self, capacity: dict):
+        self.capacity = dict(capacity)
+        self.lock = threading.RLock()
+        self._origin = None
+        self._nights = {room_type: array("i") for room_type in self.capacity}
+        # Changes made under the shared lock, logged when it is released; None unless shared
+        self._log = None
+
+    @classmethod
+    def from_reservations(cls, capacity: dict, stays) -> "RoomInventory":
+        """Build an inventory from (room_type, check_in, check_out) tuples."""
+        inventory = cls(capacity)
+        for room_type, check_in, check_out in stays:
+            if room_type in inventory.capacity:
+                inventory.add(room_type, check_in, check_out)
+        return inventory
+
+    def _span(self, room_type: str, check_in: str, check_out: str) -> tuple:
+        """Index range of the nights of a stay, growing the arrays to cover it."""
+        start = _ordinal(check_in)
+        end = _ordinal(check_out)
+        if self._origin is None:
+            self._origin = start
+
+        if start < self._origin:
+            # Rare: a stay before anything seen so far; shift every array right
+            shift = self._origin - start
+            for room, nights in self._nights.items():
+                self._nights[room] = array("i", bytes(shift * nights.itemsize)) + nights
+            self._origin = start
+
+        nights = self._nights[room_type]
+        if end - self._origin > len(nights):
+            nights.extend(array("i", bytes((end - self._origin - len(nights)) * nights.itemsize)))
+        return start - self._origin, end - self._origin
+
+    def _adjust(self, room_type: str, check_in: str, check_out: str, rooms: int) -> None:
+        first, last = self._span(room_type, check_in, check_out)
+        nights = self._nights[room_type]
+        for night in range(first, last):
+            nights[night] += rooms
+
+    def add(self, room_type: str, check_in: str, check_out: str) -> None:
+        self._change(room_type, check_in, check_out, 1)
+
+    def remove(self, room_type: str, check_in: str, check_out: str) -> None:
+        self._change(room_type, check_in, check_out, -1)
+
+    def _change(self, room_type: str, check_in: str, check_out: str, rooms: int) -> None:
+        self._adjust(room_type, check_in, check_out, rooms)
+        if self._log is not None:
+            self._log.append((room_type, _ordinal(check_in), _ordinal(check_out), rooms))
+
+    def rooms_free(self, room_type: str, check_in: str, check_out: str) -> int:
+        """Rooms of `room_type` free on every night from check_in up to check_out."""
+        first, last = self._span(room_type, check_in, check_out)
+        occupied = max(self._nights[room_type][first:last], default=0)
+        return max(self.capacity[room_type] - occupied, 0)
+
+    def is_available(self, room_type: str, check_in: str, check_out: str) -> bool:
+        return self.rooms_free(room_type, check_in, check_out) > 0
+
+    def can_move(self, old: tuple, new: tuple) -> bool:
+        """
+        Whether a reservation holding `old` could hold `new` instead.
+
+        Both are (room_type, check_in, check_out); nights the reservation
+        already holds count as free.
+        """
+        with self.lock:
+            self._adjust(*old, -1)
+            try:
+                return self.is_available(*new)
+            finally:
+                self._adjust(*old, 1)
+
+    def move(self, old: tuple, new: tuple) -> None:
+        with self.lock:
+            self.remove(*old)
+            self.add(*new)
+
+    def reload(self, stays) -> None:
+        """Replace all occupancy with that of (room_type, check_in, check_out) tuples."""
+        self._origin = None
+        self._nights = {room_type: array("i") for room_type in self.capacity}
+        for room_type, check_in, check_out in stays:
+            if room_type in self.capacity:
+                self._adjust(room_type, check_in, check_out, 1)
+
+    def apply(self, changes) -> None:
+        """Apply (room_type, check_in, check_out, rooms) changes another process logged."""
+        for room_type, check_in, check_out, rooms in changes:
+            if room_type in self.capacity:
+                self._adjust(room_type, check_in, check_out, rooms)
+
+    def resize(self, capacity: dict, stays) -> None:
+        """
+        Change the room types and their room counts, then reload occupancy from
+        `stays`, or when shared from the store itself, in step with its log.
+        """
+        with self.lock:
+            self.capacity = dict(capacity)
+            if self._log is None:
+                self.reload(stays)
+            else:
+                self.lock.reload()
+
+    def share(self, store) -> None:
+        """
+        Keep this inventory consistent with copies in other processes using the same store.
+
+        Args:
+            store: The ReservationStore this inventory mirrors; changes are
+                logged in it
+        """
+        lock = _SharedInventoryLock(self, store)
+        # Loaded here rather than on the first acquire, so no other process waits for it
+        lock.reload()
+        self._log = []
+        self.lock = lock
+
+
+class _SharedInventoryLock:
+    """
+    RoomInventory.lock across processes.
+
+    Taken first by thread, then as a transaction holding the store's write
+    lock, which the caller's reservation writes join. Whoever takes it first
+    applies the changes other processes logged since the last one applied
+    here (an indexed read that finds nothing when nobody else wrote);
+    whoever releases it after changing occupancy logs the changes in the
+    same transaction. Only a process that fell further behind than the log
+    reaches back reloads the whole inventory.
+    """
+
+    def __init__(self, inventory: RoomInventory, store):
+        self._inventory = inventory
+        self._thread_lock = threading.RLock()
+        self._store = store
+        self._transaction = None
+        # Number of the last logged change applied here; None to reload on the next acquire
+        self._applied = None
+        self._depth = 0
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            try:
+                transaction = self._store.transaction()
+                transaction.__enter__()
+                self._transaction = transaction
+                self._catch_up()
+            except BaseException as e:
+                self._finish(type(e))
+                raise
+        return self
+
+    def _catch_up(self) -> None:
+        changes = self._store.inventory_changes(self._applied) if self._applied is not None else None
+        if changes is None:
+            self.reload()
+        elif changes:
+            self._inventory.apply(change[1:] for change in changes)
+            self._applied = changes[-1][0]
+
+    def reload(self) -> None:
+        """Rebuild the inventory from the store, as of the last logged change; call with the lock held."""
+        self._applied, stays = self._store.inventory_snapshot()
+        self._inventory.reload(stays)
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if self._depth == 1:
+            self._finish(exc_type)
+        else:
+            self._release()
+
+    def _finish(self, exc_type) -> None:
+        changes = self._inventory._log
+        transaction, self._transaction = self._transaction, None
+        committed = False
+        try:
+            if transaction is not None:
+                if exc_type is None and changes:
+                    applied = self._store.log_inventory_changes(changes)
+                transaction.__exit__(exc_type, None, None)
+                committed = exc_type is None
+                if committed and changes:
+                    # Caught up on entry and the store stayed locked since
+                    self._applied = applied
+        finally:
+            if not committed:
+                if changes:
+                    # Made here but not in the store: start over on the next acquire
+                    self._applied = None
+                if transaction is not None and transaction.conn.in_transaction:
+                    transaction.conn.execute("ROLLBACK")
+            changes.clear()
+            self._release()
+
+    def _release(self) -> None:
+        self._depth -= 1
+        self._thread_lock.release()
+
+
+def _ordinal(day) -> int:
+    return day if isinstance(day, int) else date.fromisoformat(day).toordinal()
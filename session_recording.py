@@ -0,0 +1,193 @@
+"""
+Session Recording
+Record Deepgram agent sessions to disk for replay.
+
+With RECORD_SESSIONS_DIR set, every message of every Deepgram session is
+written, in both directions, to one file per call. Replaying a recording
+(benchmarks/replay_sessions.py) reproduces what Deepgram sent and when, so
+latency and CPU can be compared across builds on the same calls.
+
+File format: the magic b"DGREC1\\n", a 4-byte little-endian length and a
+JSON header (call ID, start time, Settings audio formats), then one record
+per message: kind (1 byte), microseconds since the previous record
+(4 bytes), payload length (4 bytes), payload. Audio is stored as Deepgram
+sent or received it, so a minute of 8 kHz mulaw call is about 1 MB.
+
+Files are written by a background thread, like log records in
+call_logging.py: record() only timestamps the message and queues it, so a
+slow disk never stalls the event loop. Unlike log records, nothing is
+dropped; a recording with gaps could not be replayed.
+"""
+
+import atexit
+import json
+import os
+import queue
+import struct
+import threading
+import time
+from datetime import datetime
+
+MAGIC = b"DGREC1\n"
+_HEADER_LENGTH = struct.Struct("<I")
+_RECORD = struct.Struct("<BII")
+
+# Record kinds: direction relative to this server, and text or audio
+SENT_TEXT, SENT_AUDIO, RECEIVED_TEXT, RECEIVED_AUDIO = range(4)
+
+
+class _Writer:
+    """
+    The thread that writes every recorder's files, started on first use.
+
+    Queued items are (file, data) to write, or (file, None) to close the file.
+    """
+
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def put(self, file, data) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="session-recording", daemon=True)
+                    self._thread.start()
+                    # Write out whatever is still queued when the process exits
+                    atexit.register(self.stop)
+        self._queue.put((file, data))
+
+    def _run(self) -> None:
+        while True:
+            file, data = self._queue.get()
+            if file is None:
+                return
+            if data is None:
+                file.close()
+            else:
+                file.write(data)
+
+    def stop(self) -> None:
+        """Write everything queued so far, then end the thread."""
+        if self._thread is not None:
+            self._queue.put((None, None))
+            self._thread.join()
+            self._thread = None
+
+
+_writer = _Writer()
+
+
+class SessionRecorder:
+    """
+    Writes one session's messages to `path`.
+
+    Args:
+        path: File to create
+        header: JSON-serializable details about the session
+    """
+
+    def __init__(self, path: str, header: dict):
+        self.path = path
+        self._file = open(path, "wb", buffering=256 * 1024)
+        encoded = json.dumps(header).encode("utf-8")
+        _writer.put(self._file, MAGIC + _HEADER_LENGTH.pack(len(encoded)) + encoded)
+        self._last = time.monotonic()
+
+    @classmethod
+    def for_call(cls, directory: str, call_id: str, audio: dict = None) -> "SessionRecorder":
+        """
+        A recorder writing to `directory`, named after the start time and call ID.
+
+        Args:
+            directory: Where to create the recording
+            call_id: The call's ID
+            audio: The `audio` section of the call's Settings, so a replay
+                knows the format of the recorded audio
+        """
+        os.makedirs(directory, exist_ok=True)
+        started = datetime.now()
+        path = os.path.join(directory, f"{started:%Y%m%d-%H%M%S}-{call_id}.dgrec")
+        header = {"call_id": call_id, "started": started.isoformat(timespec="seconds")}
+        if audio is not None:
+            header["audio"] = audio
+        return cls(path, header)
+
+    def record(self, kind: int, payload) -> None:
+        """Queue one message for writing; `payload` is copied if it could change before then."""
+        now = time.monotonic()
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        elif not isinstance(payload, bytes):
+            # A bytearray or memoryview could change before the writer thread gets to it
+            payload = bytes(payload)
+        delta = min(round((now - self._last) * 1e6), 0xFFFFFFFF)
+        self._last = now
+        _writer.put(self._file, _RECORD.pack(kind, delta, len(payload)) + payload)
+
+    def close(self) -> None:
+        """Close the file once everything recorded so far is written."""
+        _writer.put(self._file, None)
+
+
+class RecordingConnection:
+    """
+    A Deepgram WebSocket connection that records everything sent and received.
+
+    Supports what main.py uses: send() and `async for`. Closing the
+    connection and the recorder is left to the caller.
+
+    Args:
+        connection: The open websockets connection
+        recorder: Where to record its messages
+    """
+
+    def __init__(self, connection, recorder: SessionRecorder):
+        self.connection = connection
+        self.recorder = recorder
+
+    async def send(self, message, text: bool = None) -> None:
+        is_text = text if text is not None else isinstance(message, str)
+        self.recorder.record(SENT_TEXT if is_text else SENT_AUDIO, message)
+        await self.connection.send(message, text=text)
+
+    async def __aiter__(self):
+        async for message in self.connection:
+            self.recorder.record(RECEIVED_TEXT if isinstance(message, str) else RECEIVED_AUDIO, message)
+            yield message
+
+
+def read_recording(path: str) -> tuple:
+    """
+    Load a recording.
+
+    Returns:
+        tuple: (header dict, list of (kind, seconds since the first record,
+            payload) with text payloads decoded to str)
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a session recording")
+    offset = len(MAGIC)
+    (length,) = _HEADER_LENGTH.unpack_from(data, offset)
+    offset += _HEADER_LENGTH.size
+    header = json.loads(data[offset:offset + length])
+    offset += length
+
+    records = []
+    elapsed = None
+    while offset + _RECORD.size <= len(data):
+        kind, delta, length = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        if offset + length > len(data):
+            # Cut short by a process that did not exit cleanly
+            break
+        payload = data[offset:offset + length]
+        offset += length
+        elapsed = 0.0 if elapsed is None else elapsed + delta / 1e6
+        if kind in (SENT_TEXT, RECEIVED_TEXT):
+            payload = payload.decode("utf-8")
+        records.append((kind, elapsed, payload))
+    return header, records
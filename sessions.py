@@ -0,0 +1,176 @@
+"""
+Sessions
+Live calls and admission control.
+
+Each call is a CallSession: one compact record of everything the call's
+tasks share (stream SID, queues, outbound pacer, timings, caches and the
+tasks themselves). The SessionRegistry holds the live ones and decides
+whether a new call may start.
+
+A call is turned away when the process already has `max_calls` calls, or
+when the event loop is running more than `max_loop_lag` late on average:
+past that point every extra call makes the audio of all the others stutter.
+The check runs before the WebSocket handshake, so a turned-away call costs
+one HTTP 503 and never opens a Deepgram session; Twilio then carries on
+with the TwiML after <Connect>, which is where an overflow message or a
+transfer to the front desk goes.
+"""
+
+import asyncio
+import time
+
+# Reasons a call is turned away, as counted in SessionRegistry.rejected
+MAX_CALLS_REACHED = "max_calls"
+LOOP_LAG_TOO_HIGH = "loop_lag"
+
+
+class CallSession:
+    """
+    Everything one call's tasks share.
+
+    Args:
+        context: The call's call_logging.CallContext (call ID and stream SID)
+        timeline: metrics.CallTimeline of the call's milestones and frame counts
+        audio_queue: Caller audio waiting to be sent to Deepgram
+        pacer: audio_pipeline.OutboundPacer sending agent audio to Twilio
+        vad: Local voice activity detector, or None
+        guest: hotel_functions.GuestSession of verified reservations
+        results: function_cache.FunctionResultCache for repeated function calls
+
+    inbound_transcoder and outbound_transcoder convert caller audio to and
+    agent audio from the call's Settings formats; None when they are 8 kHz
+    mulaw like Twilio. tenant is the tenants.Tenant the call was routed to,
+    or None for config.json and the default hotel.
+    """
+
+    __slots__ = (
+        "context",
+        "timeline",
+        "audio_queue",
+        "streamsid_queue",
+        "pacer",
+        "vad",
+        "guest",
+        "results",
+        "inbound_transcoder",
+        "outbound_transcoder",
+        "tenant",
+        "tasks",
+    )
+
+    def __init__(self, context, timeline, audio_queue, pacer, vad, guest, results):
+        self.context = context
+        self.timeline = timeline
+        self.audio_queue = audio_queue
+        # Hands the stream SID from the Twilio start event to the Deepgram receiver
+        self.streamsid_queue = asyncio.Queue()
+        self.pacer = pacer
+        self.vad = vad
+        self.guest = guest
+        self.results = results
+        self.inbound_transcoder = None
+        self.outbound_transcoder = None
+        self.tenant = None
+        self.tasks = ()
+
+    @property
+    def call_id(self) -> str:
+        return self.context.call_id
+
+    @property
+    def stream_sid(self) -> str:
+        return self.context.stream_sid
+
+    @stream_sid.setter
+    def stream_sid(self, stream_sid: str) -> None:
+        self.context.stream_sid = stream_sid
+
+
+class SessionRegistry:
+    """
+    The live calls of this process, and whether there is room for another.
+
+    Args:
+        max_calls: Most concurrent calls (0 for no limit)
+        max_loop_lag: Turn calls away while the event loop runs later than
+            this many seconds on average (0 disables the check)
+        lag_interval: Seconds between event loop lag samples
+        smoothing: Weight of each new lag sample in the running average
+    """
+
+    def __init__(
+        self,
+        max_calls: int = 0,
+        max_loop_lag: float = 0.0,
+        lag_interval: float = 0.05,
+        smoothing: float = 0.2,
+    ):
+        self.max_calls = max_calls
+        self.max_loop_lag = max_loop_lag
+        self.lag_interval = lag_interval
+        self.smoothing = smoothing
+        self.sessions = set()
+        self.loop_lag = 0.0
+        self.peak = 0
+        self.admitted = 0
+        self.rejected = {MAX_CALLS_REACHED: 0, LOOP_LAG_TOO_HIGH: 0}
+
+    def __len__(self) -> int:
+        return len(self.sessions)
+
+    def __iter__(self):
+        return iter(self.sessions)
+
+    def admission(self):
+        """
+        Whether a new call may start now.
+
+        Returns:
+            str: Why the call must be turned away (MAX_CALLS_REACHED or
+                LOOP_LAG_TOO_HIGH), already counted, or None to let it in
+        """
+        if self.max_calls and len(self.sessions) >= self.max_calls:
+            reason = MAX_CALLS_REACHED
+        elif self.max_loop_lag and self.loop_lag > self.max_loop_lag:
+            reason = LOOP_LAG_TOO_HIGH
+        else:
+            return None
+        self.rejected[reason] += 1
+        return reason
+
+    def has_room(self) -> bool:
+        """
+        Whether a call that passed admission can still be registered.
+
+        Calls admitted in the same instant can overshoot `max_calls` by the
+        time their handshakes finish; a False here is counted as rejected.
+        """
+        if self.max_calls and len(self.sessions) >= self.max_calls:
+            self.rejected[MAX_CALLS_REACHED] += 1
+            return False
+        return True
+
+    def add(self, session: CallSession) -> None:
+        self.sessions.add(session)
+        self.admitted += 1
+        self.peak = max(self.peak, len(self.sessions))
+
+    def remove(self, session: CallSession) -> None:
+        self.sessions.discard(session)
+
+    async def monitor_loop_lag(self) -> None:
+        """Sample how late the event loop wakes up, forever; run as a task."""
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.lag_interval)
+            lag = max(time.monotonic() - started - self.lag_interval, 0.0)
+            self.loop_lag += self.smoothing * (lag - self.loop_lag)
+
+    def stats(self) -> dict:
+        return {
+            "active": len(self.sessions),
+            "peak": self.peak,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "loop_lag_ms": round(self.loop_lag * 1000, 3),
+        }
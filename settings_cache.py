@@ -0,0 +1,133 @@
+"""
+Settings Cache
+Parses, validates and serializes the Deepgram Settings message once.
+
+Every call sends the same Settings payload, so it is kept as ready-to-send
+UTF-8 bytes. A background watcher reloads config.json when it changes on
+disk; calls already in progress keep the snapshot they started with.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+
+from transcoding import TELEPHONY_FORMAT, audio_format, make_transcoder
+
+log = logging.getLogger(__name__)
+
+
+class SettingsSnapshot:
+    """An immutable, validated Settings message and its serialized form."""
+
+    __slots__ = ("config", "payload", "version", "loaded_at", "input_format", "output_format")
+
+    def __init__(self, config: dict, payload: bytes, version: tuple):
+        self.config = config
+        self.payload = payload
+        self.version = version
+        self.loaded_at = time.time()
+        # (encoding, sample_rate) Deepgram expects and sends, for transcoding.make_transcoder
+        self.input_format = audio_format(config["audio"]["input"])
+        self.output_format = audio_format(config["audio"]["output"])
+        # Builds the lookup tables and filters now instead of during the first call
+        make_transcoder(TELEPHONY_FORMAT, self.input_format)
+        make_transcoder(self.output_format, TELEPHONY_FORMAT)
+
+
+def validate_settings(config: dict, known_functions=None) -> None:
+    """
+    Check the parts of a Settings message the server relies on.
+
+    Raises:
+        ValueError: Describing the first problem found
+    """
+    if config.get("type") != "Settings":
+        raise ValueError("'type' must be 'Settings'")
+
+    audio = config.get("audio", {})
+    for direction in ("input", "output"):
+        section = audio.get(direction)
+        if not isinstance(section, dict) or "encoding" not in section or "sample_rate" not in section:
+            raise ValueError(f"audio.{direction} needs 'encoding' and 'sample_rate'")
+        try:
+            audio_format(section)
+        except ValueError as e:
+            raise ValueError(f"audio.{direction}: {e}") from None
+
+    agent = config.get("agent")
+    if not isinstance(agent, dict):
+        raise ValueError("'agent' section is missing")
+
+    if known_functions is not None:
+        for function in agent.get("think", {}).get("functions", []):
+            if function.get("name") not in known_functions:
+                raise ValueError(f"Function '{function.get('name')}' has no handler in FUNCTION_MAP")
+
+
+class SettingsCache:
+    """
+    Holds the current SettingsSnapshot for a config file.
+
+    Args:
+        path: Path to the Settings JSON file
+        known_functions: Function names the server can execute, used for validation
+        check_interval: Seconds between on-disk change checks in watch()
+    """
+
+    def __init__(self, path: str = "config.json", known_functions=None, check_interval: float = 1.0):
+        self.path = path
+        self.known_functions = known_functions
+        self.check_interval = check_interval
+        self.reloads = 0
+        self.reload_errors = 0
+        self._rejected_version = ()
+        self._snapshot = self._load()
+
+    def _file_version(self) -> tuple:
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load(self) -> SettingsSnapshot:
+        version = self._file_version()
+        with open(self.path, "r") as f:
+            config = json.load(f)
+        validate_settings(config, self.known_functions)
+        payload = json.dumps(config, separators=(",", ":")).encode("utf-8")
+        return SettingsSnapshot(config, payload, version)
+
+    def get(self) -> SettingsSnapshot:
+        return self._snapshot
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reload the file if it changed on disk. An invalid file keeps the previous snapshot.
+
+        Returns:
+            bool: True if a new snapshot was installed
+        """
+        version = None
+        try:
+            version = self._file_version()
+            if version == self._snapshot.version or version == self._rejected_version:
+                return False
+            snapshot = self._load()
+        except (OSError, ValueError) as e:
+            # Report a broken or missing file once, not every interval
+            if version != self._rejected_version:
+                self.reload_errors += 1
+                log.warning("Keeping previous settings, could not reload %s: %s", self.path, e)
+            self._rejected_version = version
+            return False
+
+        # A single reference swap: new calls see the new snapshot, running calls keep theirs
+        self._snapshot = snapshot
+        self.reloads += 1
+        log.info("Reloaded settings from %s", self.path)
+        return True
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            self.reload_if_changed()
@@ -0,0 +1,177 @@
+"""
+Deepgram Agent Connection Pool
+Pre-opened Deepgram Voice Agent sockets handed out to new calls.
+
+Opening a session costs a TCP, TLS and WebSocket handshake to Deepgram before
+the Settings message can even be sent. The pool pays that cost ahead of time
+so an incoming call only has to send its Settings.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from websockets.protocol import State
+
+log = logging.getLogger(__name__)
+
+
+class StsPool:
+    """
+    Keeps up to `size` idle, health-checked agent connections ready.
+
+    Args:
+        connect: Zero-argument callable returning an awaitable that opens a
+            connection, e.g. main.sts_connect
+        size: Number of idle connections to keep open
+        refill_rate: Maximum new connections opened per second (0: no limit)
+        idle_expiry: Seconds after which an unused connection is closed and replaced
+        health_interval: Seconds between ping checks of idle connections
+        health_timeout: Seconds to wait for a pong before discarding a connection
+    """
+
+    def __init__(
+        self,
+        connect,
+        size: int = 2,
+        refill_rate: float = 2.0,
+        idle_expiry: float = 20.0,
+        health_interval: float = 5.0,
+        health_timeout: float = 2.0,
+    ):
+        if refill_rate < 0:
+            raise ValueError("refill_rate must not be negative")
+        self._connect = connect
+        self.size = size
+        self.refill_rate = refill_rate
+        self.idle_expiry = idle_expiry
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+
+        self._idle = deque()
+        self._opening = set()
+        self._task = None
+        self._backoff = 0.0
+        self._retry_at = 0.0
+        self._changed = asyncio.Event()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.opened = 0
+        self.expired = 0
+        self.unhealthy = 0
+        self.connect_errors = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._maintain())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._opening):
+            task.cancel()
+        while self._idle:
+            _, ws = self._idle.popleft()
+            await ws.close()
+
+    async def acquire(self):
+        """Return an open connection, pre-warmed if one is available."""
+        while self._idle:
+            _, ws = self._idle.popleft()
+            self._changed.set()
+            if ws.state is State.OPEN:
+                self.hits += 1
+                return ws
+            self.unhealthy += 1
+
+        self.misses += 1
+        return await self._connect()
+
+    async def _open_one(self) -> None:
+        try:
+            ws = await self._connect()
+        except Exception as e:
+            self.connect_errors += 1
+            # Back off exponentially while Deepgram is unreachable
+            self._backoff = min(self._backoff * 2 if self._backoff else 0.5, 30.0)
+            self._retry_at = time.monotonic() + self._backoff
+            log.warning("Deepgram pool connect failed, retrying in %.1fs: %s", self._backoff, e)
+            return
+        self._backoff = 0.0
+        self.opened += 1
+        self._idle.append((time.monotonic(), ws))
+        self._changed.set()
+
+    async def _ping(self, ws) -> bool:
+        try:
+            pong_waiter = await ws.ping()
+            await asyncio.wait_for(pong_waiter, self.health_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def _discard(self, entry) -> None:
+        if entry in self._idle:
+            self._idle.remove(entry)
+            await entry[1].close()
+
+    async def _check_health(self) -> None:
+        now = time.monotonic()
+        for entry in list(self._idle):
+            opened_at, ws = entry
+            if entry not in self._idle:
+                continue
+            if now - opened_at > self.idle_expiry:
+                self.expired += 1
+                await self._discard(entry)
+            elif ws.state is not State.OPEN:
+                self.unhealthy += 1
+                await self._discard(entry)
+
+        # Ping in place so calls can still take connections while pongs are pending
+        entries = list(self._idle)
+        healthy = await asyncio.gather(*(self._ping(ws) for _, ws in entries))
+        for entry, ok in zip(entries, healthy):
+            if not ok and entry in self._idle:
+                self.unhealthy += 1
+                await self._discard(entry)
+
+    async def _maintain(self) -> None:
+        next_health_check = time.monotonic() + self.health_interval
+
+        while True:
+            wake_at = next_health_check
+            if len(self._idle) + len(self._opening) < self.size:
+                if time.monotonic() >= self._retry_at:
+                    # Handshakes overlap; refill_rate only spaces out their starts
+                    task = asyncio.ensure_future(self._open_one())
+                    self._opening.add(task)
+                    task.add_done_callback(self._opening.discard)
+                    await asyncio.sleep(1 / self.refill_rate if self.refill_rate else 0)
+                    continue
+                wake_at = min(wake_at, self._retry_at)
+
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), max(0.0, wake_at - time.monotonic()))
+            except asyncio.TimeoutError:
+                pass
+
+            if time.monotonic() >= next_health_check:
+                await self._check_health()
+                next_health_check = time.monotonic() + self.health_interval
+
+    def stats(self) -> dict:
+        return {
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "opened": self.opened,
+            "expired": self.expired,
+            "unhealthy": self.unhealthy,
+            "connect_errors": self.connect_errors,
+        }
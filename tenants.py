@@ -0,0 +1,388 @@
+"""
+Tenants
+Route calls to per-property Settings and hotel data.
+
+One server pool can answer for many hotels. Each property is a tenant: a
+file `<tenant_id>.json` in TENANTS_DIR holding
+
+    numbers          Phone numbers guests call for this property
+    settings         Parts of the Settings message that differ from
+                     config.json (prompt, greeting, keyterms, voice, ...),
+                     merged over it key by key; lists replace lists
+    hotel_info       The property's information, shaped like HOTEL_INFO
+    reservations_db  Optional SQLite file of its reservations, by default
+                     `<tenant_id>.db` next to the tenant file
+
+A call is routed by the custom parameters of its Twilio `start` event: a
+`tenant` parameter names the tenant, else a `to` parameter (the called
+number, <Parameter name="to" value="{{To}}"/> in the TwiML) is looked up in
+the numbers of all tenants. Calls that match no tenant get config.json and
+the hotel in hotel_functions.py. A call routed to a tenant that has never
+compiled is turned away, never served another hotel's prompt and data.
+
+A tenant is compiled the first time it is called: its merged Settings are
+validated and serialized once, like settings_cache does for config.json,
+and its get_hotel_info answers are built. Compiled tenants are kept in an
+LRU bounded by `max_bytes`, so hundreds of properties cost memory only for
+the ones being called. A tenant is recompiled when its file or config.json
+changes. Reservation stores, room inventories and callback queues are live
+state, not derived from the file, and stay open for the life of the process
+whether or not the compiled tenant is cached.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+from hotel_functions import Hotel, room_capacity
+from settings_cache import SettingsCache, SettingsSnapshot, validate_settings
+
+log = logging.getLogger(__name__)
+
+# Custom parameters of the Twilio start event used for routing
+TENANT_PARAMETER = "tenant"
+NUMBER_PARAMETER = "to"
+
+
+class TenantUnavailable(LookupError):
+    """A call was routed to a tenant whose file has never compiled."""
+
+
+class Tenant:
+    """
+    A compiled tenant: what a call to one property needs.
+
+    Args:
+        tenant_id: The tenant file's name without `.json`
+        settings: SettingsSnapshot of the merged Settings message
+        hotel: hotel_functions.Hotel the call's function calls act on
+        version: (tenant file version, config.json version) it was compiled from
+        size: Bytes of memory the tenant holds, see compiled_size()
+    """
+
+    __slots__ = ("tenant_id", "settings", "hotel", "version", "size")
+
+    def __init__(self, tenant_id: str, settings: SettingsSnapshot, hotel: Hotel, version: tuple, size: int):
+        self.tenant_id = tenant_id
+        self.settings = settings
+        self.hotel = hotel
+        self.version = version
+        self.size = size
+
+
+def merge_settings(base: dict, overrides: dict) -> dict:
+    """
+    `base` with `overrides` merged into it; dicts merge, anything else replaces.
+
+    Parts `overrides` leaves alone are shared with `base`, not copied.
+    """
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_settings(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+# Types that reference nothing deep_size() should count
+_LEAVES = frozenset((str, bytes, int, float, bool, type(None)))
+
+
+def deep_size(obj, exclude=()) -> int:
+    """
+    Bytes of memory taken by `obj` and the containers and objects it references.
+
+    Args:
+        obj: What to measure
+        exclude: ids of objects not to count, nor look inside
+    """
+    seen = set(exclude)
+    size = 0
+    pending = [obj]
+    while pending:
+        item = pending.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        size += sys.getsizeof(item)
+        kind = type(item)
+        if kind in _LEAVES:
+            continue
+        if kind is dict or isinstance(item, dict):
+            pending.extend(item.keys())
+            pending.extend(item.values())
+        elif kind in (list, tuple, set, frozenset):
+            pending.extend(item)
+        if kind is not type and hasattr(item, "__dict__"):
+            pending.append(vars(item))
+        for slot in getattr(kind, "__slots__", ()):
+            pending.append(getattr(item, slot, None))
+    return size
+
+
+def compiled_size(settings: SettingsSnapshot, hotel: Hotel, base: SettingsSnapshot) -> int:
+    """
+    Memory a compiled tenant holds: its Settings, hotel information and
+    get_hotel_info answers, less the parts of config.json it shares.
+    The reservation state is not counted; it is never evicted.
+    """
+    shared = set()
+    pending = [base.config]
+    while pending:
+        item = pending.pop()
+        shared.add(id(item))
+        if isinstance(item, dict):
+            pending.extend(item.values())
+        elif isinstance(item, list):
+            pending.extend(item)
+    return deep_size((settings.config, settings.payload, hotel.info, hotel.info_index), shared)
+
+
+def normalize_number(number: str) -> str:
+    """A phone number's digits, so "+1 (415) 555-0100" and "14155550100" match."""
+    return "".join(c for c in str(number) if c.isdigit())
+
+
+class TenantRegistry:
+    """
+    Routes calls to tenants and caches compiled tenants.
+
+    Args:
+        directory: Directory of `<tenant_id>.json` tenant files
+        settings_cache: SettingsCache of config.json, the base of every tenant's Settings
+        known_functions: Function names the server can execute, used for validation
+        max_bytes: Memory compiled tenants may take before the least recently
+            called are evicted
+        check_interval: Seconds between scans of `directory` in watch()
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        settings_cache: SettingsCache,
+        known_functions=None,
+        max_bytes: int = 128 * 2**20,
+        check_interval: float = 1.0,
+    ):
+        self.directory = directory
+        self.settings_cache = settings_cache
+        self.known_functions = known_functions
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.compile_errors = 0
+        self.unrouted = 0
+        self.unavailable = 0
+        self.cached_bytes = 0
+        # Compiled tenants, least recently called first; only touched on the event loop
+        self._cache = OrderedDict()
+        self._compiling = {}
+        self._rejected = {}
+        # Tenant ID -> (store, inventory, callbacks), the live reservation state; never evicted
+        self._live = {}
+        self._live_lock = threading.Lock()
+        # Whether tenants' inventories are shared with other processes, see share()
+        self._shared = False
+        self._unreadable = {}
+        # Replaced whole by scan(), so a call never sees them half built
+        self._versions = {}
+        self._numbers = {}
+        self.scan()
+
+    def _path(self, tenant_id: str) -> str:
+        return os.path.join(self.directory, f"{tenant_id}.json")
+
+    def scan(self) -> None:
+        """Find the tenant files and index their phone numbers; unchanged files are not re-read."""
+        versions = {}
+        numbers = {}
+        for name in sorted(os.listdir(self.directory)):
+            tenant_id, extension = os.path.splitext(name)
+            if extension != ".json":
+                continue
+            version = None
+            try:
+                stat = os.stat(self._path(tenant_id))
+                version = (stat.st_mtime_ns, stat.st_size)
+                if self._versions.get(tenant_id, (None,))[0] == version:
+                    tenant_numbers = self._versions[tenant_id][1]
+                else:
+                    with open(self._path(tenant_id)) as f:
+                        tenant_numbers = [normalize_number(n) for n in json.load(f).get("numbers", [])]
+            except (OSError, ValueError) as e:
+                # Report a broken file once, not every interval
+                if self._unreadable.get(tenant_id) != version:
+                    log.warning("Skipping tenant %s: %s", tenant_id, e)
+                self._unreadable[tenant_id] = version
+                continue
+            self._unreadable.pop(tenant_id, None)
+            versions[tenant_id] = (version, tenant_numbers)
+            for number in tenant_numbers:
+                if number in numbers:
+                    log.warning("Number %s belongs to tenants %s and %s", number, numbers[number], tenant_id)
+                numbers.setdefault(number, tenant_id)
+        self._versions = versions
+        self._numbers = numbers
+
+    def route(self, start: dict):
+        """
+        The ID of the tenant a call is for.
+
+        Args:
+            start: The `start` object of the call's Twilio start event
+
+        Returns:
+            str: A tenant ID, or None for calls that match no tenant
+        """
+        parameters = {key.lower(): value for key, value in (start.get("customParameters") or {}).items()}
+        tenant_id = parameters.get(TENANT_PARAMETER)
+        if tenant_id is None and NUMBER_PARAMETER in parameters:
+            tenant_id = self._numbers.get(normalize_number(parameters[NUMBER_PARAMETER]))
+        # Only names found by scan(), so a parameter can never point outside the directory
+        return tenant_id if tenant_id in self._versions else None
+
+    async def resolve(self, start: dict):
+        """
+        The compiled tenant a call is for, compiling it if needed.
+
+        Args:
+            start: The `start` object of the call's Twilio start event
+
+        Returns:
+            Tenant: Or None for calls that match no tenant
+
+        Raises:
+            TenantUnavailable: The call is for a tenant whose file is broken
+                and was never compiled successfully
+        """
+        tenant_id = self.route(start)
+        if tenant_id is None:
+            self.unrouted += 1
+            return None
+
+        version = (self._versions[tenant_id][0], self.settings_cache.get().version)
+        tenant = self._cache.get(tenant_id)
+        if tenant is not None and (tenant.version == version or self._rejected.get(tenant_id) == version):
+            # An edit that failed to compile keeps the version before it, like config.json
+            self._cache.move_to_end(tenant_id)
+            self.hits += 1
+            return tenant
+        if tenant is None and self._rejected.get(tenant_id) == version:
+            self.unavailable += 1
+            raise TenantUnavailable(tenant_id)
+
+        self.misses += 1
+        compiling = self._compiling.get(tenant_id)
+        if compiling is None:
+            # One compile per tenant however many of its calls arrive meanwhile
+            compiling = asyncio.ensure_future(self._compile_async(tenant_id, version))
+            self._compiling[tenant_id] = compiling
+        tenant = await asyncio.shield(compiling)
+        if tenant is None:
+            self.unavailable += 1
+            raise TenantUnavailable(tenant_id)
+        return tenant
+
+    async def _compile_async(self, tenant_id: str, version: tuple):
+        try:
+            # Parsing and opening the store block, so keep them off the event loop
+            tenant = await asyncio.get_running_loop().run_in_executor(None, self._compile, tenant_id, version)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError, sqlite3.Error) as e:
+            self.compile_errors += 1
+            self._rejected[tenant_id] = version
+            log.warning("Could not compile tenant %s: %s", tenant_id, e)
+            return self._cache.get(tenant_id)
+        finally:
+            del self._compiling[tenant_id]
+
+        self._rejected.pop(tenant_id, None)
+        self._store(tenant)
+        log.info("Compiled tenant %s", tenant_id)
+        return tenant
+
+    def _compile(self, tenant_id: str, version: tuple) -> Tenant:
+        with open(self._path(tenant_id)) as f:
+            data = json.load(f)
+        base = self.settings_cache.get()
+        config = merge_settings(base.config, data.get("settings", {}))
+        validate_settings(config, self.known_functions)
+        payload = json.dumps(config, separators=(",", ":")).encode("utf-8")
+        settings = SettingsSnapshot(config, payload, version)
+
+        info = data["hotel_info"]
+        db_path = os.path.join(self.directory, data.get("reservations_db", f"{tenant_id}.db"))
+        hotel = self._hotel(tenant_id, info, db_path)
+        return Tenant(tenant_id, settings, hotel, version, compiled_size(settings, hotel, base))
+
+    def _hotel(self, tenant_id: str, info: dict, db_path: str) -> Hotel:
+        """The tenant's Hotel with `info`, opening its reservation state the first time."""
+        with self._live_lock:
+            live = self._live.get(tenant_id)
+            if live is None:
+                hotel = Hotel.open(info, db_path)
+                if self._shared:
+                    hotel.inventory.share(hotel.store)
+                # Not the Hotel itself: its answers go when the tenant is evicted
+                self._live[tenant_id] = (hotel.store, hotel.inventory, hotel.callbacks)
+                return hotel
+
+        store, inventory, callbacks = live
+        if room_capacity(info) != inventory.capacity:
+            inventory.resize(room_capacity(info), store.iter_stays())
+        return Hotel(info, store, inventory, callbacks)
+
+    def _store(self, tenant: Tenant) -> None:
+        previous = self._cache.pop(tenant.tenant_id, None)
+        if previous is not None:
+            self.cached_bytes -= previous.size
+        self._cache[tenant.tenant_id] = tenant
+        self.cached_bytes += tenant.size
+        # Always keep the tenant just compiled, even if it alone is over the limit
+        while self.cached_bytes > self.max_bytes and len(self._cache) > 1:
+            _, evicted = self._cache.popitem(last=False)
+            self.cached_bytes -= evicted.size
+            self.evictions += 1
+
+    def share(self) -> None:
+        """
+        Keep every tenant's room inventory consistent across worker processes.
+
+        Each tenant's inventory is locked and kept in step through its own
+        reservation store, so a booking change at one property never holds up
+        or invalidates another's.
+        """
+        with self._live_lock:
+            self._shared = True
+            for store, inventory, _ in self._live.values():
+                inventory.share(store)
+
+    async def watch(self) -> None:
+        """Pick up added, edited and removed tenant files, forever; run as a task."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await loop.run_in_executor(None, self.scan)
+            except OSError as e:
+                log.warning("Could not scan %s: %s", self.directory, e)
+
+    def stats(self) -> dict:
+        return {
+            "tenants": len(self._versions),
+            "cached": len(self._cache),
+            "cached_bytes": self.cached_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "compile_errors": self.compile_errors,
+            "unrouted": self.unrouted,
+            "unavailable": self.unavailable,
+        }
@@ -0,0 +1,442 @@
+"""
+Transcoding
+Convert call audio between the telephony format and the Deepgram Settings.
+
+Twilio streams 8 kHz mulaw in both directions. The `audio` section of the
+Settings message may ask Deepgram for something else (linear16 at 16 kHz for
+better recognition, 24 kHz TTS, alaw), in which case a Transcoder sits
+between twilio_receiver and sts_sender and another between sts_receiver and
+the outbound pacer. When the formats match no Transcoder is created and
+audio passes through untouched.
+
+Formats are (encoding, sample_rate) tuples. Encodings are converted through
+lookup tables via a common 16-bit "offset binary" form (the sample plus
+32768, little-endian), so G.711 to G.711 is one bytes.translate() and any
+other pair is one table pass each way.
+
+Sample rates are converted by a polyphase FIR filter that works on a whole
+chunk at once: the chunk is packed into one big integer with a 40-bit lane
+per sample, each polyphase branch of the filter likewise, and one integer
+multiplication per branch computes all of that branch's outputs (Kronecker
+substitution), so Python's arbitrary-precision multiply does the
+multiply-accumulates in C. The lanes are biased so none ever goes negative,
+which keeps them independent, and each output lands in two whole bytes of
+its lane that are read back with strided slices. Rates must be whole
+multiples of each other, which covers 8 kHz telephony against every
+linear16 rate Deepgram uses except 44.1 kHz.
+
+Sample bytes are read in native order, so this assumes a little-endian host.
+"""
+
+import math
+from functools import lru_cache
+
+from vad import MULAW_TO_LINEAR
+
+ENCODINGS = ("mulaw", "alaw", "linear16")
+TELEPHONY_FORMAT = ("mulaw", 8000)
+
+# Filter taps per polyphase branch; more taps give a steeper anti-aliasing filter
+TAPS_PER_PHASE = 16
+# Filter cutoff as a fraction of the lower rate's Nyquist frequency (3.6 kHz at 8 kHz)
+CUTOFF = 0.9
+
+# Offset-binary zero: silence in every encoding decodes to about this
+_ZERO = 32768
+
+
+# =============================================================================
+# FORMATS
+# =============================================================================
+
+
+def audio_format(section: dict) -> tuple:
+    """
+    The (encoding, sample_rate) of an `audio.input` or `audio.output` Settings section.
+
+    Raises:
+        ValueError: For an encoding or sample rate this module cannot convert
+    """
+    encoding = section.get("encoding")
+    sample_rate = section.get("sample_rate")
+    if encoding not in ENCODINGS:
+        raise ValueError(f"unsupported encoding '{encoding}'. Options: {', '.join(ENCODINGS)}")
+    if not isinstance(sample_rate, int) or sample_rate <= 0:
+        raise ValueError(f"sample_rate must be a positive integer, got {sample_rate!r}")
+    if section.get("container", "none") != "none":
+        raise ValueError("container must be 'none': audio is streamed as raw samples")
+    rate_ratio(sample_rate, TELEPHONY_FORMAT[1])
+    return (encoding, sample_rate)
+
+
+def rate_ratio(source_rate: int, target_rate: int) -> tuple:
+    """
+    (up, down) factors converting `source_rate` to `target_rate`; one of them is 1.
+
+    Raises:
+        ValueError: If neither rate is a whole multiple of the other
+    """
+    if target_rate % source_rate == 0:
+        return target_rate // source_rate, 1
+    if source_rate % target_rate == 0:
+        return 1, source_rate // target_rate
+    raise ValueError(f"cannot convert between {source_rate} Hz and {target_rate} Hz (neither is a multiple of the other)")
+
+
+def make_transcoder(source: tuple, target: tuple):
+    """
+    A Transcoder from `source` to `target`, or None when they are the same format.
+    """
+    if source == target:
+        return None
+    return Transcoder(source, target)
+
+
+# =============================================================================
+# G.711 LOOKUP TABLES (built on first use)
+# =============================================================================
+
+
+def _alaw_to_linear(value: int) -> int:
+    value ^= 0x55
+    exponent = (value >> 4) & 0x07
+    mantissa = value & 0x0F
+    if exponent:
+        sample = ((mantissa << 4) + 0x108) << (exponent - 1)
+    else:
+        sample = (mantissa << 4) + 8
+    return sample if value & 0x80 else -sample
+
+
+def _linear_to_mulaw(sample: int) -> int:
+    # G.711 works on 14-bit samples
+    value = sample >> 2
+    mask = 0x7F if value < 0 else 0xFF
+    magnitude = min(min(abs(value), 8159) + 0x21, 0x1FFF)
+    exponent = magnitude.bit_length() - 6
+    mantissa = (magnitude >> (exponent + 1)) & 0x0F
+    return ((exponent << 4) | mantissa) ^ mask
+
+
+def _linear_to_alaw(sample: int) -> int:
+    sign = 0x80 if sample >= 0 else 0
+    magnitude = min(abs(sample) if sample >= 0 else -sample - 1, 32767) >> 3
+    if magnitude < 32:
+        value = magnitude >> 1
+    else:
+        exponent = magnitude.bit_length() - 5
+        value = (exponent << 4) | ((magnitude >> exponent) & 0x0F)
+    return (sign | value) ^ 0x55
+
+
+# G.711 byte -> 16-bit linear sample; mulaw shares the table the VAD measures energy with
+_DECODERS = {"mulaw": MULAW_TO_LINEAR, "alaw": tuple(_alaw_to_linear(value) for value in range(256))}
+_ENCODERS = {"mulaw": _linear_to_mulaw, "alaw": _linear_to_alaw}
+
+# Flips the sign bit of a little-endian sample's high byte: signed <-> offset binary
+_FLIP_SIGN = bytes(value ^ 0x80 for value in range(256))
+
+
+@lru_cache(maxsize=None)
+def _decode_tables(encoding: str) -> tuple:
+    """G.711 byte -> low byte, and -> high byte, of its offset-binary sample."""
+    samples = [sample + _ZERO for sample in _DECODERS[encoding]]
+    return bytes(sample & 0xFF for sample in samples), bytes(sample >> 8 for sample in samples)
+
+
+@lru_cache(maxsize=None)
+def _encode_table(encoding: str) -> bytes:
+    """Offset-binary sample (0-65535) -> G.711 byte."""
+    encode = _ENCODERS[encoding]
+    return bytes(encode(value - _ZERO) for value in range(65536))
+
+
+@lru_cache(maxsize=None)
+def _translate_table(source: str, target: str) -> bytes:
+    """G.711 byte -> G.711 byte of the other law, via the nearest linear sample."""
+    encode = _ENCODERS[target]
+    return bytes(encode(sample) for sample in _DECODERS[source])
+
+
+def _to_offset_binary(data, decode_tables) -> bytes:
+    if decode_tables is None:
+        # linear16
+        samples = bytearray(data)
+        samples[1::2] = samples[1::2].translate(_FLIP_SIGN)
+        return samples
+    # Two translate() passes walk the whole chunk in C
+    low, high = decode_tables
+    data = bytes(data)
+    samples = bytearray(2 * len(data))
+    samples[0::2] = data.translate(low)
+    samples[1::2] = data.translate(high)
+    return samples
+
+
+def _from_offset_binary(samples, encode_table) -> bytes:
+    if encode_table is None:
+        # linear16
+        data = bytearray(samples)
+        data[1::2] = data[1::2].translate(_FLIP_SIGN)
+        return bytes(data)
+    # map() over the lookup table walks the whole chunk in C
+    return bytes(map(encode_table.__getitem__, memoryview(samples).cast("H")))
+
+
+# =============================================================================
+# POLYPHASE RESAMPLER
+# =============================================================================
+
+# Each sample occupies a 40-bit lane of the packed integers: bytes 0-1 hold
+# the fraction, 2-3 the offset-binary result and 4 a guard byte that reads
+# _GUARD unless the result fell outside 16 bits
+_LANE_BYTES = 5
+_LANE_BITS = 8 * _LANE_BYTES
+_SCALE_BITS = 16
+_CENTER = (1 << 23) + _ZERO
+_GUARD = _CENTER >> 16
+_ZERO_LANE = _ZERO.to_bytes(_LANE_BYTES, "little")
+
+
+@lru_cache(maxsize=None)
+def _filter(up: int, down: int, taps_per_phase: int) -> tuple:
+    """
+    Blackman-windowed sinc low-pass filter for resampling by up/down.
+
+    Returns:
+        tuple: Integer taps scaled by 2**16, with a DC gain of `up` so the
+            zero-stuffed upsampled signal keeps its level
+    """
+    factor = max(up, down)
+    length = taps_per_phase * factor
+    cutoff = CUTOFF / (2 * factor)
+    middle = (length - 1) / 2
+    taps = []
+    for i in range(length):
+        x = i - middle
+        sinc = 2 * cutoff * (math.sin(2 * math.pi * cutoff * x) / (2 * math.pi * cutoff * x) if x else 1.0)
+        window = 0.42 - 0.5 * math.cos(2 * math.pi * i / (length - 1)) + 0.08 * math.cos(4 * math.pi * i / (length - 1))
+        taps.append(sinc * window)
+    scale = up * (1 << _SCALE_BITS) / sum(taps)
+    return tuple(round(tap * scale) for tap in taps)
+
+
+def _pack(taps) -> int:
+    """Kronecker-pack integer filter taps, first tap in the lowest lane."""
+    packed = 0
+    for tap in reversed(taps):
+        packed = (packed << _LANE_BITS) + tap
+    return packed
+
+
+def _bias_lane(taps) -> bytes:
+    """
+    Lane constant that centres a branch's outputs and cancels the offset of its inputs.
+
+    A branch's raw output is its taps dotted with offset-binary inputs, so it
+    carries _ZERO * sum(taps) on top of the wanted sample; half a unit rounds.
+    """
+    bias = (_CENTER << _SCALE_BITS) + (1 << (_SCALE_BITS - 1)) - _ZERO * sum(taps)
+    return bias.to_bytes(_LANE_BYTES, "little")
+
+
+def _lanes(samples, start: int, step: int, count: int, lead: int = 0) -> int:
+    """
+    Pack every `step`th offset-binary sample from index `start` into lanes.
+
+    Args:
+        samples: Offset-binary sample bytes
+        start: First sample to pack
+        step: Stride between packed samples
+        count: Number of lanes, including `lead`
+        lead: Lanes of silence before the first sample
+    """
+    packed = bytearray(_ZERO_LANE * count)
+    end = 2 * (start + (count - lead - 1) * step)
+    first = lead * _LANE_BYTES
+    packed[first::_LANE_BYTES] = samples[2 * start : end + 1 : 2 * step]
+    packed[first + 1 :: _LANE_BYTES] = samples[2 * start + 1 : end + 2 : 2 * step]
+    return int.from_bytes(packed, "little")
+
+
+def _unpack(product: int, first: int, count: int, lanes: int, output: bytearray, offset: int = 0, stride: int = 1) -> None:
+    """
+    Write the outputs in lanes first to first + count - 1 of a branch product to `output`.
+
+    Args:
+        product: Biased branch product, `lanes` lanes long
+        first: First lane to read
+        count: Number of lanes to read
+        output: Offset-binary sample bytes to write to
+        offset: Sample of `output` the first lane goes to
+        stride: Samples between the ones written
+
+    Outputs outside 16 bits are clamped to full scale.
+    """
+    lane_bytes = product.to_bytes(lanes * _LANE_BYTES, "little")
+    start = first * _LANE_BYTES + 2
+    end = (first + count) * _LANE_BYTES
+    low = lane_bytes[start:end:_LANE_BYTES]
+    high = lane_bytes[start + 1 : end : _LANE_BYTES]
+    guards = lane_bytes[start + 2 : end : _LANE_BYTES]
+    if guards.count(_GUARD) != count:
+        # Rare: a loud signal overshot full scale through the filter's ripple
+        low = bytearray(low)
+        high = bytearray(high)
+        for i, guard in enumerate(guards):
+            if guard != _GUARD:
+                low[i] = high[i] = 0xFF if guard > _GUARD else 0
+    output[2 * offset :: 2 * stride] = low
+    output[2 * offset + 1 :: 2 * stride] = high
+
+
+@lru_cache(maxsize=None)
+def _branches(up: int, down: int, taps_per_phase: int) -> tuple:
+    """
+    The filter split into its polyphase branches, each as (packed taps, bias lane).
+
+    Upsampling has one branch per output phase; downsampling one per input
+    phase, whose outputs are summed, so they share one bias.
+    """
+    taps = _filter(up, down, taps_per_phase)
+    if up > 1:
+        return tuple((_pack(taps[j::up]), _bias_lane(taps[j::up])) for j in range(up))
+    bias = _bias_lane(taps)
+    return tuple((_pack(taps[s::down]), bias) for s in range(down))
+
+
+class Resampler:
+    """
+    Streaming polyphase resampler of offset-binary samples.
+
+    Keeps the last few input samples between chunks, so a stream split into
+    chunks of any size resamples exactly as it would in one piece.
+
+    Args:
+        source_rate: Input sample rate
+        target_rate: Output sample rate; one rate must be a multiple of the other
+        taps_per_phase: Filter taps per polyphase branch
+    """
+
+    def __init__(self, source_rate: int, target_rate: int, taps_per_phase: int = TAPS_PER_PHASE):
+        self.up, self.down = rate_ratio(source_rate, target_rate)
+        self.taps_per_phase = taps_per_phase
+        self._branches = _branches(self.up, self.down, taps_per_phase)
+        # Input samples each output looks back over, beyond its own
+        self._history = taps_per_phase - 1 if self.up > 1 else taps_per_phase * self.down
+        self._samples = _ZERO.to_bytes(2, "little") * self._history
+
+    def convert(self, samples) -> bytes:
+        """
+        Resample a chunk of offset-binary samples.
+
+        Returns:
+            bytes: Offset-binary output samples; while downsampling, input left
+            over beyond a multiple of the factor comes out with the next chunk
+        """
+        samples = self._samples + samples
+        if self.up > 1:
+            return self._upsample(samples)
+        return self._downsample(samples)
+
+    def _upsample(self, samples) -> bytes:
+        up = self.up
+        history = self._history
+        total = len(samples) // 2
+        count = total - history
+        if count <= 0:
+            return b""
+        packed = _lanes(samples, 0, 1, total)
+        lanes = total + self.taps_per_phase - 1
+
+        output = bytearray(2 * count * up)
+        for phase, (branch, bias) in enumerate(self._branches):
+            product = packed * branch + int.from_bytes(bias * lanes, "little")
+            _unpack(product, history, count, lanes, output, phase, up)
+
+        self._samples = samples[2 * count :]
+        return output
+
+    def _downsample(self, samples) -> bytes:
+        down = self.down
+        taps = self.taps_per_phase
+        total = len(samples) // 2
+        count = (total - self._history) // down
+        if count <= 0:
+            self._samples = samples
+            return b""
+
+        # Branch s sees samples p * down - s for output p; the first is before the chunk for s > 0
+        lanes = taps + count
+        product = _lanes(samples, 0, down, lanes) * self._branches[0][0]
+        for s in range(1, down):
+            product += _lanes(samples, down - s, down, lanes, lead=1) * self._branches[s][0]
+        product += int.from_bytes(self._branches[0][1] * (lanes + taps - 1), "little")
+
+        self._samples = samples[2 * count * down :]
+        output = bytearray(2 * count)
+        _unpack(product, taps, count, lanes + taps - 1, output)
+        return output
+
+
+# =============================================================================
+# TRANSCODER
+# =============================================================================
+
+
+class Transcoder:
+    """
+    Converts one call's audio stream from one format to another.
+
+    Stateful (filter history, a linear16 sample split between chunks), so
+    each direction of each call needs its own.
+
+    Args:
+        source: (encoding, sample_rate) of the audio fed to convert()
+        target: (encoding, sample_rate) it returns
+    """
+
+    def __init__(self, source: tuple, target: tuple):
+        self.source = source
+        self.target = target
+        source_encoding, source_rate = source
+        target_encoding, target_rate = target
+        self._resampler = Resampler(source_rate, target_rate) if source_rate != target_rate else None
+        # Tables are built on first use (the 64K-entry encode tables take a
+        # few tens of milliseconds), so create a Transcoder before calls arrive
+        self._translate = None
+        self._decode = None if source_encoding == "linear16" else _decode_tables(source_encoding)
+        self._encode = None if target_encoding == "linear16" else _encode_table(target_encoding)
+        if self._resampler is None and self._decode is not None and self._encode is not None:
+            self._translate = _translate_table(source_encoding, target_encoding)
+        self._odd_byte = b""
+
+        # Per-call counters
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def convert(self, data) -> bytes:
+        """Convert the next chunk of the stream."""
+        self.bytes_in += len(data)
+        if self._translate is not None:
+            converted = bytes(data).translate(self._translate)
+        else:
+            if self._decode is None and (self._odd_byte or len(data) % 2):
+                # A linear16 sample split between chunks
+                data = self._odd_byte + bytes(data)
+                self._odd_byte = data[len(data) - len(data) % 2 :]
+                data = data[: len(data) - len(self._odd_byte)]
+            samples = _to_offset_binary(data, self._decode)
+            if self._resampler is not None:
+                samples = self._resampler.convert(samples)
+            converted = _from_offset_binary(samples, self._encode)
+        self.bytes_out += len(converted)
+        return converted
+
+    def stats(self) -> dict:
+        return {
+            "source": "%s/%d" % self.source,
+            "target": "%s/%d" % self.target,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+        }
@@ -0,0 +1,102 @@
+"""
+Local Voice Activity Detection
+Energy-based speech detection on inbound 8 kHz mulaw audio.
+
+Runs on the raw Twilio packets in twilio_receiver so barge-in can clear agent
+playback without waiting for Deepgram's server-side UserStartedSpeaking event.
+"""
+
+# =============================================================================
+# MULAW LOOKUP TABLES (computed once at import)
+# =============================================================================
+
+
+def _mulaw_to_linear(value: int) -> int:
+    """Decode one G.711 mulaw byte to a 16-bit linear sample."""
+    value = ~value & 0xFF
+    sign = value & 0x80
+    exponent = (value >> 4) & 0x07
+    mantissa = value & 0x0F
+    sample = (((mantissa << 3) + 0x84) << exponent) - 0x84
+    return -sample if sign else sample
+
+
+MULAW_TO_LINEAR = tuple(_mulaw_to_linear(value) for value in range(256))
+MULAW_POWER = tuple(sample * sample for sample in MULAW_TO_LINEAR)
+
+FULL_SCALE_POWER = 32767 * 32767
+
+
+# =============================================================================
+# VOICE ACTIVITY DETECTOR
+# =============================================================================
+
+
+class EnergyVAD:
+    """
+    Frame-energy voice activity detector with an adaptive noise floor.
+
+    A frame counts as speech when its mean power is above both the absolute
+    threshold and `noise_ratio` times the tracked noise floor. Speech starts
+    after `onset_frames` consecutive speech frames and ends after
+    `hangover_frames` consecutive quiet ones.
+    """
+
+    def __init__(
+        self,
+        threshold_db: float = -35.0,
+        noise_ratio: float = 4.0,
+        onset_frames: int = 3,
+        hangover_frames: int = 15,
+    ):
+        self.threshold = FULL_SCALE_POWER * 10 ** (threshold_db / 10)
+        self.noise_ratio = noise_ratio
+        self.onset_frames = onset_frames
+        self.hangover_frames = hangover_frames
+
+        self.noise_floor = self.threshold / noise_ratio
+        self.speaking = False
+        self._speech_run = 0
+        self._silence_run = 0
+
+        # Per-call counters
+        self.frames = 0
+        self.speech_starts = 0
+
+    def frame_power(self, frame) -> float:
+        # map() over the lookup table walks the whole frame in C
+        return sum(map(MULAW_POWER.__getitem__, frame)) / len(frame)
+
+    def process(self, frame) -> bool:
+        """
+        Feed one mulaw frame.
+
+        Returns:
+            bool: True only on the frame where speech starts
+        """
+        self.frames += 1
+        power = self.frame_power(frame)
+
+        if power > self.threshold and power > self.noise_floor * self.noise_ratio:
+            self._speech_run += 1
+            self._silence_run = 0
+            if not self.speaking and self._speech_run >= self.onset_frames:
+                self.speaking = True
+                self.speech_starts += 1
+                return True
+            return False
+
+        self._speech_run = 0
+        self._silence_run += 1
+        if self.speaking and self._silence_run >= self.hangover_frames:
+            self.speaking = False
+        if not self.speaking:
+            self.noise_floor += (power - self.noise_floor) * 0.05
+        return False
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "speech_starts": self.speech_starts,
+            "speaking": self.speaking,
+        }
@@ -0,0 +1,280 @@
+"""
+Workers
+Run the server as several processes sharing one port.
+
+A single process handles every call on one event loop, so the JSON, base64
+and WebSocket framing of all calls share one core. In worker mode a
+supervisor starts WORKERS server processes that each bind SERVER_PORT with
+SO_REUSEPORT, and the kernel spreads new connections across them. Workers
+are started fresh (spawn, not fork): the supervisor has already opened the
+reservation database and started threads, neither of which survives a fork.
+
+The supervisor restarts a worker that exits unexpectedly, backing off while
+it keeps failing at startup. On SIGTERM or SIGINT it drains every worker:
+the worker stops accepting calls, lets calls in progress finish for up to
+WORKER_DRAIN_SECONDS and then closes the rest. A second signal stops the
+workers at once.
+
+Workers share the reservation database and, through RoomInventory.share,
+the room inventory. Each counts its live and total calls in shared memory;
+the supervisor serves those counts on METRICS_PORT, and worker i serves its
+own full metrics on METRICS_PORT + 1 + i.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from metrics import MetricsRegistry, start_metrics_server
+
+log = logging.getLogger(__name__)
+
+# A worker that exits sooner than this after starting is failing at startup;
+# it is restarted after a growing delay instead of immediately
+STARTUP_GRACE_SECONDS = 10
+MAX_RESTART_DELAY = 30
+# Extra time the supervisor gives a draining worker before killing it
+DRAIN_KILL_MARGIN = 5
+
+
+def worker_count(setting: int) -> int:
+    """WORKERS as configured: 0 means one per CPU core."""
+    return setting if setting > 0 else os.cpu_count() or 1
+
+
+# =============================================================================
+# SHARED STATE
+# =============================================================================
+
+
+class WorkerShared:
+    """
+    Memory shared by the supervisor and every worker.
+
+    Created by the supervisor and handed to each worker when it starts.
+    Each worker writes only its own slot of the call counters.
+
+    Args:
+        workers: Number of worker processes
+        context: multiprocessing context the workers are started with
+    """
+
+    def __init__(self, workers: int, context):
+        self.active_calls = context.RawArray("l", workers)
+        self.total_calls = context.RawArray("Q", workers)
+
+
+class WorkerContext:
+    """
+    What a worker process knows about its place in the pool.
+
+    Args:
+        index: This worker's slot, 0 to workers - 1
+        shared: The pool's WorkerShared
+        drain_seconds: How long calls in progress may continue once draining
+    """
+
+    def __init__(self, index: int, shared: WorkerShared, drain_seconds: float):
+        self.index = index
+        self.shared = shared
+        self.drain_seconds = drain_seconds
+        self.supervisor_pid = os.getppid()
+
+    def call_started(self) -> None:
+        self.shared.active_calls[self.index] += 1
+        self.shared.total_calls[self.index] += 1
+
+    def call_finished(self) -> None:
+        self.shared.active_calls[self.index] -= 1
+
+    async def serve_until_stopped(self, server, sessions) -> None:
+        """
+        Run until the supervisor asks this worker to stop, then drain.
+
+        Args:
+            server: The worker's websockets server
+            sessions: The worker's SessionRegistry; draining waits for it to empty
+        """
+        stop = asyncio.Event()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+        # Stop as well if the supervisor is gone and nobody will ever ask
+        while not stop.is_set() and os.getppid() == self.supervisor_pid:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1)
+            except asyncio.TimeoutError:
+                pass
+
+        log.info("Worker %d draining %d calls", self.index, len(sessions))
+        # Stop accepting; calls in progress carry on
+        server.close(close_connections=False)
+        deadline = time.monotonic() + self.drain_seconds
+        while sessions and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if sessions:
+            log.warning("Worker %d closing %d calls still in progress", self.index, len(sessions))
+            # 1001: going away
+            await asyncio.gather(*(connection.close(1001) for connection in server.connections))
+        await server.wait_closed()
+
+
+def _worker_main(target, index: int, shared: WorkerShared, drain_seconds: float) -> None:
+    # Ctrl-C reaches the whole process group; the supervisor decides what happens
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target(WorkerContext(index, shared, drain_seconds))
+
+
+# =============================================================================
+# SUPERVISOR
+# =============================================================================
+
+
+class Supervisor:
+    """
+    Starts, restarts and stops the worker processes.
+
+    Args:
+        target: Called in each worker process with its WorkerContext; runs the server
+        workers: Number of worker processes
+        drain_seconds: How long draining workers may finish their calls
+        metrics_host: Address of the supervisor's metrics endpoint
+        metrics_port: Port of the supervisor's metrics endpoint (0 disables it)
+    """
+
+    def __init__(
+        self,
+        target,
+        workers: int,
+        drain_seconds: float = 30,
+        metrics_host: str = "127.0.0.1",
+        metrics_port: int = 0,
+    ):
+        if not hasattr(socket, "SO_REUSEPORT"):
+            raise RuntimeError("Worker mode needs SO_REUSEPORT, which this platform does not have")
+        self.target = target
+        self.workers = workers
+        self.drain_seconds = drain_seconds
+        self.metrics_host = metrics_host
+        self.metrics_port = metrics_port
+
+        self._context = multiprocessing.get_context("spawn")
+        self.shared = WorkerShared(workers, self._context)
+        self.processes = [None] * workers
+        self.started_at = [0.0] * workers
+        self.restarts = [0] * workers
+        self._restart_delay = [0.0] * workers
+        self._stopping = None
+
+    def run(self) -> None:
+        """Run the workers until SIGTERM or SIGINT, then drain them."""
+        asyncio.run(self._run())
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(signum, self._on_signal)
+
+        # Before any worker starts, so a port in use leaves no orphans behind
+        if self.metrics_port > 0:
+            await start_metrics_server(self.metrics_host, self.metrics_port, self.registry())
+        for index in range(self.workers):
+            self._start(index)
+        log.info("Supervisor running %d workers", self.workers)
+
+        await self._stopping.wait()
+        await self._drain()
+
+    def _start(self, index: int) -> None:
+        process = self._context.Process(
+            target=_worker_main,
+            args=(self.target, index, self.shared, self.drain_seconds),
+            name=f"worker-{index}",
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+        asyncio.get_running_loop().add_reader(process.sentinel, self._on_exit, index)
+        log.info("Started worker %d (pid %d)", index, process.pid)
+
+    def _on_exit(self, index: int) -> None:
+        process = self.processes[index]
+        asyncio.get_running_loop().remove_reader(process.sentinel)
+        process.join()
+        # Its calls ended with it
+        self.shared.active_calls[index] = 0
+        if self._stopping.is_set():
+            return
+
+        if time.monotonic() - self.started_at[index] < STARTUP_GRACE_SECONDS:
+            self._restart_delay[index] = min(max(self._restart_delay[index] * 2, 1), MAX_RESTART_DELAY)
+        else:
+            self._restart_delay[index] = 0
+        log.warning(
+            "Worker %d (pid %d) exited with code %s; restarting in %.0fs",
+            index, process.pid, process.exitcode, self._restart_delay[index],
+        )
+        self.restarts[index] += 1
+        asyncio.get_running_loop().call_later(self._restart_delay[index], self._restart, index)
+
+    def _restart(self, index: int) -> None:
+        if not self._stopping.is_set():
+            self._start(index)
+
+    def _on_signal(self) -> None:
+        if not self._stopping.is_set():
+            log.info("Draining workers (signal again to stop immediately)")
+            self._stopping.set()
+        else:
+            for process in self.processes:
+                if process is not None and process.is_alive():
+                    process.kill()
+
+    async def _drain(self) -> None:
+        running = [process for process in self.processes if process is not None and process.is_alive()]
+        for process in running:
+            process.terminate()
+        deadline = time.monotonic() + self.drain_seconds + DRAIN_KILL_MARGIN
+        while any(process.is_alive() for process in running) and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for process in running:
+            if process.is_alive():
+                log.warning("Worker %s did not drain in time; killing it", process.name)
+                process.kill()
+            process.join()
+        log.info("All workers stopped")
+
+    def stats(self) -> dict:
+        return {
+            "workers": [
+                {
+                    "worker": index,
+                    "pid": process.pid if process is not None else None,
+                    "alive": process is not None and process.is_alive(),
+                    "active_calls": self.shared.active_calls[index],
+                    "calls_total": self.shared.total_calls[index],
+                    "restarts": self.restarts[index],
+                }
+                for index, process in enumerate(self.processes)
+            ],
+        }
+
+    def registry(self) -> MetricsRegistry:
+        """Metrics served by the supervisor: call counts and restarts per worker."""
+        registry = MetricsRegistry()
+
+        def per_worker(values):
+            return lambda: {str(index): value for index, value in enumerate(values)}
+
+        registry.gauge("active_calls", lambda: sum(self.shared.active_calls))
+        registry.gauge("worker_active_calls", per_worker(self.shared.active_calls), label="worker")
+        registry.gauge("worker_calls_total", per_worker(self.shared.total_calls), kind="counter", label="worker")
+        registry.gauge("worker_restarts_total", per_worker(self.restarts), kind="counter", label="worker")
+        registry.gauge(
+            "workers_running",
+            lambda: sum(process is not None and process.is_alive() for process in self.processes),
+        )
+        return registry